@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+#
+# Event wait latency histograms for hwsim test cases
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Latency histograms for the ctrl_iface event waits in test cases
+
+When enabled, the wait_event() helpers of WpaSupplicant and Hostapd record
+the time from the start of the wait to the matching event per (device,
+event) pair together with the number of waits that timed out. The
+histograms use HDR style log-linear buckets with SUB_BUCKET_BITS bits of
+precision, so they can be stored compactly and merged over test cases and
+runs.
+"""
+
+import json
+import time
+
+# Values are in microseconds. Each power of two range is divided into
+# 2^SUB_BUCKET_BITS buckets, i.e., the bucket width is at most 1/8 of the
+# value.
+SUB_BUCKET_BITS = 3
+
+def bucket_index(value):
+    if value < (1 << SUB_BUCKET_BITS):
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return ((shift + 1) << SUB_BUCKET_BITS) + \
+        (value >> shift) - (1 << SUB_BUCKET_BITS)
+
+def bucket_range(index):
+    """Return the [low, high) value range of a bucket"""
+    if index < (2 << SUB_BUCKET_BITS):
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    sub = (index & ((1 << SUB_BUCKET_BITS) - 1)) + (1 << SUB_BUCKET_BITS)
+    return sub << shift, (sub + 1) << shift
+
+class LatencyHistogram(object):
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.timeouts = 0
+
+    def add(self, usec):
+        idx = bucket_index(usec)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total += usec
+        if usec > self.max:
+            self.max = usec
+
+    def merge(self, other):
+        for idx, count in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.timeouts += other.timeouts
+
+    def percentile(self, pct):
+        """Return the upper bound of the bucket containing the percentile"""
+        if not self.count:
+            return None
+        target = max(1, int(self.count * pct / 100.0 + 0.5))
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= target:
+                return min(bucket_range(idx)[1] - 1, self.max)
+        return self.max
+
+    def encode(self):
+        return json.dumps(sorted(self.buckets.items()),
+                          separators=(',', ':'))
+
+    @staticmethod
+    def decode(count, total, max_val, timeouts, buckets):
+        hist = LatencyHistogram()
+        hist.buckets = dict((idx, c) for idx, c in json.loads(buckets))
+        hist.count = count
+        hist.total = total
+        hist.max = max_val
+        hist.timeouts = timeouts
+        return hist
+
+def event_name(pattern):
+    """Return the event name part of an event pattern"""
+    name = pattern.strip().split(' ', 1)[0]
+    if name.startswith('<'):
+        name = name.split('>', 1)[-1]
+    return name or pattern
+
+class EventLatencyRecorder(object):
+    def __init__(self):
+        self.stats = {}
+
+    def _hist(self, device, event):
+        key = (device, event)
+        hist = self.stats.get(key)
+        if hist is None:
+            hist = LatencyHistogram()
+            self.stats[key] = hist
+        return hist
+
+    def record(self, device, events, ev, start):
+        """Record a completed wait
+
+        ev is the received event or None if the wait timed out. start is
+        the time.monotonic() value from the beginning of the wait."""
+        if ev is None:
+            for pattern in events:
+                self._hist(device, event_name(pattern)).timeouts += 1
+            return
+        for pattern in events:
+            if pattern in ev:
+                usec = int((time.monotonic() - start) * 1000000)
+                self._hist(device, event_name(pattern)).add(usec)
+                return
+
+# Active recorder or None if event latencies are not collected
+recorder = None
+
+def start():
+    global recorder
+    recorder = EventLatencyRecorder()
+
+def stop():
+    """Stop recording and return {(device, event): LatencyHistogram}"""
+    global recorder
+    if recorder is None:
+        return {}
+    stats = recorder.stats
+    recorder = None
+    return stats
+
+def load(conn, run=None, test=None):
+    """Return {(run, event): LatencyHistogram} merged over devices and
+    test cases from the results database"""
+    # Databases opened read-only may predate the event_latency table
+    res = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='event_latency'")
+    if res.fetchone() is None:
+        return {}
+    sql = 'SELECT run,event,count,total,max,timeouts,buckets FROM event_latency'
+    where = []
+    params = []
+    if run is not None:
+        where.append('run=?')
+        params.append(run)
+    if test is not None:
+        where.append('test=?')
+        params.append(test)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    res = {}
+    for r, event, count, total, max_val, timeouts, buckets in \
+        conn.execute(sql, params):
+        hist = LatencyHistogram.decode(count, total, max_val, timeouts,
+                                       buckets)
+        key = (r, event)
+        if key in res:
+            res[key].merge(hist)
+        else:
+            res[key] = hist
+    return res
+
+def main():
+    import argparse
+    from results_db import ResultsDB
+
+    parser = argparse.ArgumentParser(description='show event wait latencies from hwsim test results database')
+    parser.add_argument('database', metavar='<sqlite3 db>')
+    parser.add_argument('--run', type=int, metavar='<run>',
+                        help='show only this run')
+    parser.add_argument('--test', metavar='<test>',
+                        help='show only this test case')
+    parser.add_argument('--event', metavar='<event>', action='append',
+                        help='show only this event; can be used multiple times')
+    args = parser.parse_args()
+
+    db = ResultsDB(args.database, readonly=True)
+    try:
+        stats = load(db.conn, args.run, args.test)
+    finally:
+        db.close()
+    print("run event count timeouts p50 p90 p99 max (ms)")
+    for (run, event), hist in sorted(stats.items()):
+        if args.event and event not in args.event:
+            continue
+        vals = [hist.percentile(p) for p in (50, 90, 99)] + \
+            [hist.max if hist.count else None]
+        print("%s %s %d %d %s" % (run, event, hist.count, hist.timeouts,
+                                  ' '.join(['-' if v is None else
+                                            '%.1f' % (v / 1000.0)
+                                            for v in vals])))
+
+if __name__ == "__main__":
+    main()
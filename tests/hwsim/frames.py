@@ -0,0 +1,199 @@
+# IEEE 802.11 frame and element construction and parsing for test cases
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+IEEE 802.11 frame and element helpers
+
+The struct layouts are compiled once at import time. Parsed elements are
+indexed by offset into the original buffer, so parsing does not copy the
+element payloads; values are copied only when requested as bytes and
+memoryview slices are available with view()/views(). All instances of an
+Element ID are kept in the order they appear in the frame.
+"""
+
+import binascii
+import struct
+
+WLAN_EID_SSID = 0
+WLAN_EID_SUPP_RATES = 1
+WLAN_EID_RSN = 48
+WLAN_EID_MOBILITY_DOMAIN = 54
+WLAN_EID_FAST_BSS_TRANSITION = 55
+WLAN_EID_VENDOR_SPECIFIC = 221
+WLAN_EID_EXTENSION = 255
+
+MGMT_SUBTYPE_ACTION = 13
+
+OUI_MSFT = 0x0050f2
+OUI_WFA = 0x506f9a
+
+_ie_hdr = struct.Struct("BB")
+# Element ID, Length, OUI (as 16 + 8 bits) and OUI type
+_vendor_hdr = struct.Struct(">BBHBB")
+_mgmt_hdr = struct.Struct("<HH6s6s6sH")
+_action_hdr = struct.Struct("BB")
+_action_hdr_token = struct.Struct("BBB")
+
+MGMT_HDR_LEN = _mgmt_hdr.size
+
+def mac2bytes(addr):
+    """Return an address string (or bytes as-is) as bytes"""
+    if isinstance(addr, bytes):
+        return addr
+    return binascii.unhexlify(addr.replace(':', ''))
+
+def bytes2mac(addr):
+    return "%02x:%02x:%02x:%02x:%02x:%02x" % tuple(addr)
+
+def ie(eid, data=b''):
+    """Return an element with the given Element ID and payload"""
+    return _ie_hdr.pack(eid, len(data)) + data
+
+def ext_ie(ext_id, data=b''):
+    """Return an element with Element ID Extension"""
+    return _ie_hdr.pack(WLAN_EID_EXTENSION, len(data) + 1) + \
+        bytes((ext_id,)) + data
+
+def vendor_ie(oui, oui_type, data=b''):
+    """Return a Vendor Specific element (oui as an integer)"""
+    return _vendor_hdr.pack(WLAN_EID_VENDOR_SPECIFIC, len(data) + 4,
+                            oui >> 8, oui & 0xff, oui_type) + data
+
+class IEs(object):
+    """Elements of a frame body
+
+    This can be used like the dict returned by utils.parse_ie() in the
+    past: ies[eid] is the payload of the first instance of the Element ID
+    as bytes. all() returns all instances."""
+    def __init__(self, data, offset=0, end=None):
+        self._view = data if isinstance(data, memoryview) else memoryview(data)
+        self._index = {}
+        if end is None:
+            end = len(self._view)
+        view = self._view
+        index = self._index
+        while offset + 2 <= end:
+            elen = view[offset + 1]
+            start = offset + 2
+            offset = start + elen
+            if offset > end:
+                break
+            eid = view[start - 2]
+            if eid in index:
+                index[eid].append((start, offset))
+            else:
+                index[eid] = [(start, offset)]
+
+    def __contains__(self, eid):
+        return eid in self._index
+
+    def __getitem__(self, eid):
+        start, end = self._index[eid][0]
+        return bytes(self._view[start:end])
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        return [(eid, self[eid]) for eid in self._index]
+
+    def get(self, eid, default=None):
+        if eid not in self._index:
+            return default
+        return self[eid]
+
+    def count(self, eid):
+        return len(self._index.get(eid, []))
+
+    def view(self, eid):
+        """Return a memoryview of the first instance of the Element ID"""
+        start, end = self._index[eid][0]
+        return self._view[start:end]
+
+    def views(self, eid):
+        return [self._view[start:end] for start, end in
+                self._index.get(eid, [])]
+
+    def all(self, eid):
+        """Return the payloads of all instances of the Element ID"""
+        return [bytes(v) for v in self.views(eid)]
+
+    def ext(self, ext_id):
+        """Return the payload (after the Element ID Extension) of the first
+        extension element with ext_id or None"""
+        for start, end in self._index.get(WLAN_EID_EXTENSION, []):
+            if end > start and self._view[start] == ext_id:
+                return bytes(self._view[start + 1:end])
+        return None
+
+    def vendor(self, oui, oui_type=None):
+        """Return the payloads (including OUI and type) of the Vendor
+        Specific elements with the OUI (and type)"""
+        prefix = oui.to_bytes(3, 'big')
+        if oui_type is not None:
+            prefix += bytes((oui_type,))
+        res = []
+        for start, end in self._index.get(WLAN_EID_VENDOR_SPECIFIC, []):
+            if self._view[start:start + len(prefix)] == prefix:
+                res.append(bytes(self._view[start:end]))
+        return res
+
+    def raw(self, eid):
+        """Return the first instance of the Element ID with the header"""
+        start, end = self._index[eid][0]
+        return bytes(self._view[start - 2:end])
+
+    def __repr__(self):
+        return '<IEs %s>' % ' '.join('%d(%d)' % (eid, len(pos)) for
+                                      eid, pos in self._index.items())
+
+def parse_ies(data, offset=0):
+    """Parse the elements in data starting at offset
+
+    A truncated element at the end is ignored."""
+    return IEs(data, offset)
+
+def parse_mgmt(frame):
+    """Parse a Management frame into a dict
+
+    The keys match the ones used by mgmt_tx()/build_mgmt()."""
+    fc, duration, da, sa, bssid, seq_ctrl = _mgmt_hdr.unpack_from(frame)
+    return {'frame': frame,
+            'fc': fc,
+            'subtype': (fc >> 4) & 0xf,
+            'duration': duration,
+            'da': bytes2mac(da),
+            'sa': bytes2mac(sa),
+            'bssid': bytes2mac(bssid),
+            'seq_ctrl': seq_ctrl,
+            'payload': frame[MGMT_HDR_LEN:]}
+
+def mgmt_hdr(fc, da, sa, bssid, duration=0, seq_ctrl=0):
+    return _mgmt_hdr.pack(fc, duration, mac2bytes(da), mac2bytes(sa),
+                          mac2bytes(bssid), seq_ctrl)
+
+def build_mgmt(msg):
+    """Return a Management frame from a dict with fc, da, sa, bssid and
+    payload (and optionally duration and seq_ctrl)"""
+    return mgmt_hdr(msg['fc'], msg['da'], msg['sa'], msg['bssid'],
+                    msg.get('duration', 0), msg.get('seq_ctrl', 0)) + \
+        msg['payload']
+
+def action_msg(dst, src, bssid, category, action, dialog_token=None,
+               payload=b''):
+    """Return a dict for an Action frame for mgmt_tx()"""
+    if dialog_token is None:
+        hdr = _action_hdr.pack(category, action)
+    else:
+        hdr = _action_hdr_token.pack(category, action, dialog_token)
+    return {'fc': MGMT_SUBTYPE_ACTION << 4, 'da': dst, 'sa': src,
+            'bssid': bssid, 'payload': hdr + payload}
@@ -16,6 +16,8 @@ import remotehost
 import utils
 import subprocess
 from remotectrl import RemoteCtrl
+import event_stats
+import frames
 
 logger = logging.getLogger()
 hapd_ctrl = '/var/run/hostapd'
@@ -305,6 +307,9 @@ class Hostapd:
     def wait_event(self, events, timeout):
         if not isinstance(events, list):
             raise Exception("Hostapd.wait_event() called with incorrect events argument type")
+        rec = event_stats.recorder
+        if rec:
+            wait_start = time.monotonic()
         start = os.times()[4]
         while True:
             while self.mon.pending():
@@ -312,6 +317,8 @@ class Hostapd:
                 logger.debug(self.dbg + ": " + ev)
                 for event in events:
                     if event in ev:
+                        if rec:
+                            rec.record(self.dbg, events, ev, wait_start)
                         return ev
             now = os.times()[4]
             remaining = start + timeout - now
@@ -319,6 +326,8 @@ class Hostapd:
                 break
             if not self.mon.pending(timeout=remaining):
                 break
+        if rec:
+            rec.record(self.dbg, events, None, wait_start)
         return None
 
     def wait_sta(self, addr=None, timeout=2, wait_4way_hs=False):
@@ -407,31 +416,12 @@ class Hostapd:
         ev = self.wait_event(["MGMT-RX"], timeout=timeout)
         if ev is None:
             return None
-        msg = {}
-        frame = binascii.unhexlify(ev.split(' ')[1])
-        msg['frame'] = frame
-
-        hdr = struct.unpack('<HH6B6B6BH', frame[0:24])
-        msg['fc'] = hdr[0]
-        msg['subtype'] = (hdr[0] >> 4) & 0xf
-        hdr = hdr[1:]
-        msg['duration'] = hdr[0]
-        hdr = hdr[1:]
-        msg['da'] = "%02x:%02x:%02x:%02x:%02x:%02x" % hdr[0:6]
-        hdr = hdr[6:]
-        msg['sa'] = "%02x:%02x:%02x:%02x:%02x:%02x" % hdr[0:6]
-        hdr = hdr[6:]
-        msg['bssid'] = "%02x:%02x:%02x:%02x:%02x:%02x" % hdr[0:6]
-        hdr = hdr[6:]
-        msg['seq_ctrl'] = hdr[0]
-        msg['payload'] = frame[24:]
-
-        return msg
+        return frames.parse_mgmt(binascii.unhexlify(ev.split(' ')[1]))
 
     def mgmt_tx(self, msg):
-        t = (msg['fc'], 0) + mac2tuple(msg['da']) + mac2tuple(msg['sa']) + mac2tuple(msg['bssid']) + (0,)
-        hdr = struct.pack('<HH6B6B6BH', *t)
-        res = self.request("MGMT_TX " + binascii.hexlify(hdr + msg['payload']).decode())
+        frame = frames.mgmt_hdr(msg['fc'], msg['da'], msg['sa'], msg['bssid']) + \
+            msg['payload']
+        res = self.request("MGMT_TX " + binascii.hexlify(frame).decode())
         if "OK" not in res:
             raise Exception("MGMT_TX command to hostapd failed")
 
@@ -8,18 +8,41 @@
 # See README for more details.
 
 import netlink, os
+import subprocess
+import threading
+
+import logging
+logger = logging.getLogger()
 
 # constants
+HWSIM_CMD_REGISTER = 1
+HWSIM_CMD_FRAME = 2
+HWSIM_CMD_TX_INFO_FRAME = 3
 HWSIM_CMD_CREATE_RADIO = 4
 HWSIM_CMD_DESTROY_RADIO = 5
+HWSIM_CMD_ADD_MAC_ADDR = 7
+HWSIM_CMD_DEL_MAC_ADDR = 8
 
+HWSIM_ATTR_ADDR_RECEIVER = 1
+HWSIM_ATTR_ADDR_TRANSMITTER = 2
+HWSIM_ATTR_FRAME = 3
+HWSIM_ATTR_FLAGS = 4
+HWSIM_ATTR_RX_RATE = 5
+HWSIM_ATTR_SIGNAL = 6
+HWSIM_ATTR_TX_INFO = 7
+HWSIM_ATTR_COOKIE = 8
 HWSIM_ATTR_CHANNELS = 9
 HWSIM_ATTR_RADIO_ID = 10
 HWSIM_ATTR_SUPPORT_P2P_DEVICE = 14
 HWSIM_ATTR_USE_CHANCTX = 15
+HWSIM_ATTR_FREQ = 19
 HWSIM_ATTR_MLO_SUPPORT = 25
 HWSIM_ATTR_NAN_SUPPORT = 30
 
+HWSIM_TX_CTL_REQ_TX_STATUS = 1
+HWSIM_TX_CTL_NO_ACK = 2
+HWSIM_TX_STAT_ACK = 4
+
 # the controller class
 class HWSimController(object):
     def __init__(self):
@@ -56,18 +79,255 @@ class HWSimController(object):
                                   attrs=attrs)
         msg.send_and_recv(self._conn)
 
+    def register(self):
+        """Register this connection as the wireless medium
+
+        mac80211_hwsim then sends the frames transmitted by the radios in
+        the current network namespace to this connection (HWSIM_CMD_FRAME)
+        instead of delivering them directly. The registration ends when
+        the connection is closed."""
+        msg = netlink.GenlMessage(self._fid, HWSIM_CMD_REGISTER,
+                                  flags=netlink.NLM_F_REQUEST |
+                                        netlink.NLM_F_ACK)
+        msg.send_and_recv(self._conn)
+
+    @property
+    def conn(self):
+        return self._conn
+
+    @property
+    def family(self):
+        return self._fid
+
+    def close(self):
+        self._conn.close()
+
+def radio_phy(radio_id):
+    """Return the wiphy name of a radio in the current network namespace"""
+    return os.listdir('/sys/class/mac80211_hwsim/hwsim%d/ieee80211/' % radio_id)[0]
+
+def radio_netdevs(radio_id):
+    path = '/sys/class/mac80211_hwsim/hwsim%d/net/' % radio_id
+    if not os.path.exists(path):
+        return []
+    return os.listdir(path)
+
+def _iw(*args):
+    return subprocess.check_output(['iw'] + list(args),
+                                   stderr=subprocess.STDOUT).decode()
+
+def _phy_wdevs(phy):
+    """Return the non-netdev wdevs (P2P Device, NAN) of a wiphy"""
+    with open('/sys/class/ieee80211/%s/index' % phy) as f:
+        idx = f.read().strip()
+    wdevs = []
+    cur = None
+    netdev = False
+    for line in _iw('dev').splitlines():
+        line = line.strip()
+        if line.startswith('phy#'):
+            cur = line[4:]
+        elif line.startswith('Interface '):
+            netdev = True
+        elif line.startswith('Unnamed/non-netdev interface'):
+            netdev = False
+        elif line.startswith('wdev ') and cur == idx and not netdev:
+            wdevs.append(line.split()[1])
+    return wdevs
+
+def _rfkill_blocked(phy):
+    path = '/sys/class/ieee80211/%s/' % phy
+    for name in os.listdir(path):
+        if not name.startswith('rfkill'):
+            continue
+        for state in ['soft', 'hard']:
+            with open(os.path.join(path, name, state)) as f:
+                if f.read().strip() != '0':
+                    return True
+    return False
+
+def _phy_state(phy):
+    """Return the wiphy parameters that a test case may have changed
+
+    The channel list is left out since the regulatory domain is global and
+    restored after each test case."""
+    lines = []
+    for line in _iw('phy', phy, 'info').splitlines():
+        if ' MHz [' in line:
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+class HWSimRadioPool(object):
+    """Pool of pre-created mac80211_hwsim radios
+
+    Idle radios are kept without any interfaces per capability set, so
+    HWSimRadio does not need to create and destroy a wiphy for each use.
+    A fresh netdev is added when a radio is handed out and all interfaces
+    are removed when it is returned. A radio whose state cannot be
+    restored (e.g., rfkill blocked or changed wiphy parameters) is
+    destroyed instead. More radios are created for a capability set that
+    runs out of idle radios when refill() is called between test cases, so
+    that no radios appear while a test case is running."""
+    def __init__(self, caps=None, idle=1, max_idle=4):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._target = {}
+        self._state = {}
+        self._max_idle = max_idle
+        self._controller = HWSimController()
+        self._stop = False
+        for key in caps or []:
+            self._target[key] = idle
+
+    @staticmethod
+    def key(n_channels=None, use_chanctx=False, use_p2p_device=False,
+            use_mlo=False, use_nan=False):
+        return (n_channels or None, bool(use_chanctx), bool(use_p2p_device),
+                bool(use_mlo), bool(use_nan))
+
+    def _create(self, key):
+        n_channels, use_chanctx, use_p2p_device, use_mlo, use_nan = key
+        radio_id = self._controller.create_radio(n_channels=n_channels,
+                                           use_chanctx=use_chanctx,
+                                           use_p2p_device=use_p2p_device,
+                                           use_mlo=use_mlo, use_nan=use_nan)
+        if radio_id < 0:
+            raise Exception("Failed to create radio (err:%d)" % radio_id)
+        try:
+            for ifname in radio_netdevs(radio_id):
+                _iw('dev', ifname, 'del')
+            self._state[radio_id] = _phy_state(radio_phy(radio_id))
+        except Exception:
+            self._controller.destroy_radio(radio_id)
+            raise
+        return radio_id
+
+    def refill(self):
+        """Create idle radios up to the target of each capability set
+
+        This is to be called when no test case is running."""
+        for key, target in list(self._target.items()):
+            while not self._stop:
+                with self._lock:
+                    if len(self._idle.get(key, [])) >= target:
+                        break
+                try:
+                    radio_id = self._create(key)
+                except Exception as e:
+                    logger.info("Radio pool: could not create radio: " +
+                                str(e))
+                    break
+                with self._lock:
+                    self._idle.setdefault(key, []).append(radio_id)
+
+    def get(self, key):
+        """Return (radio_id, ifname) of a radio with a new netdev"""
+        with self._lock:
+            radios = self._idle.get(key)
+            radio_id = radios.pop(0) if radios else None
+            if radio_id is None:
+                # Keep more idle radios with this capability set from the
+                # next refill() on
+                self._target[key] = min(self._target.get(key, 0) + 1,
+                                        self._max_idle)
+        if radio_id is None:
+            radio_id = self._create(key)
+        try:
+            _iw('phy', radio_phy(radio_id), 'interface', 'add', 'wlan%d',
+                'type', 'managed')
+            ifname = radio_netdevs(radio_id)[0]
+        except Exception:
+            self.destroy(radio_id)
+            raise
+        return radio_id, ifname
+
+    def put(self, key, radio_id):
+        """Return a radio to the pool or destroy it if it is not clean"""
+        if not os.path.exists('/sys/class/mac80211_hwsim/hwsim%d' % radio_id):
+            # Destroyed by the test case
+            self._state.pop(radio_id, None)
+            return
+        try:
+            phy = radio_phy(radio_id)
+            for ifname in radio_netdevs(radio_id):
+                _iw('dev', ifname, 'del')
+            for wdev in _phy_wdevs(phy):
+                _iw('wdev', wdev, 'del')
+            if radio_netdevs(radio_id) or _phy_wdevs(phy):
+                raise Exception("interfaces left")
+            if _rfkill_blocked(phy):
+                raise Exception("rfkill blocked")
+            if _phy_state(phy) != self._state.get(radio_id):
+                raise Exception("wiphy parameters changed")
+        except Exception as e:
+            logger.info("Radio pool: destroy radio %d: %s" % (radio_id, str(e)))
+            self.destroy(radio_id)
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if not self._stop and len(idle) < self._max_idle:
+                idle.append(radio_id)
+                return
+        self.destroy(radio_id)
+
+    def destroy(self, radio_id):
+        self._state.pop(radio_id, None)
+        self._controller.destroy_radio(radio_id)
+
+    def close(self):
+        """Destroy all idle radios"""
+        self._stop = True
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+        for radios in idle.values():
+            for radio_id in radios:
+                self.destroy(radio_id)
+
+# Common HWSimRadio capability sets to keep pre-created in the pool
+POOL_CAPS = [HWSimRadioPool.key(),
+             HWSimRadioPool.key(use_mlo=True),
+             HWSimRadioPool.key(use_p2p_device=True),
+             HWSimRadioPool.key(n_channels=2)]
+
+# Active radio pool or None if HWSimRadio creates a new radio for each use
+radio_pool = None
+
+def start_pool(idle=1, max_idle=4):
+    global radio_pool
+    radio_pool = HWSimRadioPool(POOL_CAPS, idle=idle, max_idle=max_idle)
+
+def refill_pool():
+    if radio_pool:
+        radio_pool.refill()
+
+def stop_pool():
+    global radio_pool
+    if radio_pool:
+        radio_pool.close()
+        radio_pool = None
+
 class HWSimRadio(object):
     def __init__(self, n_channels=None, use_chanctx=False,
                  use_p2p_device=False, use_mlo=False,
                  use_nan=False):
-        self._controller = HWSimController()
         self._n_channels = n_channels
         self._use_chanctx = use_chanctx
         self._use_p2p_dev = use_p2p_device
         self._use_mlo = use_mlo
         self._use_nan = use_nan
+        self._pool = radio_pool
+        if self._pool:
+            self._key = HWSimRadioPool.key(n_channels, use_chanctx,
+                                           use_p2p_device, use_mlo, use_nan)
+        else:
+            self._controller = HWSimController()
 
     def __enter__(self):
+        if self._pool:
+            self._radio_id, iface = self._pool.get(self._key)
+            return self._radio_id, iface
         self._radio_id = self._controller.create_radio(
               n_channels=self._n_channels,
               use_chanctx=self._use_chanctx,
@@ -84,6 +344,9 @@ class HWSimRadio(object):
         return self._radio_id, iface
 
     def __exit__(self, type, value, traceback):
+        if self._pool:
+            self._pool.put(self._key, self._radio_id)
+            return
         self._controller.destroy_radio(self._radio_id)
 
 
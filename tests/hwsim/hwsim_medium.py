@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+#
+# Wireless medium simulation over the mac80211_hwsim netlink frame API
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Wireless medium for mac80211_hwsim radios
+
+Medium registers itself as the medium with mac80211_hwsim like wmediumd, so
+the kernel passes all transmitted frames to it instead of delivering them
+directly. Each frame is forwarded to the other radios based on a link
+matrix that can be changed while the medium is running. A link from a
+transmitter to a receiver has a loss probability for each transmission
+attempt, a delivery delay and an SNR that determines the reported signal
+strength. Unicast frames are retried according to the rate table of the
+transmitter until the intended receiver gets the frame; the used attempts
+and the ACK status are reported back to the transmitting radio. As with
+mac80211_hwsim itself, a unicast frame is acknowledged only by the radio
+that owns the destination address, so a frame to an unknown address uses
+all attempts and fails.
+
+Radios are identified by their permanent MAC address (e.g.,
+02:00:00:00:01:00 for the second radio) or by an interface address. The
+interface addresses are read from sysfs, reported by mac80211_hwsim with
+HWSIM_CMD_ADD_MAC_ADDR or learned from transmitted frames.
+"""
+
+import binascii
+import errno
+import heapq
+import os
+import random
+import select
+import socket
+import struct
+import threading
+import time
+
+import hwsim
+import netlink
+from hwsim import HWSIM_CMD_FRAME, HWSIM_CMD_TX_INFO_FRAME
+from hwsim import HWSIM_CMD_ADD_MAC_ADDR, HWSIM_CMD_DEL_MAC_ADDR
+from hwsim import HWSIM_ATTR_ADDR_RECEIVER, HWSIM_ATTR_ADDR_TRANSMITTER
+from hwsim import HWSIM_ATTR_FRAME, HWSIM_ATTR_FLAGS, HWSIM_ATTR_RX_RATE
+from hwsim import HWSIM_ATTR_SIGNAL, HWSIM_ATTR_TX_INFO, HWSIM_ATTR_COOKIE
+from hwsim import HWSIM_ATTR_FREQ
+from hwsim import HWSIM_TX_CTL_NO_ACK, HWSIM_TX_STAT_ACK
+
+import logging
+logger = logging.getLogger()
+
+NOISE_LEVEL = -91
+# -30 dBm, i.e., the signal mac80211_hwsim reports with the default TX power
+DEFAULT_SNR = 61
+
+IEEE80211_TX_MAX_RATES = 4
+NETLINK_CAP_ACK = 10
+SO_SNDBUFFORCE = 32
+SO_RCVBUFFORCE = 33
+
+_nlmsghdr = struct.Struct("IHHII")
+_nlattr = struct.Struct("HH")
+_u32 = struct.Struct("I")
+_s32 = struct.Struct("i")
+# struct hwsim_tx_rate: s8 idx, u8 count
+_tx_rates = struct.Struct("bB" * IEEE80211_TX_MAX_RATES)
+
+# nlmsghdr, genlmsghdr and the HWSIM_ATTR_ADDR_RECEIVER/TRANSMITTER attribute
+_ADDR_OFFSET = 24
+_FRAME_OFFSET = 32
+_TX_INFO_LEN = _FRAME_OFFSET + 8 + 12 + 8 + 12
+
+def _addr(addr):
+    return binascii.unhexlify(addr.replace(':', ''))
+
+def _addr_str(addr):
+    return ':'.join('%02x' % b for b in addr)
+
+def _perm_addr(hwaddr):
+    return _addr_str(bytes([hwaddr[0] & ~0x40]) + hwaddr[1:])
+
+def radio_hwaddr(addr):
+    """Return the mac80211_hwsim radio address for a permanent address
+
+    mac80211_hwsim identifies radios in the netlink frame API by the
+    permanent address with the 0x40 bit set in the first octet."""
+    hw = bytearray(addr)
+    hw[0] |= 0x40
+    return bytes(hw)
+
+class Link(object):
+    """Link parameters from a transmitter to a receiver
+
+    loss is the probability of losing a transmission attempt, delay is the
+    delivery delay in seconds and snr is the signal to noise ratio in dB
+    (the receiver sees signal NOISE_LEVEL + snr)."""
+    def __init__(self, loss=0.0, delay=0.0, snr=DEFAULT_SNR):
+        self.loss = loss
+        self.delay = delay
+        self.snr = snr
+        self.signal = NOISE_LEVEL + snr
+
+    def replace(self, loss=None, delay=None, snr=None):
+        return Link(self.loss if loss is None else loss,
+                    self.delay if delay is None else delay,
+                    self.snr if snr is None else snr)
+
+    def __repr__(self):
+        return '<Link loss=%s delay=%s snr=%s>' % (self.loss, self.delay,
+                                                   self.snr)
+
+class LinkStats(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.delivered = 0
+        self.lost = 0
+
+    def summary(self):
+        return {'frames': self.frames, 'delivered': self.delivered,
+                'lost': self.lost}
+
+class Radio(object):
+    def __init__(self, hwaddr):
+        self.hwaddr = hwaddr
+        self.addr = _perm_addr(hwaddr)
+        self.reset()
+
+    def reset(self):
+        self.tx = 0
+        self.acked = 0
+        self.failed = 0
+        self.retries = 0
+
+    def summary(self):
+        return {'tx': self.tx, 'acked': self.acked, 'failed': self.failed,
+                'retries': self.retries}
+
+def _read_addr(path):
+    with open(path) as f:
+        return _addr(f.read().strip())
+
+def _sysfs_radios():
+    """Return {radio address: [addresses]} of the local mac80211_hwsim radios
+
+    The addresses are the permanent address and the addresses of the
+    network interfaces of the radio."""
+    path = '/sys/class/mac80211_hwsim/'
+    radios = {}
+    if not os.path.exists(path):
+        return radios
+    for name in os.listdir(path):
+        try:
+            phys = os.path.join(path, name, 'ieee80211')
+            for phy in os.listdir(phys):
+                addr = _read_addr(os.path.join(phys, phy, 'macaddress'))
+                addrs = [addr]
+                net = os.path.join(path, name, 'net')
+                for ifname in os.listdir(net):
+                    addrs.append(_read_addr(os.path.join(net, ifname,
+                                                         'address')))
+                radios[radio_hwaddr(addr)] = addrs
+        except OSError:
+            # Radio or interface was destroyed while listing
+            pass
+    return radios
+
+class Medium(object):
+    """Forward frames between mac80211_hwsim radios based on a link matrix
+
+    Links that have not been configured use default. Only one medium (or
+    wmediumd) can be registered in a network namespace at a time. The
+    medium is unregistered when it is closed."""
+    def __init__(self, default=None, seed=None, refresh=1.0):
+        self._default = default or Link()
+        self._links = {}
+        self._radios = {}
+        self._addrs = {}
+        self._routes = {}
+        self._link_stats = {}
+        self._queue = []
+        self._qseq = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._refresh_interval = refresh
+        self.overruns = 0
+        self.send_errors = 0
+        self._controller = hwsim.HWSimController()
+        self._fid = self._controller.family
+        self._sock = self._controller.conn.descriptor
+        for force, opt in [(SO_RCVBUFFORCE, socket.SO_RCVBUF),
+                           (SO_SNDBUFFORCE, socket.SO_SNDBUF)]:
+            try:
+                self._sock.setsockopt(socket.SOL_SOCKET, force, 4194304)
+            except OSError:
+                # Forcing the size over the sysctl limit needs CAP_NET_ADMIN
+                self._sock.setsockopt(socket.SOL_SOCKET, opt, 4194304)
+        # Frames sent to radios that are not running are rejected; do not
+        # get the frame echoed back in the error message
+        self._sock.setsockopt(netlink.SOL_NETLINK, NETLINK_CAP_ACK, 1)
+        try:
+            self._controller.register()
+        except Exception:
+            self._controller.close()
+            raise
+        self._refresh_radios()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _hwaddr(self, addr):
+        if isinstance(addr, str):
+            addr = _addr(addr)
+        radio = self._addrs.get(addr)
+        if radio:
+            return radio.hwaddr
+        return radio_hwaddr(addr)
+
+    def set_link(self, tx, rx, loss=None, delay=None, snr=None,
+                 symmetric=True):
+        """Change the parameters of the link from tx to rx
+
+        Parameters that are not specified are left unchanged. With
+        symmetric, the link from rx to tx is changed in the same way."""
+        pairs = [(self._hwaddr(tx), self._hwaddr(rx))]
+        if symmetric:
+            pairs.append((pairs[0][1], pairs[0][0]))
+        with self._lock:
+            for pair in pairs:
+                link = self._links.get(pair, self._default)
+                self._links[pair] = link.replace(loss, delay, snr)
+            self._routes = {}
+
+    def get_link(self, tx, rx):
+        return self._links.get((self._hwaddr(tx), self._hwaddr(rx)),
+                               self._default)
+
+    def set_matrix(self, links, default=None):
+        """Replace all links with {(tx, rx): Link}"""
+        links = dict(((self._hwaddr(tx), self._hwaddr(rx)), link)
+                     for (tx, rx), link in links.items())
+        with self._lock:
+            if default:
+                self._default = default
+            self._links = links
+            self._routes = {}
+
+    def radios(self):
+        return [radio.addr for radio in self._radios.values()]
+
+    def link_stats(self):
+        """Return {(tx, rx): {'frames', 'delivered', 'lost'}}
+
+        frames is the number of transmission attempts over the link."""
+        res = {}
+        for (tx, rx), stats in list(self._link_stats.items()):
+            res[(_perm_addr(tx), _perm_addr(rx))] = stats.summary()
+        return res
+
+    def radio_stats(self):
+        """Return {radio: {'tx', 'acked', 'failed', 'retries'}}"""
+        return dict((radio.addr, radio.summary())
+                    for radio in list(self._radios.values()))
+
+    def reset_stats(self):
+        for stats in list(self._link_stats.values()):
+            stats.reset()
+        for radio in list(self._radios.values()):
+            radio.reset()
+
+    def _refresh_radios(self):
+        sysfs = _sysfs_radios()
+        if not sysfs:
+            return
+        with self._lock:
+            if set(sysfs) != set(self._radios):
+                radios = dict((hw, self._radios.get(hw) or Radio(hw))
+                              for hw in sysfs)
+                self._addrs = dict((addr, radio) for addr, radio in
+                                   self._addrs.items()
+                                   if radio.hwaddr in radios)
+                self._radios = radios
+                self._routes = {}
+            for hw, addrs in sysfs.items():
+                for addr in addrs:
+                    self._addrs[addr] = self._radios[hw]
+
+    def _add_radio(self, hwaddr):
+        with self._lock:
+            radio = Radio(hwaddr)
+            self._radios[hwaddr] = radio
+            self._addrs[_addr(radio.addr)] = radio
+            self._routes = {}
+        return radio
+
+    def _route(self, radio):
+        """Return ([(receiver, link, stats)], {receiver: entry}) of radio"""
+        with self._lock:
+            route = []
+            for rx in self._radios.values():
+                if rx is radio:
+                    continue
+                pair = (radio.hwaddr, rx.hwaddr)
+                stats = self._link_stats.get(pair)
+                if stats is None:
+                    stats = LinkStats()
+                    self._link_stats[pair] = stats
+                route.append((rx, self._links.get(pair, self._default),
+                              stats))
+            entries = dict((entry[0], entry) for entry in route)
+            self._routes[radio.hwaddr] = (route, entries)
+        return route, entries
+
+    def _run(self):
+        buf = bytearray(65536)
+        next_refresh = time.monotonic() + self._refresh_interval
+        while not self._stop:
+            timeout = 0.1
+            if self._queue:
+                timeout = min(timeout,
+                              max(0, self._queue[0][0] - time.monotonic()))
+            r, w, x = select.select([self._sock], [], [], timeout)
+            # Limit the batch so that delayed frames are not held back
+            for i in range(64 if r else 0):
+                try:
+                    length = self._sock.recv_into(buf, len(buf),
+                                                  socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    break
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        self.overruns += 1
+                        continue
+                    raise
+                self._handle(buf, length)
+            now = time.monotonic()
+            while self._queue and self._queue[0][0] <= now:
+                self._send(heapq.heappop(self._queue)[2])
+            if now >= next_refresh:
+                self._refresh_radios()
+                next_refresh = now + self._refresh_interval
+
+    def _send(self, msg):
+        try:
+            self._sock.send(msg)
+        except OSError as e:
+            self.send_errors += 1
+            logger.debug("Medium: could not send frame: " + str(e))
+
+    def _schedule(self, delay, msg):
+        self._qseq += 1
+        heapq.heappush(self._queue, (time.monotonic() + delay, self._qseq,
+                                     msg))
+
+    def _handle(self, buf, length):
+        offset = 0
+        while offset + 20 <= length:
+            msglen, msg_type, flags, seq, pid = _nlmsghdr.unpack_from(buf,
+                                                                      offset)
+            if msglen < 16 or offset + msglen > length:
+                break
+            # NLMSG_ERROR for frames that the kernel rejected (e.g., the
+            # receiving radio is not running) are ignored
+            if msg_type == self._fid:
+                cmd = buf[offset + 16]
+                attrs = {}
+                pos = offset + 20
+                end = offset + msglen
+                while pos + 4 <= end:
+                    alen, atype = _nlattr.unpack_from(buf, pos)
+                    if alen < 4:
+                        break
+                    attrs[atype & netlink.NLA_TYPE_MASK] = (pos + 4, pos + alen)
+                    pos += (alen + 3) & ~3
+                try:
+                    if cmd == HWSIM_CMD_FRAME:
+                        self._frame(buf, attrs)
+                    elif cmd in (HWSIM_CMD_ADD_MAC_ADDR,
+                                 HWSIM_CMD_DEL_MAC_ADDR):
+                        self._mac_addr(buf, attrs,
+                                       cmd == HWSIM_CMD_ADD_MAC_ADDR)
+                except KeyError as e:
+                    logger.info("Medium: missing attribute %s in command %d" %
+                                (str(e), cmd))
+            offset += (msglen + 3) & ~3
+
+    def _mac_addr(self, buf, attrs, add):
+        start = attrs[HWSIM_ATTR_ADDR_TRANSMITTER][0]
+        hwaddr = bytes(buf[start:start + 6])
+        start = attrs[HWSIM_ATTR_ADDR_RECEIVER][0]
+        addr = bytes(buf[start:start + 6])
+        if not add:
+            self._addrs.pop(addr, None)
+            return
+        radio = self._radios.get(hwaddr) or self._add_radio(hwaddr)
+        self._addrs[addr] = radio
+
+    def _rx_msg(self, buf, start, end, freq):
+        """Return (message, offset of RX rate) to deliver a frame"""
+        alen = 4 + end - start
+        rate = _FRAME_OFFSET + ((alen + 3) & ~3)
+        size = rate + 16 + (8 if freq is not None else 0)
+        msg = bytearray(size)
+        _nlmsghdr.pack_into(msg, 0, size, self._fid, netlink.NLM_F_REQUEST,
+                            0, 0)
+        msg[16] = HWSIM_CMD_FRAME
+        _nlattr.pack_into(msg, 20, 10, HWSIM_ATTR_ADDR_RECEIVER)
+        _nlattr.pack_into(msg, _FRAME_OFFSET, alen, HWSIM_ATTR_FRAME)
+        msg[_FRAME_OFFSET + 4:_FRAME_OFFSET + alen] = buf[start:end]
+        _nlattr.pack_into(msg, rate, 8, HWSIM_ATTR_RX_RATE)
+        _nlattr.pack_into(msg, rate + 8, 8, HWSIM_ATTR_SIGNAL)
+        if freq is not None:
+            _nlattr.pack_into(msg, rate + 16, 8, HWSIM_ATTR_FREQ)
+            _u32.pack_into(msg, rate + 20, freq)
+        return msg, rate + 4
+
+    def _deliver(self, msg, rate_offset, rx, link, rate):
+        msg[_ADDR_OFFSET:_ADDR_OFFSET + 6] = rx.hwaddr
+        _u32.pack_into(msg, rate_offset, rate)
+        _s32.pack_into(msg, rate_offset + 8, link.signal)
+        if link.delay > 0:
+            self._schedule(link.delay, bytes(msg))
+        else:
+            self._send(msg)
+
+    def _tx_info_msg(self, hwaddr, flags, cookie, signal, rates):
+        msg = bytearray(_TX_INFO_LEN)
+        _nlmsghdr.pack_into(msg, 0, _TX_INFO_LEN, self._fid,
+                            netlink.NLM_F_REQUEST, 0, 0)
+        msg[16] = HWSIM_CMD_TX_INFO_FRAME
+        _nlattr.pack_into(msg, 20, 10, HWSIM_ATTR_ADDR_TRANSMITTER)
+        msg[_ADDR_OFFSET:_ADDR_OFFSET + 6] = hwaddr
+        pos = _FRAME_OFFSET
+        _nlattr.pack_into(msg, pos, 8, HWSIM_ATTR_FLAGS)
+        _u32.pack_into(msg, pos + 4, flags)
+        _nlattr.pack_into(msg, pos + 8, 12, HWSIM_ATTR_COOKIE)
+        msg[pos + 12:pos + 20] = cookie
+        _nlattr.pack_into(msg, pos + 20, 8, HWSIM_ATTR_SIGNAL)
+        _s32.pack_into(msg, pos + 24, signal)
+        _nlattr.pack_into(msg, pos + 28, 12, HWSIM_ATTR_TX_INFO)
+        _tx_rates.pack_into(msg, pos + 32, *rates)
+        return msg
+
+    def _frame(self, buf, attrs):
+        start = attrs[HWSIM_ATTR_ADDR_TRANSMITTER][0]
+        hwaddr = bytes(buf[start:start + 6])
+        start, end = attrs[HWSIM_ATTR_FRAME]
+        flags = _u32.unpack_from(buf, attrs[HWSIM_ATTR_FLAGS][0])[0]
+        pos = attrs[HWSIM_ATTR_COOKIE][0]
+        cookie = bytes(buf[pos:pos + 8])
+        rates = _tx_rates.unpack_from(buf, attrs[HWSIM_ATTR_TX_INFO][0])
+        freq = attrs.get(HWSIM_ATTR_FREQ)
+        if freq is not None:
+            freq = _u32.unpack_from(buf, freq[0])[0]
+
+        radio = self._radios.get(hwaddr) or self._add_radio(hwaddr)
+        radio.tx += 1
+        if end - start < 10:
+            return
+        dest = None
+        group = buf[start + 4] & 0x01
+        if not group:
+            dest = self._addrs.get(bytes(buf[start + 4:start + 10]))
+        # Learn the interface addresses from the Address 2 field of
+        # Management and Data frames
+        if end - start >= 16 and not buf[start] & 0x04:
+            addr2 = bytes(buf[start + 10:start + 16])
+            if self._addrs.get(addr2) is not radio:
+                self._addrs[addr2] = radio
+
+        route, entries = self._routes.get(hwaddr) or self._route(radio)
+        msg, rate_offset = self._rx_msg(buf, start, end, freq)
+        rnd = self._random.random
+        no_ack = group or (flags & HWSIM_TX_CTL_NO_ACK)
+        dest_entry = entries.get(dest) if dest else None
+        tx_rates = [-1, 0] * IEEE80211_TX_MAX_RATES
+        signal = self._default.signal
+        delay = 0
+        acked = False
+
+        if dest_entry and not no_ack:
+            rx, link, stats = dest_entry
+            signal = link.signal
+            attempts = 0
+            for i in range(IEEE80211_TX_MAX_RATES):
+                idx, count = rates[2 * i], rates[2 * i + 1]
+                if idx < 0 or count == 0:
+                    break
+                used = 0
+                while used < count and not acked:
+                    used += 1
+                    stats.frames += 1
+                    if rnd() < link.loss:
+                        stats.lost += 1
+                    else:
+                        stats.delivered += 1
+                        acked = True
+                tx_rates[2 * i] = idx
+                tx_rates[2 * i + 1] = used
+                attempts += used
+                if acked:
+                    self._deliver(msg, rate_offset, rx, link, idx)
+                    delay = link.delay
+                    break
+            radio.retries += max(0, attempts - 1)
+            receivers = [entry for entry in route if entry is not dest_entry]
+        elif not no_ack:
+            # No radio owns the destination address, so there is nobody to
+            # acknowledge the frame and the whole retry chain is used
+            attempts = 0
+            for i in range(IEEE80211_TX_MAX_RATES):
+                idx, count = rates[2 * i], rates[2 * i + 1]
+                if idx < 0 or count == 0:
+                    break
+                tx_rates[2 * i] = idx
+                tx_rates[2 * i + 1] = count
+                attempts += count
+            radio.retries += max(0, attempts - 1)
+            receivers = route
+        else:
+            # Single attempt without acknowledgment
+            tx_rates[0] = rates[0]
+            tx_rates[1] = 1
+            receivers = route
+
+        # Other radios hear the first attempt
+        rate = max(rates[0], 0)
+        for rx, link, stats in receivers:
+            stats.frames += 1
+            if rnd() < link.loss:
+                stats.lost += 1
+                continue
+            stats.delivered += 1
+            self._deliver(msg, rate_offset, rx, link, rate)
+
+        if not no_ack:
+            if acked:
+                radio.acked += 1
+            else:
+                radio.failed += 1
+        msg = self._tx_info_msg(hwaddr,
+                                flags | (HWSIM_TX_STAT_ACK if acked else 0),
+                                cookie, signal, tx_rates)
+        if delay > 0:
+            self._schedule(delay, msg)
+        else:
+            self._send(msg)
+
+    def close(self):
+        if self._thread:
+            self._stop = True
+            self._thread.join()
+            self._thread = None
+        self._controller.close()
+
+def main():
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description='wireless medium for mac80211_hwsim radios')
+    parser.add_argument('--loss', type=float, default=0.0,
+                        help='default loss probability per transmission attempt')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='default delivery delay in milliseconds')
+    parser.add_argument('--snr', type=int, default=DEFAULT_SNR,
+                        help='default SNR in dB')
+    parser.add_argument('--link', nargs=5, action='append', default=[],
+                        metavar=('<tx>', '<rx>', '<loss>', '<delay>', '<snr>'),
+                        help='parameters of the link from tx to rx (radio addresses); can be used multiple times')
+    parser.add_argument('--seed', type=int, help='random number seed')
+    parser.add_argument('--stats', type=float, default=0, metavar='<seconds>',
+                        help='interval for printing link statistics')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    medium = Medium(Link(args.loss, args.delay / 1000.0, args.snr),
+                    seed=args.seed)
+    for tx, rx, loss, delay, snr in args.link:
+        medium.set_link(tx, rx, float(loss), float(delay) / 1000.0, int(snr),
+                        symmetric=False)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    while not stop.wait(args.stats or None):
+        for (tx, rx), stats in sorted(medium.link_stats().items()):
+            print("%s -> %s frames=%d delivered=%d lost=%d" % (
+                tx, rx, stats['frames'], stats['delivered'], stats['lost']))
+    medium.close()
+    for addr, stats in sorted(medium.radio_stats().items()):
+        print("%s tx=%d acked=%d failed=%d retries=%d" % (
+            addr, stats['tx'], stats['acked'], stats['failed'],
+            stats['retries']))
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ import logging
 logger = logging.getLogger()
 
 from wpasupplicant import WpaSupplicant
+import nl80211_ops
+import traffic
 
 def sync_carrier(dev, ifname=None):
     ifname = ifname or dev.ifname
@@ -232,22 +234,159 @@ def test_connectivity_p2p_sta(dev1, dev2, dscp=None, tos=None):
 def test_connectivity_sta(dev1, dev2, dscp=None, tos=None):
     test_connectivity(dev1, dev2, dscp, tos)
 
+def _data_test_request(dev, group, cmd):
+    if group:
+        return dev.group_request(cmd)
+    return dev.request(cmd)
+
+def connectivity_matrix(devs, groups=None, ifnames=None, dscp=None, tos=None,
+                        broadcast=True, timeout=5, success_expected=True):
+    """Test data connectivity between all pairs of devices concurrently
+
+    Each device is configured for data test frames once, all devices send
+    unicast frames to each other device and a broadcast frame at the same
+    time, and the DATA-TEST-RX events are matched to the sending device by
+    the source address. groups and ifnames are optional per-device lists
+    with the dev*group and ifname* values of test_connectivity().
+
+    Returns {(i, j): True/False} for unicast delivery from devs[i] to
+    devs[j]. An exception listing the failed pairs is raised if any pair
+    failed and success_expected is True (or if any pair succeeded and
+    success_expected is False)."""
+    if dscp:
+        tos = dscp << 2
+    if not tos:
+        tos = 0
+    n = len(devs)
+    groups = groups or [False] * n
+    ifnames = ifnames or [None] * n
+    addrs = [dev.get_addr(group) for dev, group in zip(devs, groups)]
+    if len(set(addrs)) != n:
+        raise Exception("Devices must have distinct addresses")
+    index = dict((addr, i) for i, addr in enumerate(addrs))
+
+    for dev in devs:
+        dev.dump_monitor()
+    configured = []
+    try:
+        for i, dev in enumerate(devs):
+            cmd = "DATA_TEST_CONFIG 1"
+            if ifnames[i]:
+                cmd += " ifname=" + ifnames[i]
+            if "OK" not in _data_test_request(dev, groups[i], cmd):
+                raise Exception("Failed to enable data test functionality")
+            configured.append(i)
+            sync_carrier(dev, ifnames[i])
+
+        for i, dev in enumerate(devs):
+            for j in range(n):
+                if i != j:
+                    _data_test_request(dev, groups[i],
+                                       "DATA_TEST_TX {} {} {}".format(
+                                           addrs[j], addrs[i], tos))
+            if broadcast:
+                _data_test_request(dev, groups[i],
+                                   "DATA_TEST_TX ff:ff:ff:ff:ff:ff {} {}".format(addrs[i], tos))
+
+        unicast = {}
+        bcast = {}
+        end = time.time() + timeout
+        for j, dev in enumerate(devs):
+            missing = n - 1
+            if broadcast:
+                missing *= 2
+            while missing > 0:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    break
+                if groups[j]:
+                    ev = dev.wait_group_event(["DATA-TEST-RX"],
+                                              timeout=remaining)
+                else:
+                    ev = dev.wait_event(["DATA-TEST-RX"], timeout=remaining)
+                if ev is None:
+                    break
+                vals = ev.split("DATA-TEST-RX ", 1)[1].split(' ')
+                dst, src = vals[0], vals[1]
+                i = index.get(src)
+                if i is None or i == j:
+                    continue
+                if dst == addrs[j]:
+                    if (i, j) not in unicast:
+                        unicast[(i, j)] = True
+                        missing -= 1
+                elif dst == "ff:ff:ff:ff:ff:ff" and broadcast:
+                    if (i, j) not in bcast:
+                        bcast[(i, j)] = True
+                        missing -= 1
+    finally:
+        for i in configured:
+            _data_test_request(devs[i], groups[i], "DATA_TEST_CONFIG 0")
+
+    res = {}
+    failed = []
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            res[(i, j)] = (i, j) in unicast
+            if not res[(i, j)]:
+                failed.append("%d->%d unicast" % (i, j))
+            elif broadcast and (i, j) not in bcast:
+                failed.append("%d->%d broadcast" % (i, j))
+    if success_expected and failed:
+        raise Exception("Data delivery failed: " + ', '.join(failed))
+    if not success_expected and any(res.values()):
+        raise Exception("Unexpected connectivity detected")
+    return res
+
+def _data_ifname(dev, group):
+    if group:
+        return dev.group_ifname
+    return dev.ifname
+
+def measure_traffic(dev1, dev2, tos=(0,), count=1000, size=100, burst=32,
+                    rate=None, dev1group=False, dev2group=False,
+                    ifname1=None, ifname2=None):
+    """Send bulk traffic from dev1 to dev2 over AF_PACKET sockets
+
+    A flow of count frames is sent for each TOS value. Returns
+    {tos: traffic.FlowStats} with packets/sec, loss and one-way latency
+    percentiles. Only local devices are supported."""
+    if dev1.hostname is not None or dev2.hostname is not None:
+        raise Exception("Traffic measurement not supported with remote devices")
+    addr1 = dev1.get_addr(dev1group)
+    addr2 = dev2.get_addr(dev2group)
+    ifname1 = ifname1 or _data_ifname(dev1, dev1group)
+    ifname2 = ifname2 or _data_ifname(dev2, dev2group)
+    sync_carrier(dev1, ifname1)
+    sync_carrier(dev2, ifname2)
+    return traffic.measure(ifname1, ifname2, addr2, addr1, tos=tos,
+                           count=count, size=size, burst=burst, rate=rate)
+
 (PS_DISABLED, PS_ENABLED, PS_AUTO_POLL, PS_MANUAL_POLL) = list(range(4))
 
-def set_powersave(dev, val):
-    phy = dev.get_driver_status_field("phyname")
-    fname = '/sys/kernel/debug/ieee80211/%s/hwsim/ps' % phy
+def _write_hwsim_debugfs(dev, phy, name, val):
+    fname = '/sys/kernel/debug/ieee80211/%s/hwsim/%s' % (phy, name)
     data = '%d' % val
+    if dev.hostname is None:
+        try:
+            nl80211_ops.write_debugfs(fname, data)
+            return True
+        except OSError as e:
+            logger.info("Failed to write %s: %s" % (fname, str(e)))
+            return False
     (res, data) = dev.cmd_execute(["echo", data, ">", fname], shell=True)
-    if res != 0:
+    return res == 0
+
+def set_powersave(dev, val):
+    phy = dev.get_driver_status_field("phyname")
+    if not _write_hwsim_debugfs(dev, phy, 'ps', val):
         raise Exception("Failed to set power save for device")
 
 def set_group_map(dev, val):
     phy = dev.get_driver_status_field("phyname")
-    fname = '/sys/kernel/debug/ieee80211/%s/hwsim/group' % phy
-    data = '%d' % val
-    (res, data) = dev.cmd_execute(["echo", data, ">", fname], shell=True)
-    if res != 0:
+    if not _write_hwsim_debugfs(dev, phy, 'group', val):
         raise Exception("Failed to set group map for %s" % phy)
 
 def set_rx_rssi(dev, val):
@@ -259,6 +398,12 @@ def set_rx_rssi(dev, val):
     """
     tx_power = (val + 50) * 100
     ifname = dev.get_driver_status_field("ifname")
+    if dev.hostname is None:
+        try:
+            nl80211_ops.set_txpower(ifname, tx_power)
+        except OSError as e:
+            raise Exception("Failed to set RSSI to %d: %s" % (val, str(e)))
+        return
     (res, data) = dev.cmd_execute(['iw', ifname, 'set', 'txpower',
                                    'fixed', str(tx_power)])
     if res != 0:
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+#
+# Sidecar indexes for hostapd/wpa_supplicant/wlantest debug logs
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import bisect
+import heapq
+import json
+import os
+import re
+import zlib
+
+import logging
+logger = logging.getLogger()
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx'
+
+# A (timestamp, offset) sample is stored for the first timestamped line
+# after every TIME_SAMPLE_BYTES bytes of log
+TIME_SAMPLE_BYTES = 16384
+
+_addr_re = re.compile(rb'[0-9a-f]{2}(?::[0-9a-f]{2}){5}')
+_event_re = re.compile(rb'(?:<[0-9]>)?([A-Z][A-Z0-9]*(?:-[A-Z0-9]+)+)\b')
+_ifname_res = [re.compile(rb'received for ([^\s]+)$'),
+               re.compile(rb"Initializing interface '([^']+)'"),
+               re.compile(rb'^([^\s:]+): interface state ')]
+# hostapd_logger(): "<ifname>: STA <addr> <module>: <message>"
+_sta_re = re.compile(rb'STA [0-9a-f:]{17} ([^:]+): ')
+# Debug logs that run-tests.py renames to "<test>.<log>[-<num>]"
+_text_log_re = re.compile(r'(?:^|\.)(?:hostapd|hwsim0|log[0-9]+|fst-hostapd|'
+                          r'fst-wpa_supplicant|wmediumd\.log)(?:-[0-9]+)?$')
+
+def index_name(path):
+    return path + INDEX_SUFFIX
+
+def _token(buf):
+    """Return the leading "<token>: " of buf as (token, rest) if present"""
+    tok, sep, rest = buf.partition(b': ')
+    if not sep or not tok or len(tok) > 32 or b' ' in tok:
+        return None, buf
+    return tok, rest
+
+def parse_line(line, ifnames):
+    """Return (timestamp, ifname, tag, addrs) for a log line
+
+    tag is the debug message module prefix (e.g., "WPA", "nl80211") or an
+    event name (e.g., "CTRL-EVENT-CONNECTED"). ifnames is the set of known
+    interface names; it is extended based on the line contents.
+    """
+    ts = None
+    ifname = None
+    tag = None
+    rest = line
+    tok, tail = _token(rest)
+    if tok:
+        try:
+            ts = float(tok)
+            rest = tail
+        except ValueError:
+            pass
+
+    for r in _ifname_res:
+        m = r.search(rest)
+        if m:
+            ifnames.add(m.group(1))
+
+    tok, tail = _token(rest)
+    if tok:
+        tok2 = _token(tail)[0]
+        m = _sta_re.match(tail) if tok2 is None else None
+        if m:
+            ifnames.add(tok)
+            tok2 = m.group(1)
+        if tok in ifnames or tok2:
+            ifname = tok
+            if tok2 and tok not in ifnames:
+                ifnames.add(tok)
+            rest = tail
+            if tok2:
+                tag = tok2
+        else:
+            tag = tok
+    if tag is None:
+        m = _event_re.match(rest)
+        if m:
+            tag = m.group(1)
+
+    addrs = set(_addr_re.findall(rest)) if b':' in rest else ()
+    return ts, ifname, tag, addrs
+
+class LogIndex(object):
+    """Sidecar index of a debug log file
+
+    The index maps keys ("if:<ifname>", "tag:<tag>", "addr:<MAC address>")
+    to the byte offsets of the matching lines and stores sampled timestamp
+    to byte offset pairs for seeking to a time range. It is stored as
+    zlib-compressed JSON with delta-encoded offsets in <log>.idx and can be
+    updated incrementally when more lines have been appended to the log.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.ifnames = set()
+        self.times = []
+        self.offsets = []
+        self.keys = {}
+        self._last_sample = -TIME_SAMPLE_BYTES
+
+    def _load(self):
+        with open(index_name(self.path), 'rb') as f:
+            data = json.loads(zlib.decompress(f.read()))
+        if data.get('version') != INDEX_VERSION:
+            raise Exception("Unsupported log index version")
+        self.size = data['size']
+        self.ifnames = set(n.encode() for n in data['ifnames'])
+        self.times = data['times']
+        self.offsets = _undelta(data['offsets'])
+        self.keys = {k: _undelta(v) for k, v in data['keys'].items()}
+        self._last_sample = self.offsets[-1] if self.offsets else \
+            -TIME_SAMPLE_BYTES
+
+    def save(self):
+        data = {'version': INDEX_VERSION,
+                'size': self.size,
+                'ifnames': sorted(n.decode(errors='replace')
+                                  for n in self.ifnames),
+                'times': self.times,
+                'offsets': _delta(self.offsets),
+                'keys': {k: _delta(v) for k, v in self.keys.items()}}
+        tmp = index_name(self.path) + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(zlib.compress(json.dumps(data,
+                                             separators=(',', ':')).encode()))
+        os.rename(tmp, index_name(self.path))
+
+    def _add(self, key, offset):
+        self.keys.setdefault(key, []).append(offset)
+
+    def update(self):
+        """Index the lines appended to the log since the previous update
+
+        Only complete lines are indexed. Returns the number of new lines."""
+        count = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.size)
+            offset = self.size
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                ts, ifname, tag, addrs = parse_line(line.rstrip(b'\r\n'),
+                                                    self.ifnames)
+                if ts is not None and \
+                   offset - self._last_sample >= TIME_SAMPLE_BYTES:
+                    self.times.append(ts)
+                    self.offsets.append(offset)
+                    self._last_sample = offset
+                if ifname:
+                    self._add('if:' + ifname.decode(errors='replace'), offset)
+                if tag:
+                    self._add('tag:' + tag.decode(errors='replace'), offset)
+                for addr in addrs:
+                    self._add('addr:' + addr.decode(), offset)
+                offset += len(line)
+                count += 1
+        self.size = offset
+        return count
+
+    def byte_range(self, start=None, end=None):
+        """Return (first, last) byte offsets that cover the time range"""
+        first = 0
+        last = self.size
+        if start is not None and self.times:
+            i = bisect.bisect_left(self.times, start)
+            if i > 0:
+                first = self.offsets[i - 1]
+        if end is not None and self.times:
+            i = bisect.bisect_right(self.times, end)
+            if i < len(self.offsets):
+                last = self.offsets[i]
+        return first, last
+
+    def lookup(self, ifname=None, tag=None, addr=None):
+        """Return sorted offsets of the lines matching all the given keys
+
+        None is returned if no key was specified."""
+        keys = []
+        if ifname:
+            keys.append('if:' + ifname)
+        if tag:
+            keys.append('tag:' + tag)
+        if addr:
+            keys.append('addr:' + addr.lower())
+        if not keys:
+            return None
+        lists = sorted([self.keys.get(k, []) for k in keys], key=len)
+        res = lists[0]
+        for other in lists[1:]:
+            other = set(other)
+            res = [o for o in res if o in other]
+        return res
+
+    def lines(self, ifname=None, tag=None, addr=None, start=None, end=None,
+              contains=None):
+        """Iterate over (timestamp, line) of the matching lines
+
+        Lines are located with the index and read by seeking into the log
+        file. Lines without a timestamp are included only if no time range
+        was specified."""
+        first, last = self.byte_range(start, end)
+        offsets = self.lookup(ifname, tag, addr)
+        if isinstance(contains, str):
+            contains = contains.encode()
+        with open(self.path, 'rb') as f:
+            if offsets is None:
+                lines = _scan(f, first, last)
+            else:
+                lo = bisect.bisect_left(offsets, first)
+                hi = bisect.bisect_left(offsets, last)
+                lines = _seek(f, offsets[lo:hi])
+            for line in lines:
+                line = line.rstrip(b'\r\n')
+                if contains is not None and contains not in line:
+                    continue
+                ts = _line_time(line)
+                if start is not None or end is not None:
+                    if ts is None:
+                        continue
+                    if start is not None and ts < start:
+                        continue
+                    if end is not None and ts > end:
+                        continue
+                yield ts, line.decode(errors='replace')
+
+def _scan(f, first, last):
+    f.seek(first)
+    pos = first
+    while pos < last:
+        line = f.readline()
+        if not line:
+            break
+        pos += len(line)
+        yield line
+
+def _seek(f, offsets):
+    for offset in offsets:
+        f.seek(offset)
+        yield f.readline()
+
+def _line_time(line):
+    tok, sep, rest = line.partition(b': ')
+    if not sep:
+        return None
+    try:
+        return float(tok)
+    except ValueError:
+        return None
+
+def _delta(vals):
+    prev = 0
+    res = []
+    for v in vals:
+        res.append(v - prev)
+        prev = v
+    return res
+
+def _undelta(vals):
+    total = 0
+    res = []
+    for v in vals:
+        total += v
+        res.append(total)
+    return res
+
+def update_index(path):
+    """Create or incrementally update the sidecar index of a log file"""
+    idx = LogIndex(path)
+    if os.path.exists(index_name(path)):
+        try:
+            idx._load()
+            if idx.size > os.path.getsize(path):
+                # Log was truncated or replaced; start from scratch
+                idx = LogIndex(path)
+        except Exception as e:
+            logger.info("Rebuilding log index for %s: %s" % (path, str(e)))
+            idx = LogIndex(path)
+    if idx.update() or not os.path.exists(index_name(path)):
+        idx.save()
+    return idx
+
+def load_index(path):
+    """Return an up-to-date LogIndex for a log file"""
+    return update_index(path)
+
+def is_text_log(path):
+    """Check whether path is one of the debug logs renamed by run-tests.py
+
+    These are "<test>.<log>" or "<test>.<log>-<num>" (or just "<log>" before
+    the rename) for the hostapd, wpa_supplicant, wlantest, FST and wmediumd
+    debug logs."""
+    return _text_log_re.search(os.path.basename(path)) is not None
+
+def query(paths, ifname=None, tag=None, addr=None, start=None, end=None,
+          contains=None):
+    """Iterate over (timestamp, path, line) of matching lines from all logs
+
+    Lines with timestamps are returned in timestamp order across logs."""
+    iters = []
+    for path in paths:
+        idx = load_index(path)
+        lines = idx.lines(ifname, tag, addr, start, end, contains)
+        iters.append(((ts if ts is not None else 0, path, line)
+                      for ts, line in lines))
+    return heapq.merge(*iters, key=lambda x: x[0])
+
+def test_logs(logdir, testname):
+    """Return the text log files of a test case in a log directory"""
+    prefix = testname + '.'
+    return sorted(os.path.join(logdir, f) for f in os.listdir(logdir)
+                  if f.startswith(prefix) and is_text_log(f))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='index and query hwsim test debug logs')
+    parser.add_argument('--build', action='store_true',
+                        help='only build/update the indexes')
+    parser.add_argument('--logdir', metavar='<directory>',
+                        help='log directory used with --test')
+    parser.add_argument('--test', metavar='<test case>',
+                        help='query all logs of a test case in --logdir')
+    parser.add_argument('--ifname', metavar='<interface>')
+    parser.add_argument('--tag', metavar='<tag>',
+                        help='debug message prefix or event name, e.g., WPA or CTRL-EVENT-CONNECTED')
+    parser.add_argument('--addr', metavar='<MAC address>')
+    parser.add_argument('--grep', metavar='<string>',
+                        help='only show lines containing the string')
+    parser.add_argument('--from', dest='start', type=float, metavar='<time>')
+    parser.add_argument('--to', dest='end', type=float, metavar='<time>')
+    parser.add_argument('logs', metavar='<log file>', nargs='*')
+    args = parser.parse_args()
+
+    paths = [p for p in args.logs if is_text_log(p)]
+    if args.test:
+        paths += test_logs(args.logdir or '.', args.test)
+    if not paths:
+        parser.error("no log files specified")
+
+    if args.build:
+        for path in paths:
+            update_index(path)
+        return
+
+    for ts, path, line in query(paths, args.ifname, args.tag, args.addr,
+                                args.start, args.end, args.grep):
+        print("%s: %s" % (os.path.basename(path), line))
+
+if __name__ == "__main__":
+    main()
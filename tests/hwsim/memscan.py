@@ -0,0 +1,216 @@
+# Streaming search for keys in process memory
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Search the writable memory of a process for key material
+
+The memory is read from /proc/<pid>/mem in fixed size chunks and all the
+patterns are searched for in a single pass. Consecutive chunks overlap by
+the length of the longest pattern minus one, so matches crossing a chunk
+boundary are found. Only the match offsets and a context window around
+each match are kept. Offsets refer to the concatenation of the scanned
+memory areas.
+"""
+
+import re
+import tempfile
+
+import logging
+logger = logging.getLogger()
+
+CHUNK_SIZE = 1024 * 1024
+CONTEXT = 2048
+# Larger areas are assumed to be ASAN shadow memory
+MAX_AREA = 256 * 1024 * 1024
+
+_maps_re = re.compile(r'([0-9a-f]+)-([0-9a-f]+) ([-r][-w][-x][-p])')
+
+class Hit(object):
+    def __init__(self, offset, before, after):
+        self.offset = offset
+        self.before = before
+        self.after = after
+
+class ScanResult(object):
+    """Locations of the patterns in the scanned memory"""
+    def __init__(self, patterns):
+        self.hits = dict((p, []) for p in patterns)
+        self.size = 0
+
+    def locations(self, key):
+        if key not in self.hits:
+            raise Exception("Key was not included in the memory scan")
+        return self.hits[key]
+
+    def __contains__(self, key):
+        return len(self.locations(key)) > 0
+
+    def find(self, key, start=0):
+        for hit in self.locations(key):
+            if hit.offset >= start:
+                return hit.offset
+        return -1
+
+class _Scanner(object):
+    def __init__(self, patterns, context):
+        patterns = [p for p in set(patterns) if p]
+        self.result = ScanResult(patterns)
+        self._patterns = sorted(patterns, key=len, reverse=True)
+        self._maxlen = max([len(p) for p in patterns] + [1])
+        self._re = re.compile(b'|'.join(re.escape(p) for p in self._patterns)) \
+            if patterns else None
+        self._context = context
+        self._tail = b''
+        self._history = b''
+        self._pending = []
+        self._offset = 0
+
+    def feed(self, data):
+        """Process the next chunk of the memory stream"""
+        # Complete the trailing context of earlier matches
+        pending = []
+        for hit, need in self._pending:
+            hit.after += data[:need]
+            if need > len(data):
+                pending.append((hit, need - len(data)))
+        self._pending = pending
+
+        if self._re is None:
+            self._offset += len(data)
+            return
+        tail = self._tail
+        window = tail + data
+        base = self._offset - len(tail)
+        pos = 0
+        while True:
+            m = self._re.search(window, pos)
+            if not m:
+                break
+            pos = m.start()
+            for p in self._patterns:
+                if window.startswith(p, pos) and pos + len(p) > len(tail):
+                    self._add_hit(p, window, pos, base)
+            pos += 1
+        self._history = (self._history + data)[-(self._context +
+                                                 self._maxlen):]
+        self._tail = window[-(self._maxlen - 1):] if self._maxlen > 1 else b''
+        self._offset += len(data)
+
+    def _add_hit(self, p, window, pos, base):
+        if pos >= self._context:
+            before = window[pos - self._context:pos]
+        else:
+            # The stream data preceding window is in history; its last
+            # len(tail) bytes are the start of window
+            prev = self._history[:len(self._history) - len(self._tail)]
+            before = prev[max(0, len(prev) - (self._context - pos)):] + \
+                window[:pos]
+        end = pos + len(p)
+        after = window[end:end + self._context]
+        hit = Hit(base + pos, before, after)
+        self.result.hits[p].append(hit)
+        if len(after) < self._context:
+            self._pending.append((hit, self._context - len(after)))
+
+    def close(self):
+        self.result.size = self._offset
+        return self.result
+
+def memory_areas(pid):
+    """Iterate over (start, end, maps line) of the writable memory areas"""
+    with open('/proc/%d/maps' % pid, 'r') as maps:
+        for l in maps:
+            m = _maps_re.match(l)
+            if not m:
+                continue
+            start = int(m.group(1), 16)
+            end = int(m.group(2), 16)
+            perm = m.group(3)
+            if start > 0xffffffffffff:
+                continue
+            if end < start:
+                continue
+            if not perm.startswith('rw'):
+                continue
+            if end - start >= MAX_AREA:
+                logger.info("Large memory block of >= 256MiB, assuming ASAN shadow memory")
+                continue
+            yield start, end, l.strip()
+
+def read_chunks(pid, chunk_size=CHUNK_SIZE):
+    """Iterate over (maps line, data) chunks of the writable memory"""
+    total = 0
+    with open('/proc/%d/mem' % pid, 'rb', buffering=0) as mem:
+        for start, end, line in memory_areas(pid):
+            for name in ["[heap]", "[stack]"]:
+                if name in line:
+                    logger.info("%s 0x%x-0x%x is at %d-%d" % (name, start, end, total, total + (end - start)))
+            pos = start
+            while pos < end:
+                try:
+                    mem.seek(pos)
+                    data = mem.read(min(chunk_size, end - pos))
+                except OSError as e:
+                    logger.info("Could not read mem: start=%d end=%d: %s" % (pos, end, str(e)))
+                    break
+                if not data:
+                    break
+                total += len(data)
+                pos += len(data)
+                yield line, data
+    logger.info("Total process memory read: %d bytes" % total)
+
+def scan_chunks(chunks, patterns, context=CONTEXT):
+    """Search an iterable of (label, data) chunks and return ScanResult"""
+    scanner = _Scanner(patterns, context)
+    found = set()
+    for label, data in chunks:
+        before = dict((p, len(h)) for p, h in scanner.result.hits.items())
+        scanner.feed(data)
+        for p, hits in scanner.result.hits.items():
+            if len(hits) > before[p] and (p, label) not in found:
+                found.add((p, label))
+                logger.debug("Key found in " + label)
+    return scanner.close()
+
+def scan_process(pid, patterns, context=CONTEXT, chunk_size=CHUNK_SIZE):
+    """Search the writable memory of a process for all patterns"""
+    return scan_chunks(read_chunks(pid, chunk_size), patterns, context)
+
+class Snapshot(object):
+    """Process memory stored in a temporary file
+
+    This can be used when the patterns are not yet known when the memory
+    needs to be read. The file is removed when the snapshot is closed or
+    garbage collected."""
+    def __init__(self, pid, chunk_size=CHUNK_SIZE):
+        self._file = tempfile.TemporaryFile(prefix='memscan-')
+        self._chunk_size = chunk_size
+        for line, data in read_chunks(pid, chunk_size):
+            self._file.write(data)
+
+    def _chunks(self):
+        self._file.seek(0)
+        while True:
+            data = self._file.read(self._chunk_size)
+            if not data:
+                break
+            yield 'snapshot', data
+
+    def scan(self, patterns, context=CONTEXT):
+        """Search the snapshot for all patterns and close it"""
+        try:
+            return scan_chunks(self._chunks(), patterns, context)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def snapshot_process(pid, chunk_size=CHUNK_SIZE):
+    return Snapshot(pid, chunk_size)
@@ -7,12 +7,22 @@
 # See README for more details.
 
 import struct, socket
+import collections
+import errno
+import os
 
 # flags
 NLM_F_REQUEST = 1
 NLM_F_MULTI = 2
 NLM_F_ACK = 4
 NLM_F_ECHO = 8
+NLM_F_DUMP_INTR = 16
+
+# flags for GET requests
+NLM_F_ROOT = 0x100
+NLM_F_MATCH = 0x200
+NLM_F_ATOMIC = 0x400
+NLM_F_DUMP = NLM_F_ROOT | NLM_F_MATCH
 
 # types
 NLMSG_NOOP	= 1
@@ -21,7 +31,22 @@ NLMSG_DONE	= 3
 NLMSG_OVERRUN	= 4
 NLMSG_MIN_TYPE	= 0x10
 
+# attribute type flags
+NLA_F_NESTED = 0x8000
+NLA_F_NET_BYTEORDER = 0x4000
+NLA_TYPE_MASK = ~(NLA_F_NESTED | NLA_F_NET_BYTEORDER) & 0xffff
+
+_nlattr = struct.Struct("HH")
+_nlmsghdr = struct.Struct("IHHII")
+
+def _align(length):
+    return (length + 4 - 1) & ~3
+
 class Attr(object):
+    """Netlink attribute
+
+    Received attributes refer to the message buffer through a memoryview, so
+    no data is copied until a value is requested."""
     def __init__(self, attr_type, data, *values):
         self._type = attr_type
         if len(values):
@@ -29,29 +54,45 @@ class Attr(object):
         else:
             self._data = data
 
-    def _dump(self):
-        hdr = struct.pack("HH", len(self._data) + 4, self._type)
+    def _size(self):
+        return _align(len(self._data) + 4)
+
+    def _pack_into(self, buf, offset):
         length = len(self._data)
-        pad = ((length + 4 - 1) & ~3) - length
-        return hdr + self._data + b'\x00' * pad
+        _nlattr.pack_into(buf, offset, length + 4, self._type)
+        buf[offset + 4:offset + 4 + length] = self._data
+        return offset + _align(length + 4)
+
+    def _dump(self):
+        buf = bytearray(self._size())
+        self._pack_into(buf, 0)
+        return bytes(buf)
 
     def __repr__(self):
-        return '<Attr type %d, data "%s">' % (self._type, repr(self._data))
+        return '<Attr type %d, data "%s">' % (self._type, repr(bytes(self._data)))
 
+    def u8(self):
+        return struct.unpack_from('B', self._data)[0]
     def u16(self):
-        return struct.unpack('H', self._data)[0]
+        return struct.unpack_from('H', self._data)[0]
     def s16(self):
-        return struct.unpack('h', self._data)[0]
+        return struct.unpack_from('h', self._data)[0]
     def u32(self):
-        return struct.unpack('I', self._data)[0]
+        return struct.unpack_from('I', self._data)[0]
     def s32(self):
-        return struct.unpack('i', self._data)[0]
+        return struct.unpack_from('i', self._data)[0]
+    def u64(self):
+        return struct.unpack_from('Q', self._data)[0]
+    def flag(self):
+        return True
     def str(self):
-        return self._data
+        return bytes(self._data)
     def nulstr(self):
-        return self._data.split('\0')[0]
+        return bytes(self._data).split(b'\0')[0]
     def nested(self):
         return parse_attributes(self._data)
+    def nested_list(self):
+        return [attr for attr_type, attr in iter_attributes(self._data)]
 
 class StrAttr(Attr):
     def __init__(self, attr_type, data):
@@ -65,6 +106,10 @@ class U32Attr(Attr):
     def __init__(self, attr_type, val):
         Attr.__init__(self, attr_type, "I", val)
 
+class U16Attr(Attr):
+    def __init__(self, attr_type, val):
+        Attr.__init__(self, attr_type, "H", val)
+
 class U8Attr(Attr):
     def __init__(self, attr_type, val):
         Attr.__init__(self, attr_type, "B", val)
@@ -77,15 +122,33 @@ class Nested(Attr):
     def __init__(self, attr_type, attrs):
         self.attrs = attrs
         self.type = attr_type
+        self._type = attr_type
 
-    def _dump(self):
-        contents = []
-        for attr in self.attrs:
-            contents.append(attr._dump())
-        contents = ''.join(contents)
-        length = len(contents)
-        hdr = struct.pack("HH", length+4, self.type)
-        return hdr + contents
+    def _size(self):
+        return 4 + attributes_size(self.attrs)
+
+    def _pack_into(self, buf, offset):
+        end = pack_attributes_into(buf, offset + 4, self.attrs)
+        _nlattr.pack_into(buf, offset, end - offset, self._type)
+        return end
+
+def attributes_size(attrs):
+    return sum(attr._size() for attr in attrs)
+
+def pack_attributes_into(buf, offset, attrs):
+    """Serialize attrs into buf at offset and return the end offset
+
+    buf must be large enough (see attributes_size()) and zero initialized
+    since padding is not written."""
+    for attr in attrs:
+        offset = attr._pack_into(buf, offset)
+    return offset
+
+def encode_attributes(attrs):
+    """Return attrs serialized into a preallocated bytearray"""
+    buf = bytearray(attributes_size(attrs))
+    pack_attributes_into(buf, 0, attrs)
+    return buf
 
 NETLINK_ROUTE = 0
 NETLINK_UNUSED = 1
@@ -113,9 +176,7 @@ class Message(object):
         self.pid = -1
         payload = payload or []
         if isinstance(payload, list):
-            self.payload = bytes()
-            for attr in payload:
-                self.payload += attr._dump()
+            self.payload = encode_attributes(payload)
         else:
             self.payload = payload
 
@@ -126,18 +187,18 @@ class Message(object):
         self.pid = conn.pid
         length = len(self.payload)
 
-        hdr = struct.pack("IHHII", length + 4*4, self.type,
-                          self.flags, self.seq, self.pid)
+        hdr = _nlmsghdr.pack(length + 4*4, self.type,
+                             self.flags, self.seq, self.pid)
         conn.send(hdr + self.payload)
 
     def __repr__(self):
         return '<netlink.Message type=%d, pid=%d, seq=%d, flags=0x%x "%s">' % (
-            self.type, self.pid, self.seq, self.flags, repr(self.payload))
+            self.type, self.pid, self.seq, self.flags, repr(bytes(self.payload)))
 
     @property
     def ret(self):
         assert self.type == NLMSG_ERROR
-        return struct.unpack("i", self.payload[:4])[0]
+        return struct.unpack_from("i", self.payload)[0]
 
     def send_and_recv(self, conn):
         self.send(conn)
@@ -146,6 +207,11 @@ class Message(object):
             if m.seq == self.seq:
                 return m
 
+def _netlink_error(err):
+    e = OSError("Netlink error: %s (%d)" % (os.strerror(-err), -err))
+    e.errno = -err
+    return e
+
 class Connection(object):
     def __init__(self, nltype, groups=0, unexpected_msg_handler=None):
         self.descriptor = socket.socket(socket.AF_NETLINK,
@@ -155,38 +221,114 @@ class Connection(object):
         self.descriptor.bind((0, groups))
         self.pid, self.groups = self.descriptor.getsockname()
         self._seq = 0
+        self._pending = collections.deque()
+        self._peek = bytearray(16)
         self.unexpected = unexpected_msg_handler
     def send(self, msg):
         self.descriptor.send(msg)
+    def add_membership(self, group):
+        """Join a multicast group by id (e.g., a generic netlink group)"""
+        self.descriptor.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group)
+    def fileno(self):
+        return self.descriptor.fileno()
+    def close(self):
+        self.descriptor.close()
+    def _recv_datagram(self):
+        # Peek with MSG_TRUNC to get the full datagram length, so that the
+        # buffer can be sized to fit it
+        length = self.descriptor.recv_into(self._peek, len(self._peek),
+                                           socket.MSG_PEEK | socket.MSG_TRUNC)
+        buf = bytearray(max(length, len(self._peek)))
+        length = self.descriptor.recv_into(buf)
+        return memoryview(buf)[:length]
+    def recv_messages(self):
+        """Receive one datagram and return the netlink messages in it"""
+        data = self._recv_datagram()
+        msgs = []
+        offset = 0
+        while offset + 16 <= len(data):
+            msglen, msg_type, flags, seq, pid = _nlmsghdr.unpack_from(data,
+                                                                      offset)
+            if msglen < 16 or offset + msglen > len(data):
+                raise Exception("Invalid netlink message length %d" % msglen)
+            msg = Message(msg_type, flags, seq,
+                          data[offset + 16:offset + msglen])
+            msg.pid = pid
+            msgs.append(msg)
+            offset += (msglen + 3) & ~3
+        return msgs
     def recv(self):
-        contents = self.descriptor.recv(16384)
-        # XXX: python doesn't give us message flags, check
-        #      len(contents) vs. msglen for TRUNC
-        msglen, msg_type, flags, seq, pid = struct.unpack("IHHII",
-                                                          contents[:16])
-        msg = Message(msg_type, flags, seq, contents[16:])
-        msg.pid = pid
+        while not self._pending:
+            self._pending.extend(self.recv_messages())
+        msg = self._pending.popleft()
         if msg.type == NLMSG_ERROR:
-            import os
-            errno = msg.ret
-            if errno < 0:
-                err = OSError("Netlink error: %s (%d)" % (
-                    os.strerror(-errno), -errno))
-                err.errno = -errno
-                raise err
+            err = msg.ret
+            if err < 0:
+                raise _netlink_error(err)
         return msg
+    def recv_all(self, seq, ack=False):
+        """Iterate over the response messages to the request seq
+
+        A multipart response is followed until NLMSG_DONE. Otherwise, the
+        iteration ends after the first response message or, if ack is set,
+        after the acknowledgement. Messages for other requests (e.g.,
+        multicast notifications) are passed to the unexpected message
+        handler, if any. OSError is raised for a netlink error and with
+        EINTR at the end of a dump that was interrupted by changes in the
+        dumped data."""
+        interrupted = False
+        while True:
+            msg = self.recv()
+            if msg.seq != seq:
+                if self.unexpected:
+                    self.unexpected(msg)
+                continue
+            if msg.flags & NLM_F_DUMP_INTR:
+                interrupted = True
+            if msg.type == NLMSG_DONE:
+                if len(msg.payload) >= 4:
+                    err = struct.unpack_from("i", msg.payload)[0]
+                    if err < 0:
+                        raise _netlink_error(err)
+                break
+            if msg.type == NLMSG_ERROR:
+                # acknowledgement; errors are raised in recv()
+                break
+            yield msg
+            if not (msg.flags & NLM_F_MULTI) and not ack:
+                break
+        if interrupted:
+            raise _netlink_error(-errno.EINTR)
+    def dump(self, msg):
+        """Send msg as a dump request and iterate over the responses"""
+        msg.flags |= NLM_F_REQUEST | NLM_F_DUMP
+        msg.send(self)
+        return self.recv_all(msg.seq)
     def seq(self):
         self._seq += 1
         return self._seq
 
+def iter_attributes(data, offset=0, end=None):
+    """Iterate over (type, Attr) of the attributes in data
+
+    The attributes are walked by offset over a memoryview of data, so the
+    cost is linear in the message length and the Attr values are not
+    copied. Nested attributes are decoded only when requested with
+    Attr.nested()."""
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    if end is None:
+        end = len(view)
+    while offset + 4 <= end:
+        attr_len, attr_type = _nlattr.unpack_from(view, offset)
+        if attr_len < 4 or offset + attr_len > end:
+            raise Exception("Invalid netlink attribute length %d at offset %d" %
+                            (attr_len, offset))
+        attr_type &= NLA_TYPE_MASK
+        yield attr_type, Attr(attr_type, view[offset + 4:offset + attr_len])
+        offset += _align(attr_len)
+
 def parse_attributes(data):
-    attrs = {}
-    while len(data):
-        attr_len, attr_type = struct.unpack("HH", data[:4])
-        attrs[attr_type] = Attr(attr_type, data[4:attr_len])
-        attr_len = ((attr_len + 4 - 1) & ~3)
-        data = data[attr_len:]
-    return attrs
+    return dict(iter_attributes(data))
 
 
 
@@ -205,16 +347,33 @@ CTRL_ATTR_VERSION = 3
 CTRL_ATTR_HDRSIZE = 4
 CTRL_ATTR_MAXATTR = 5
 CTRL_ATTR_OPS = 6
+CTRL_ATTR_MCAST_GROUPS = 7
+
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+NETLINK_DROP_MEMBERSHIP = 2
 
 class GenlHdr(object):
     def __init__(self, cmd, version=0):
         self.cmd = cmd
         self.version = version
+    def _size(self):
+        return 4
+    def _pack_into(self, buf, offset):
+        struct.pack_into("BBxx", buf, offset, self.cmd, self.version)
+        return offset + 4
     def _dump(self):
         return struct.pack("BBxx", self.cmd, self.version)
 
 def _genl_hdr_parse(data):
-    return GenlHdr(*struct.unpack("BBxx", data))
+    return GenlHdr(*struct.unpack_from("BBxx", data))
+
+def genl_parse(msg):
+    """Return (GenlHdr, {type: Attr}) of a received generic netlink message"""
+    return _genl_hdr_parse(msg.payload), parse_attributes(msg.payload[4:])
 
 GENL_ID_CTRL = NLMSG_MIN_TYPE
 
@@ -225,13 +384,26 @@ class GenlMessage(Message):
 class GenlController(object):
     def __init__(self, conn):
         self.conn = conn
-    def get_family_id(self, family):
+    def _get_family(self, family):
         a = NulStrAttr(CTRL_ATTR_FAMILY_NAME, family)
         m = GenlMessage(GENL_ID_CTRL, CTRL_CMD_GETFAMILY, flags=NLM_F_REQUEST, attrs=[a])
         m.send(self.conn)
         m = self.conn.recv()
-        gh = _genl_hdr_parse(m.payload[:4])
-        attrs = parse_attributes(m.payload[4:])
+        gh = _genl_hdr_parse(m.payload)
+        return parse_attributes(m.payload[4:])
+    def get_family_id(self, family):
+        attrs = self._get_family(family)
         return attrs[CTRL_ATTR_FAMILY_ID].u16()
+    def get_mcast_groups(self, family):
+        """Return {group name: group id} of the family's multicast groups"""
+        attrs = self._get_family(family)
+        groups = {}
+        if CTRL_ATTR_MCAST_GROUPS not in attrs:
+            return groups
+        for grp in attrs[CTRL_ATTR_MCAST_GROUPS].nested_list():
+            grp = grp.nested()
+            name = grp[CTRL_ATTR_MCAST_GRP_NAME].nulstr().decode()
+            groups[name] = grp[CTRL_ATTR_MCAST_GRP_ID].u32()
+        return groups
 
 genl_controller = GenlController(Connection(NETLINK_GENERIC))
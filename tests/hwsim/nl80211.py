@@ -344,14 +344,14 @@ def build_nl80211_attr_mac(id, val):
 
 def parse_nl80211_attrs(msg):
     attrs = {}
-    while len(msg) >= 4:
-        alen, attr = struct.unpack("@HH", msg[0:4])
+    view = memoryview(msg)
+    pos = 0
+    while len(view) - pos >= 4:
+        alen, attr = struct.unpack_from("@HH", view, pos)
         if alen < 4:
             raise Exception("Too short nl80211 attribute")
-        alen -= 4
-        msg = msg[4:]
-        if alen > len(msg):
+        if pos + alen > len(view):
             raise Exception("nl80211 attribute underflow")
-        attrs[attr] = msg[0:alen]
-        msg = msg[alen:]
+        attrs[attr] = bytes(view[pos + 4:pos + alen])
+        pos += (alen + 3) & ~3
     return attrs
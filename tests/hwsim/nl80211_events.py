@@ -0,0 +1,209 @@
+# nl80211 and rtnetlink link event listener
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import collections
+import errno
+import select
+import struct
+import threading
+import time
+
+import netlink
+from nl80211 import nl80211_cmd, nl80211_attr
+
+import logging
+logger = logging.getLogger()
+
+NL80211_GROUPS = ['config', 'scan', 'regulatory', 'mlme']
+
+_nl80211_cmd_name = dict((v, k) for k, v in nl80211_cmd.items())
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTMGRP_LINK = 1
+IFLA_IFNAME = 3
+IFF_UP = 0x1
+
+NL80211_REGDOM_TYPE_COUNTRY = 0
+NL80211_REGDOM_TYPE_WORLD = 1
+NL80211_REGDOM_TYPE_CUSTOM_WORLD = 2
+NL80211_REGDOM_TYPE_INTERSECTION = 3
+
+_ifinfomsg = struct.Struct("BxHiII")
+
+class Event(object):
+    """Kernel event
+
+    name is the nl80211 command name (e.g., "REG_CHANGE", "NEW_INTERFACE")
+    or "NEWLINK"/"DELLINK" for rtnetlink link events. attrs maps attribute
+    ids to netlink.Attr."""
+    def __init__(self, name, attrs, ifindex=None, flags=0):
+        self.name = name
+        self.attrs = attrs
+        self.time = time.monotonic()
+        self._ifindex = ifindex
+        self.flags = flags
+
+    def attr(self, name):
+        """Return the named nl80211 attribute or None"""
+        if self._ifindex is not None:
+            return None
+        return self.attrs.get(nl80211_attr[name])
+
+    @property
+    def ifindex(self):
+        if self._ifindex is not None:
+            return self._ifindex
+        a = self.attr('IFINDEX')
+        return a.u32() if a else None
+
+    @property
+    def ifname(self):
+        a = self.attrs.get(IFLA_IFNAME) if self._ifindex is not None else \
+            self.attr('IFNAME')
+        return a.nulstr().decode() if a else None
+
+    @property
+    def wiphy(self):
+        a = self.attr('WIPHY')
+        return a.u32() if a else None
+
+    @property
+    def reg_type(self):
+        a = self.attr('REG_TYPE')
+        return a.u8() if a else None
+
+    @property
+    def alpha2(self):
+        """Country code of a regulatory event; "00" for the world
+        regulatory domain, which is reported without alpha2"""
+        a = self.attr('REG_ALPHA2')
+        if a:
+            return a.nulstr().decode()
+        if self.reg_type == NL80211_REGDOM_TYPE_WORLD:
+            return "00"
+        return None
+
+    @property
+    def up(self):
+        return bool(self.flags & IFF_UP)
+
+    def __repr__(self):
+        return '<Event %s ifindex=%s ifname=%s wiphy=%s>' % (
+            self.name, self.ifindex, self.ifname, self.wiphy)
+
+def parse_nl80211_event(msg):
+    hdr, attrs = netlink.genl_parse(msg)
+    return Event(_nl80211_cmd_name.get(hdr.cmd, str(hdr.cmd)), attrs)
+
+def parse_link_event(msg):
+    family, dev_type, ifindex, flags, change = _ifinfomsg.unpack_from(msg.payload)
+    attrs = netlink.parse_attributes(msg.payload[_ifinfomsg.size:])
+    name = "NEWLINK" if msg.type == RTM_NEWLINK else "DELLINK"
+    return Event(name, attrs, ifindex=ifindex, flags=flags)
+
+class EventListener(object):
+    """Receive kernel events in the background
+
+    The nl80211 multicast groups (by default config, scan, regulatory and
+    mlme) and optionally the rtnetlink link group are joined and the
+    received events are queued for wait_event(), similarly to the
+    ctrl_iface events of WpaSupplicant and Hostapd. The listener needs to be
+    created before the operation that triggers the event."""
+    def __init__(self, groups=NL80211_GROUPS, link=False, max_events=1000):
+        self._conns = {}
+        self._events = collections.deque(maxlen=max_events)
+        self._cond = threading.Condition()
+        self._stop = False
+        if groups:
+            conn = netlink.Connection(netlink.NETLINK_GENERIC)
+            self._conns[conn.fileno()] = (conn, parse_nl80211_event)
+            mcast = netlink.genl_controller.get_mcast_groups(b'nl80211')
+            for group in groups:
+                if group not in mcast:
+                    raise Exception("Unknown nl80211 multicast group " + group)
+                conn.add_membership(mcast[group])
+        if link:
+            conn = netlink.Connection(netlink.NETLINK_ROUTE, RTMGRP_LINK)
+            self._conns[conn.fileno()] = (conn, parse_link_event)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _run(self):
+        while not self._stop:
+            r, w, x = select.select(list(self._conns), [], [], 0.1)
+            for fd in r:
+                conn, parse = self._conns[fd]
+                try:
+                    msgs = conn.recv_messages()
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        logger.info("Kernel event listener overrun")
+                        continue
+                    raise
+                events = []
+                for msg in msgs:
+                    if msg.type < netlink.NLMSG_MIN_TYPE:
+                        continue
+                    try:
+                        events.append(parse(msg))
+                    except Exception as e:
+                        logger.info("Could not parse kernel event: " + str(e))
+                with self._cond:
+                    self._events.extend(events)
+                    self._cond.notify_all()
+
+    def wait_event(self, events, timeout=5, **match):
+        """Wait for one of the named events
+
+        Keyword arguments are compared to the Event properties, e.g.,
+        wait_event(["REG_CHANGE"], alpha2="00"). Queued events before the
+        matching one are dropped. Returns the Event or None on timeout."""
+        end = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                while self._events:
+                    ev = self._events.popleft()
+                    if ev.name not in events:
+                        continue
+                    if all(getattr(ev, k) == v for k, v in match.items()):
+                        return ev
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def wait_regdom(self, alpha2=None, timeout=5):
+        """Wait for the kernel regulatory domain to change"""
+        if alpha2 is None:
+            return self.wait_event(["REG_CHANGE"], timeout=timeout)
+        return self.wait_event(["REG_CHANGE"], timeout=timeout, alpha2=alpha2)
+
+    def wait_link_up(self, ifname, timeout=5):
+        return self.wait_event(["NEWLINK"], timeout=timeout, ifname=ifname,
+                               up=True)
+
+    def dump_monitor(self):
+        """Drop the queued events and return them"""
+        with self._cond:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def close(self):
+        if self._thread:
+            self._stop = True
+            self._thread.join()
+            self._thread = None
+        for conn, parse in self._conns.values():
+            conn.close()
+        self._conns = {}
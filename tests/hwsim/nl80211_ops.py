@@ -0,0 +1,114 @@
+# Local nl80211/rtnetlink/sysfs operations for test helpers
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Direct kernel access for helpers that would otherwise run iw, ip or echo
+as a subprocess. These work only for the local host; remote hosts use the
+command line tools through remotehost.
+"""
+
+import struct
+import threading
+
+import netlink
+from nl80211 import nl80211_cmd, nl80211_attr
+
+NL80211_IFTYPE_STATION = 2
+NL80211_IFTYPE_AP = 3
+NL80211_IFTYPE_MONITOR = 6
+
+NL80211_TX_POWER_AUTOMATIC = 0
+NL80211_TX_POWER_LIMITED = 1
+NL80211_TX_POWER_FIXED = 2
+
+IFTYPES = {'managed': NL80211_IFTYPE_STATION,
+           'station': NL80211_IFTYPE_STATION,
+           'ap': NL80211_IFTYPE_AP,
+           'monitor': NL80211_IFTYPE_MONITOR}
+
+RTM_NEWLINK = 16
+IFF_UP = 0x1
+
+_lock = threading.Lock()
+_nl80211 = None
+_rtnl = None
+
+def _nl80211_conn():
+    global _nl80211
+    if _nl80211 is None:
+        conn = netlink.Connection(netlink.NETLINK_GENERIC)
+        fid = netlink.genl_controller.get_family_id(b'nl80211')
+        _nl80211 = (conn, fid)
+    return _nl80211
+
+def nl80211_request(cmd, attrs):
+    """Send an nl80211 command and return the response messages
+
+    OSError is raised if the kernel rejects the command."""
+    with _lock:
+        conn, fid = _nl80211_conn()
+        msg = netlink.GenlMessage(fid, nl80211_cmd[cmd],
+                                  flags=netlink.NLM_F_REQUEST |
+                                        netlink.NLM_F_ACK,
+                                  attrs=attrs)
+        msg.send(conn)
+        return list(conn.recv_all(msg.seq, ack=True))
+
+def ifindex(ifname):
+    with open('/sys/class/net/%s/ifindex' % ifname) as f:
+        return int(f.read())
+
+def _attr_u32(name, val):
+    return netlink.U32Attr(nl80211_attr[name], val)
+
+def set_iftype(ifname, iftype):
+    """Set interface type; iftype is an iw type name (e.g., "monitor")"""
+    nl80211_request('SET_INTERFACE',
+                    [_attr_u32('IFINDEX', ifindex(ifname)),
+                     _attr_u32('IFTYPE', IFTYPES[iftype])])
+
+def set_freq(ifname, freq):
+    """Set the operating frequency (20 MHz, no HT) of an interface"""
+    nl80211_request('SET_WIPHY',
+                    [_attr_u32('IFINDEX', ifindex(ifname)),
+                     _attr_u32('WIPHY_FREQ', freq)])
+
+def set_txpower(ifname, mbm=None):
+    """Set fixed TX power in mBm or automatic TX power if mbm is None"""
+    attrs = [_attr_u32('IFINDEX', ifindex(ifname))]
+    if mbm is None:
+        attrs.append(_attr_u32('WIPHY_TX_POWER_SETTING',
+                               NL80211_TX_POWER_AUTOMATIC))
+    else:
+        attrs.append(_attr_u32('WIPHY_TX_POWER_SETTING',
+                               NL80211_TX_POWER_FIXED))
+        # The level is a signed value (s32) in mBm
+        attrs.append(netlink.Attr(nl80211_attr['WIPHY_TX_POWER_LEVEL'], "i",
+                                  mbm))
+    nl80211_request('SET_WIPHY', attrs)
+
+def set_link_up(ifname, up=True):
+    """Set interface administratively up or down over rtnetlink"""
+    global _rtnl
+    with _lock:
+        if _rtnl is None:
+            _rtnl = netlink.Connection(netlink.NETLINK_ROUTE)
+        # struct ifinfomsg: family, type, index, flags, change
+        ifinfo = struct.pack("BxHiII", 0, 0, ifindex(ifname),
+                             IFF_UP if up else 0, IFF_UP)
+        msg = netlink.Message(RTM_NEWLINK,
+                              flags=netlink.NLM_F_REQUEST | netlink.NLM_F_ACK,
+                              payload=ifinfo)
+        msg.send(_rtnl)
+        list(_rtnl.recv_all(msg.seq, ack=True))
+
+def write_debugfs(path, val):
+    with open(path, 'w') as f:
+        f.write(str(val))
+
+def get_phy(ifname):
+    with open('/sys/class/net/%s/phy80211/name' % ifname) as f:
+        return f.read().strip()
@@ -0,0 +1,517 @@
+# pcap/pcapng reader and minimal IEEE 802.11 dissector
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Native extraction of a subset of tshark -Tfields fields from capture files
+
+This covers the fields most commonly used in the hwsim test cases (frame
+control, addresses, element IDs, some fixed fields, radiotap channel/rate/
+signal, LLC/EAPOL/EAP headers) so that tshark does not need to be run for
+queries using only these. Values are formatted the way current tshark
+versions print them with -Tfields; the caller is expected to check that
+the installed tshark uses the same format before relying on a field. Frames for which a requested field cannot be determined
+reliably (e.g., elements in Action frames or A-MSDU payload) result in an
+Unsupported exception and the caller is expected to fall back to tshark.
+"""
+
+import mmap
+import os
+import struct
+
+class Unsupported(Exception):
+    pass
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_IEEE802_11 = 105
+LINKTYPE_IEEE802_11_RADIOTAP = 127
+
+_u16le = struct.Struct('<H')
+_u32le = struct.Struct('<I')
+
+class PcapReader(object):
+    """Iterate over the packets in a pcap or pcapng file
+
+    The file is mapped into memory and each packet is returned as a
+    (linktype, data, origlen) tuple where data is a memoryview into the
+    mapping, so packet data is not copied. packets() returns the same
+    with the capture timestamp (seconds) as the first tuple item. A
+    truncated last block (e.g., from a capture that is still being
+    written) ends the iteration.
+    """
+    def __init__(self, filename):
+        self._f = open(filename, 'rb')
+        self._mm = None
+        self._buf = None
+        if os.fstat(self._f.fileno()).st_size > 0:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buf = memoryview(self._mm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._buf is not None:
+            self._buf.release()
+            self._buf = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # A caller still holds a view to packet data; the mapping
+                # is released once that reference goes away.
+                pass
+            self._mm = None
+        self._f.close()
+
+    def __iter__(self):
+        for ts, linktype, data, origlen in self.packets():
+            yield linktype, data, origlen
+
+    def packets(self):
+        buf = self._buf
+        if buf is None or len(buf) < 4:
+            return
+        magic = bytes(buf[0:4])
+        if magic == b'\x0a\x0d\x0d\x0a':
+            yield from self._pcapng(buf)
+        elif magic == b'\xd4\xc3\xb2\xa1':
+            yield from self._pcap(buf, '<', 1000000)
+        elif magic == b'\x4d\x3c\xb2\xa1':
+            yield from self._pcap(buf, '<', 1000000000)
+        elif magic == b'\xa1\xb2\xc3\xd4':
+            yield from self._pcap(buf, '>', 1000000)
+        elif magic == b'\xa1\xb2\x3c\x4d':
+            yield from self._pcap(buf, '>', 1000000000)
+        else:
+            raise Unsupported("unknown capture file format")
+
+    def _pcap(self, buf, endian, units):
+        if len(buf) < 24:
+            return
+        linktype = struct.unpack_from(endian + 'I', buf, 20)[0] & 0x0fffffff
+        rec = struct.Struct(endian + 'IIII')
+        pos = 24
+        end = len(buf)
+        while pos + 16 <= end:
+            ts_sec, ts_frac, caplen, origlen = rec.unpack_from(buf, pos)
+            pos += 16
+            if pos + caplen > end:
+                break
+            yield ts_sec + ts_frac / units, linktype, buf[pos:pos + caplen], \
+                origlen
+            pos += caplen
+
+    @staticmethod
+    def _tsresol(buf, pos, end, endian):
+        # Timestamp units per second from the if_tsresol option of an
+        # Interface Description Block
+        while pos + 4 <= end:
+            code, olen = struct.unpack_from(endian + 'HH', buf, pos)
+            if code == 0:
+                break
+            if code == 9 and olen >= 1:
+                val = buf[pos + 4]
+                if val & 0x80:
+                    return 2 ** (val & 0x7f)
+                return 10 ** val
+            pos += 4 + olen + (4 - olen % 4) % 4
+        return 1000000
+
+    def _pcapng(self, buf):
+        end = len(buf)
+        pos = 0
+        endian = '<'
+        hdr = struct.Struct('<II')
+        ifaces = []
+        while pos + 12 <= end:
+            btype, blen = hdr.unpack_from(buf, pos)
+            if btype == 0x0A0D0D0A:
+                bom = bytes(buf[pos + 8:pos + 12])
+                if bom == b'\x4d\x3c\x2b\x1a':
+                    endian = '<'
+                elif bom == b'\x1a\x2b\x3c\x4d':
+                    endian = '>'
+                else:
+                    raise Unsupported("invalid pcapng byte order magic")
+                hdr = struct.Struct(endian + 'II')
+                btype, blen = hdr.unpack_from(buf, pos)
+                ifaces = []
+            if blen < 12 or blen % 4 or pos + blen > end:
+                break
+            body = pos + 8
+            if btype == 1:
+                linktype, reserved, snaplen = \
+                    struct.unpack_from(endian + 'HHI', buf, body)
+                units = self._tsresol(buf, body + 8, pos + blen - 4, endian)
+                ifaces.append((linktype, reserved, snaplen, units))
+            elif btype == 6:
+                iface, ts_hi, ts_lo, caplen, origlen = \
+                    struct.unpack_from(endian + 'IIIII', buf, body)
+                if iface >= len(ifaces):
+                    raise Unsupported("unknown pcapng interface")
+                data = body + 20
+                yield ((ts_hi << 32) | ts_lo) / ifaces[iface][3], \
+                    ifaces[iface][0], buf[data:data + caplen], origlen
+            elif btype == 3:
+                if not ifaces:
+                    raise Unsupported("missing pcapng interface")
+                origlen = struct.unpack_from(endian + 'I', buf, body)[0]
+                caplen = min(origlen, blen - 16)
+                snaplen = ifaces[0][2]
+                if snaplen:
+                    caplen = min(caplen, snaplen)
+                data = body + 4
+                # Simple Packet Blocks do not have a timestamp
+                yield None, ifaces[0][0], buf[data:data + caplen], origlen
+            elif btype == 2:
+                iface, drops, ts_hi, ts_lo, caplen, origlen = \
+                    struct.unpack_from(endian + 'HHIIII', buf, body)
+                if iface >= len(ifaces):
+                    raise Unsupported("unknown pcapng interface")
+                data = body + 20
+                yield ((ts_hi << 32) | ts_lo) / ifaces[iface][3], \
+                    ifaces[iface][0], buf[data:data + caplen], origlen
+            pos += blen
+
+def _mac(buf, pos):
+    return ':'.join(['%02x' % b for b in buf[pos:pos + 6]])
+
+def _bool(val):
+    return 'True' if val else 'False'
+
+# radiotap fields in the first presence bitmap: (alignment, size)
+_radiotap_fields = [(8, 8), (1, 1), (1, 1), (2, 4), (1, 2), (1, 1), (1, 1),
+                    (2, 2), (2, 2), (2, 2), (1, 1), (1, 1), (1, 1), (1, 1),
+                    (2, 2), (2, 2), (1, 1), (1, 1), (4, 8), (1, 3), (4, 8),
+                    (2, 12), (8, 12), (2, 12), (2, 12), (2, 6), (1, 1),
+                    (2, 4)]
+
+def _radiotap(data, fields):
+    if len(data) < 8:
+        raise Unsupported("truncated radiotap header")
+    version, pad, rt_len = struct.unpack_from('<BBH', data, 0)
+    if version != 0 or rt_len > len(data):
+        raise Unsupported("invalid radiotap header")
+    present = _u32le.unpack_from(data, 4)[0]
+    pos = 8
+    p = present
+    while p & 0x80000000:
+        if pos + 4 > rt_len:
+            raise Unsupported("truncated radiotap header")
+        p = _u32le.unpack_from(data, pos)[0]
+        pos += 4
+    flags = 0
+    # Only the fields from the first presence bitmap are needed here and
+    # their layout does not depend on any later fields.
+    for bit, (align, size) in enumerate(_radiotap_fields):
+        if not present & (1 << bit):
+            continue
+        pos = (pos + align - 1) & ~(align - 1)
+        if pos + size > rt_len:
+            raise Unsupported("truncated radiotap field")
+        if bit == 1:
+            flags = data[pos]
+        elif bit == 2:
+            fields['radiotap.datarate'] = ['%g' % (data[pos] / 2.0)]
+        elif bit == 3:
+            fields['radiotap.channel.freq'] = [str(_u16le.unpack_from(data, pos)[0])]
+        elif bit == 5:
+            fields['radiotap.dbm_antsignal'] = [str(struct.unpack_from('b', data, pos)[0])]
+        pos += size
+    if present & 0x80000000:
+        # Additional presence bitmaps (e.g., per-antenna signal) would add
+        # more occurrences of the same fields.
+        fields['radiotap.dbm_antsignal'] = None
+    data = data[rt_len:]
+    if flags & 0x10:
+        # FCS at the end of the frame
+        data = data[:-4]
+    return data
+
+# Length of fixed fields before the elements in Management frames
+_mgmt_fixed_len = {0: 4, 1: 6, 2: 10, 3: 6, 4: 0, 5: 12, 8: 12, 9: 0,
+                   10: 2, 12: 2}
+
+def _elements(body, pos, fields):
+    numbers = []
+    lengths = []
+    ext_numbers = []
+    ext_lengths = []
+    end = len(body)
+    while pos + 2 <= end:
+        eid = body[pos]
+        elen = body[pos + 1]
+        if pos + 2 + elen > end:
+            break
+        numbers.append(str(eid))
+        lengths.append(str(elen))
+        if eid == 255 and elen >= 1:
+            ext_numbers.append(str(body[pos + 2]))
+            ext_lengths.append(str(elen - 1))
+        pos += 2 + elen
+    if pos != end:
+        # tshark reports malformed elements in its own way
+        raise Unsupported("malformed elements")
+    fields['wlan.tag.number'] = numbers
+    fields['wlan.tag.length'] = lengths
+    fields['wlan.ext_tag.number'] = ext_numbers
+    fields['wlan.ext_tag.length'] = ext_lengths
+
+_element_fields = ['wlan.tag.number', 'wlan.tag.length',
+                   'wlan.ext_tag.number', 'wlan.ext_tag.length']
+
+def _mgmt(frame, hdr_len, subtype, protected, fields):
+    body = frame[hdr_len:]
+    if protected:
+        # Encrypted body (e.g., protected Deauthentication/Action frames)
+        return
+    if subtype == 13 or subtype == 14:
+        if len(body) >= 1:
+            fields['wlan.fixed.category_code'] = [str(body[0])]
+            if body[0] == 4 and len(body) >= 2:
+                fields['wlan.fixed.publicact'] = [str(body[1])]
+        for f in _element_fields:
+            fields[f] = None
+        return
+    if subtype == 11:
+        if len(body) < 6:
+            raise Unsupported("truncated Authentication frame")
+        alg, seq, status = struct.unpack_from('<HHH', body, 0)
+        fields['wlan.fixed.auth.alg'] = [str(alg)]
+        fields['wlan.fixed.auth_seq'] = ['0x%04x' % seq]
+        fields['wlan.fixed.status_code'] = [str(status)]
+        if alg in (0, 1, 2):
+            _elements(body, 6, fields)
+        else:
+            for f in _element_fields:
+                fields[f] = None
+        return
+    if subtype in (10, 12):
+        if len(body) >= 2:
+            fields['wlan.fixed.reason_code'] = [str(_u16le.unpack_from(body, 0)[0])]
+    if subtype in (1, 3):
+        if len(body) >= 4:
+            fields['wlan.fixed.status_code'] = [str(_u16le.unpack_from(body, 2)[0])]
+    if subtype in _mgmt_fixed_len:
+        fixed = _mgmt_fixed_len[subtype]
+        if len(body) < fixed:
+            raise Unsupported("truncated Management frame")
+        _elements(body, fixed, fields)
+    else:
+        for f in _element_fields:
+            fields[f] = None
+
+def _eapol(body, pos, fields):
+    if pos + 4 > len(body):
+        raise Unsupported("truncated EAPOL frame")
+    version, ptype, plen = struct.unpack_from('>BBH', body, pos)
+    fields['eapol.version'] = [str(version)]
+    fields['eapol.type'] = [str(ptype)]
+    fields['eapol.len'] = [str(plen)]
+    pos += 4
+    if ptype == 0 and plen >= 4 and pos + 4 <= len(body):
+        code, ident = body[pos], body[pos + 1]
+        fields['eap.code'] = [str(code)]
+        fields['eap.id'] = [str(ident)]
+        if code in (1, 2) and plen >= 5 and pos + 5 <= len(body):
+            fields['eap.type'] = [str(body[pos + 4])]
+    elif ptype == 3 and plen >= 13 and pos + 13 <= len(body):
+        # Only the fields before the variable length MIC are handled
+        desc = body[pos]
+        fields['eapol.keydes.type'] = [str(desc)]
+        if desc in (2, 254):
+            info, klen = struct.unpack_from('>HH', body, pos + 1)
+            replay = struct.unpack_from('>Q', body, pos + 5)[0]
+            fields['wlan_rsna_eapol.keydes.key_info'] = ['0x%04x' % info]
+            fields['eapol.keydes.key_len'] = [str(klen)]
+            fields['eapol.keydes.replay_counter'] = [str(replay)]
+        else:
+            for f in _eapol_key_fields:
+                fields[f] = None
+
+_eapol_key_fields = ['wlan_rsna_eapol.keydes.key_info',
+                     'eapol.keydes.key_len', 'eapol.keydes.replay_counter']
+_payload_fields = ['llc.type', 'eapol.version', 'eapol.type', 'eapol.len',
+                   'eap.code', 'eap.id', 'eap.type',
+                   'eapol.keydes.type'] + _eapol_key_fields
+
+def _data(frame, hdr_len, subtype, protected, fields):
+    if protected or subtype & 0x4:
+        # Encrypted payload or no payload (Null frames)
+        return
+    if subtype & 0x8:
+        qos = _u16le.unpack_from(frame, hdr_len - 2)[0]
+        if qos & 0x0180:
+            # A-MSDU or possible mesh control before the LLC header
+            for f in _payload_fields:
+                fields[f] = None
+            return
+    body = frame[hdr_len:]
+    if len(body) < 8 or bytes(body[0:6]) != b'\xaa\xaa\x03\x00\x00\x00':
+        return
+    ethertype = struct.unpack_from('>H', body, 6)[0]
+    fields['llc.type'] = ['0x%04x' % ethertype]
+    if ethertype == 0x888e:
+        _eapol(body, 8, fields)
+
+def _ieee80211(frame, fields):
+    if len(frame) < 10:
+        raise Unsupported("truncated IEEE 802.11 frame")
+    fc0, fc1 = frame[0], frame[1]
+    ftype = (fc0 >> 2) & 0x3
+    subtype = (fc0 >> 4) & 0xf
+    protected = fc1 & 0x40
+    fields['wlan.fc'] = ['0x%04x' % ((fc0 << 8) | fc1)]
+    fields['wlan.fc.type'] = [str(ftype)]
+    fields['wlan.fc.subtype'] = [str(subtype)]
+    fields['wlan.fc.type_subtype'] = ['0x%04x' % ((ftype << 4) | subtype)]
+    fields['wlan.fc.tods'] = [_bool(fc1 & 0x01)]
+    fields['wlan.fc.fromds'] = [_bool(fc1 & 0x02)]
+    fields['wlan.fc.retry'] = [_bool(fc1 & 0x08)]
+    fields['wlan.fc.pwrmgt'] = [_bool(fc1 & 0x10)]
+    fields['wlan.fc.moredata'] = [_bool(fc1 & 0x20)]
+    fields['wlan.fc.protected'] = [_bool(protected)]
+    fields['wlan.duration'] = [str(_u16le.unpack_from(frame, 2)[0])]
+
+    if ftype == 1:
+        if subtype in (12, 13):
+            # CTS, Ack
+            fields['wlan.ra'] = [_mac(frame, 4)]
+        elif subtype in (4, 5, 8, 9, 11) and len(frame) >= 16:
+            # Beamforming Report Poll, NDP Announcement, BlockAckReq,
+            # BlockAck, RTS
+            fields['wlan.ra'] = [_mac(frame, 4)]
+            fields['wlan.ta'] = [_mac(frame, 10)]
+        else:
+            # Addresses in other Control frames are not handled here
+            for f in ['wlan.ra', 'wlan.ta', 'wlan.da', 'wlan.sa',
+                      'wlan.bssid']:
+                fields[f] = None
+        return
+    if ftype == 3:
+        raise Unsupported("Extension frame")
+
+    if len(frame) < 24:
+        raise Unsupported("truncated IEEE 802.11 header")
+    a1 = _mac(frame, 4)
+    a2 = _mac(frame, 10)
+    a3 = _mac(frame, 16)
+    seq = _u16le.unpack_from(frame, 22)[0]
+    fields['wlan.seq'] = [str(seq >> 4)]
+    fields['wlan.frag'] = [str(seq & 0xf)]
+    fields['wlan.ra'] = [a1]
+    fields['wlan.ta'] = [a2]
+    hdr_len = 24
+
+    if ftype == 0:
+        fields['wlan.da'] = [a1]
+        fields['wlan.sa'] = [a2]
+        fields['wlan.bssid'] = [a3]
+        if fc1 & 0x80:
+            hdr_len += 4
+        _mgmt(frame, hdr_len, subtype, protected, fields)
+        return
+
+    ds = fc1 & 0x03
+    if ds == 0:
+        fields['wlan.da'] = [a1]
+        fields['wlan.sa'] = [a2]
+        fields['wlan.bssid'] = [a3]
+    elif ds == 1:
+        fields['wlan.bssid'] = [a1]
+        fields['wlan.sa'] = [a2]
+        fields['wlan.da'] = [a3]
+    elif ds == 2:
+        fields['wlan.da'] = [a1]
+        fields['wlan.bssid'] = [a2]
+        fields['wlan.sa'] = [a3]
+    else:
+        if len(frame) < 30:
+            raise Unsupported("truncated IEEE 802.11 header")
+        fields['wlan.da'] = [a3]
+        fields['wlan.sa'] = [_mac(frame, 24)]
+        hdr_len = 30
+    if subtype & 0x8:
+        hdr_len += 2
+        if fc1 & 0x80:
+            hdr_len += 4
+    if len(frame) < hdr_len:
+        raise Unsupported("truncated IEEE 802.11 header")
+    _data(frame, hdr_len, subtype, protected, fields)
+
+def _ethernet(frame, fields):
+    if len(frame) < 14:
+        raise Unsupported("truncated Ethernet frame")
+    fields['eth.dst'] = [_mac(frame, 0)]
+    fields['eth.src'] = [_mac(frame, 6)]
+    ethertype = struct.unpack_from('>H', frame, 12)[0]
+    fields['eth.type'] = ['0x%04x' % ethertype]
+    if ethertype == 0x888e:
+        _eapol(frame, 14, fields)
+
+FIELDS = set(['frame.number', 'frame.len', 'frame.cap_len',
+              'radiotap.datarate', 'radiotap.channel.freq',
+              'radiotap.dbm_antsignal',
+              'wlan.fc', 'wlan.fc.type', 'wlan.fc.subtype',
+              'wlan.fc.type_subtype', 'wlan.fc.tods', 'wlan.fc.fromds',
+              'wlan.fc.retry', 'wlan.fc.pwrmgt', 'wlan.fc.moredata',
+              'wlan.fc.protected', 'wlan.duration', 'wlan.seq', 'wlan.frag',
+              'wlan.ra', 'wlan.ta', 'wlan.da', 'wlan.sa', 'wlan.bssid',
+              'wlan.fixed.category_code', 'wlan.fixed.publicact',
+              'wlan.fixed.auth.alg', 'wlan.fixed.auth_seq',
+              'wlan.fixed.status_code', 'wlan.fixed.reason_code',
+              'eth.src', 'eth.dst', 'eth.type'] +
+             _element_fields + _payload_fields)
+
+def dissect(linktype, data, origlen, number):
+    """Return {field: [values]} for a packet
+
+    A value of None means the field may be present in tshark output, but
+    cannot be determined here. Fields that are not in the returned dict are
+    not present in the packet.
+    """
+    fields = {'frame.number': [str(number)],
+              'frame.len': [str(origlen)],
+              'frame.cap_len': [str(len(data))]}
+    if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+        _ieee80211(_radiotap(data, fields), fields)
+    elif linktype == LINKTYPE_IEEE802_11:
+        _ieee80211(data, fields)
+    elif linktype == LINKTYPE_ETHERNET:
+        _ethernet(data, fields)
+    else:
+        raise Unsupported("unsupported link type %d" % linktype)
+    return fields
+
+def read_fields(filename, fields):
+    """Return {field: [-Tfields value per packet]} for a capture file
+
+    Raises Unsupported if any of the fields cannot be determined for any of
+    the packets.
+    """
+    unsupported = [f for f in fields if f not in FIELDS]
+    if unsupported:
+        raise Unsupported("unsupported fields: " + ','.join(unsupported))
+    columns = dict([(f, []) for f in fields])
+    number = 0
+    with PcapReader(filename) as reader:
+        for linktype, data, origlen in reader:
+            number += 1
+            try:
+                vals = dissect(linktype, data, origlen, number)
+            except (struct.error, IndexError):
+                raise Unsupported("malformed packet %d" % number)
+            finally:
+                data.release()
+            for f in fields:
+                v = vals.get(f, [])
+                if v is None:
+                    raise Unsupported("field %s in packet %d" % (f, number))
+                columns[f].append(','.join(v))
+    return columns
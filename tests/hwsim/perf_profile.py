@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+#
+# perf based CPU profiling of test case daemons
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+
+import logging
+logger = logging.getLogger()
+
+class PerfRecorder(object):
+    """perf record -g for a set of processes
+
+    The recording is started in start() and terminated with SIGINT in
+    stop() which makes perf write out the collected samples.
+    """
+    def __init__(self, output, pids, freq=999):
+        self.output = output
+        self.pids = pids
+        self.freq = freq
+        self.cmd = None
+
+    def start(self):
+        if not self.pids:
+            return
+        args = ['perf', 'record', '-g', '-q', '-F', str(self.freq),
+                '-o', self.output,
+                '-p', ','.join([str(p) for p in self.pids])]
+        try:
+            self.cmd = subprocess.Popen(args, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            logger.info("perf not available - no profiling")
+            self.cmd = None
+            return
+        # Give perf a moment to attach to the processes
+        time.sleep(0.1)
+        if self.cmd.poll() is not None:
+            err = self.cmd.stderr.read().decode(errors='ignore').strip()
+            logger.info("perf record failed: " + err)
+            self.cmd = None
+
+    def stop(self):
+        if not self.cmd:
+            return False
+        self.cmd.send_signal(signal.SIGINT)
+        try:
+            self.cmd.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.cmd.kill()
+            self.cmd.wait()
+        self.cmd.stderr.close()
+        self.cmd = None
+        return os.path.exists(self.output)
+
+_header_re = re.compile(r'^(\S.*?)\s+(\d+)(?:/\d+)?\s')
+_offset_re = re.compile(r'\+0x[0-9a-f]+$')
+
+def _frame_name(line):
+    # "<addr> <symbol>+<offset> (<dso>)"
+    parts = line.strip().split(' ', 1)
+    if len(parts) < 2:
+        return '[unknown]'
+    sym = parts[1]
+    dso = None
+    if sym.endswith(')') and ' (' in sym:
+        sym, dso = sym.rsplit(' (', 1)
+        dso = dso[:-1]
+    sym = _offset_re.sub('', sym)
+    if sym == '[unknown]' and dso:
+        sym = '[%s]' % os.path.basename(dso)
+    return sym
+
+def fold_lines(lines, comms=None):
+    """Collapse perf script output into {folded stack: count}"""
+    stacks = {}
+    comm = None
+    frames = []
+
+    def flush():
+        if comm is not None and (comms is None or comm in comms):
+            key = ';'.join([comm] + frames[::-1])
+            stacks[key] = stacks.get(key, 0) + 1
+
+    for line in lines:
+        if not line.strip():
+            flush()
+            comm = None
+            frames = []
+            continue
+        if line[0] in ' \t':
+            if comm is not None:
+                frames.append(_frame_name(line))
+            continue
+        flush()
+        frames = []
+        m = _header_re.match(line)
+        comm = m.group(1) if m else None
+    flush()
+    return stacks
+
+def fold(perf_data, output, comms=None):
+    """Convert perf.data into a folded stacks file"""
+    cmd = subprocess.Popen(['perf', 'script', '-i', perf_data],
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.DEVNULL, text=True,
+                           errors='replace')
+    stacks = fold_lines(cmd.stdout, comms)
+    cmd.stdout.close()
+    cmd.wait()
+    write_folded(stacks, output)
+    return stacks
+
+def read_folded(fname, stacks=None):
+    if stacks is None:
+        stacks = {}
+    with open(fname, 'r') as f:
+        for line in f:
+            key, sep, count = line.rstrip('\n').rpartition(' ')
+            if not sep:
+                continue
+            stacks[key] = stacks.get(key, 0) + int(count)
+    return stacks
+
+def write_folded(stacks, output):
+    with open(output, 'w') as f:
+        for key in sorted(stacks):
+            f.write('%s %d\n' % (key, stacks[key]))
+
+def flamegraph(folded, svg, title=None):
+    """Generate an SVG flame graph if flamegraph.pl is available"""
+    exe = shutil.which('flamegraph.pl')
+    if not exe:
+        return False
+    args = [exe]
+    if title:
+        args += ['--title', title]
+    with open(folded, 'r') as f, open(svg, 'w') as out:
+        res = subprocess.call(args, stdin=f, stdout=out)
+    return res == 0
+
+def merge_modules(logdir, modules):
+    """Merge per-test folded stacks into per-module files
+
+    modules maps test case names to module names. The merged stacks are
+    written into <logdir>/profile-<module>.folded (and .svg if flamegraph.pl
+    is available). Returns the list of generated folded files.
+    """
+    per_module = {}
+    for test, mod in modules.items():
+        fname = os.path.join(logdir, test + '.perf.folded')
+        if os.path.exists(fname):
+            per_module.setdefault(mod, []).append(fname)
+    res = []
+    for mod, files in sorted(per_module.items()):
+        stacks = {}
+        for fname in files:
+            read_folded(fname, stacks)
+        output = os.path.join(logdir, 'profile-%s.folded' % mod)
+        write_folded(stacks, output)
+        flamegraph(output, output[:-len('.folded')] + '.svg', title=mod)
+        res.append(output)
+    return res
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='merge folded perf stacks')
+    parser.add_argument('-o', dest='output', metavar='<file>', required=True,
+                        help='merged folded stacks output file')
+    parser.add_argument('--svg', metavar='<file>',
+                        help='flame graph output file (requires flamegraph.pl)')
+    parser.add_argument('files', metavar='<file>', nargs='+',
+                        help='folded stacks or perf.data files')
+    args = parser.parse_args()
+
+    stacks = {}
+    for fname in args.files:
+        if fname.endswith('.folded'):
+            read_folded(fname, stacks)
+        else:
+            tmp = fname + '.folded'
+            for key, count in fold(fname, tmp).items():
+                stacks[key] = stacks.get(key, 0) + count
+    write_folded(stacks, args.output)
+    if args.svg and not flamegraph(args.output, args.svg):
+        print("flamegraph.pl not available or failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+#
+# Test case duration regression detection
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import json
+import os
+import re
+import sys
+
+# Scale factor to make MAD a consistent estimator of the standard deviation
+# for normally distributed data
+MAD_SCALE = 1.4826
+
+def median(vals):
+    vals = sorted(vals)
+    n = len(vals)
+    if n == 0:
+        return None
+    if n % 2:
+        return vals[n // 2]
+    return (vals[n // 2 - 1] + vals[n // 2]) / 2.0
+
+def mad(vals, med=None):
+    if med is None:
+        med = median(vals)
+    return median([abs(v - med) for v in vals])
+
+def test_modules(path=None):
+    """Return {test case: module} for the test_*.py files in path
+
+    The names are without the test_ prefix as in run-tests.py. The files
+    are scanned for test case definitions instead of importing them."""
+    path = path or os.path.dirname(os.path.abspath(__file__))
+    modules = {}
+    func_re = re.compile(r'^def test_(\w+)\(', re.MULTILINE)
+    for fname in sorted(os.listdir(path)):
+        m = re.match(r'test_(.*)\.py$', fname)
+        if not m:
+            continue
+        with open(os.path.join(path, fname), encoding='utf-8') as f:
+            for name in func_re.findall(f.read()):
+                modules[name] = m.group(1)
+    return modules
+
+def get_runs(conn):
+    res = conn.execute('SELECT DISTINCT run FROM results WHERE run IS NOT NULL ORDER BY run')
+    return [r[0] for r in res]
+
+def _metrics(conn, runs):
+    """Return {test: {metric: {run: duration}}} for passed test cases"""
+    data = {}
+    marks = ','.join('?' * len(runs))
+    sql = "SELECT test,run,duration FROM results WHERE result='PASS' AND run IN (%s)" % marks
+    for test, run, duration in conn.execute(sql, runs):
+        data.setdefault(test, {}).setdefault('duration', {})[run] = duration
+    # Databases opened read-only may predate the phases table
+    res = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='phases'")
+    if res.fetchone() is None:
+        return data
+    sql = "SELECT p.test,p.run,p.phase,p.duration FROM phases p JOIN results r ON r.test=p.test AND r.run=p.run WHERE r.result='PASS' AND p.run IN (%s)" % marks
+    for test, run, phase, duration in conn.execute(sql, runs):
+        data.setdefault(test, {}).setdefault('phase:' + phase, {})[run] = duration
+    return data
+
+def compare(value, baseline, threshold, min_ratio, min_delta):
+    med = median(baseline)
+    dev = mad(baseline, med) * MAD_SCALE
+    delta = value - med
+    if dev > 0:
+        score = delta / dev
+    elif delta > 0:
+        score = float('inf')
+    else:
+        score = 0.0
+    ratio = value / med if med > 0 else None
+    regressed = score > threshold and delta > min_delta and \
+        (ratio is None or ratio > 1 + min_ratio)
+    return {'value': value, 'median': med, 'mad': dev / MAD_SCALE,
+            'score': score if score != float('inf') else None,
+            'ratio': ratio, 'regression': regressed}
+
+def perf_report(conn, run=None, window=10, min_samples=3, threshold=3.5,
+                min_ratio=0.2, min_delta=0.1, modules=None):
+    """Compare test case durations of a run against a baseline window
+
+    The baseline consists of up to window preceding runs. Only PASS results
+    are used. A metric (total duration or a harness phase duration) is
+    reported as a regression if its robust z-score (distance from the
+    baseline median in units of scaled median absolute deviation) exceeds
+    threshold and the slow-down is both larger than min_ratio relative to
+    the median and larger than min_delta seconds.
+
+    modules can be used to map test case names to module names for
+    grouping; test cases without a mapping are grouped under "unknown".
+    """
+    runs = get_runs(conn)
+    if not runs:
+        raise Exception("No runs in the database")
+    if run is None:
+        run = runs[-1]
+    if run not in runs:
+        raise Exception("Run %s not found in the database" % run)
+    idx = runs.index(run)
+    baseline_runs = runs[max(0, idx - window):idx]
+
+    data = _metrics(conn, baseline_runs + [run])
+    modules = modules or {}
+    report = {'run': run, 'baseline_runs': baseline_runs,
+              'threshold': threshold, 'min_ratio': min_ratio,
+              'min_delta': min_delta, 'modules': {}}
+    regressions = 0
+    for test in sorted(data):
+        for metric, vals in sorted(data[test].items()):
+            if run not in vals:
+                continue
+            baseline = [vals[r] for r in baseline_runs if r in vals]
+            if len(baseline) < min_samples:
+                continue
+            res = compare(vals[run], baseline, threshold, min_ratio, min_delta)
+            res['samples'] = len(baseline)
+            mod = report['modules'].setdefault(modules.get(test, 'unknown'),
+                                               {'tests': {}, 'regressions': 0})
+            mod['tests'].setdefault(test, {})[metric] = res
+            if res['regression']:
+                mod['regressions'] += 1
+                regressions += 1
+    report['regressions'] = regressions
+    return report
+
+def write_report(report, out=None):
+    out = out or sys.stdout
+    json.dump(report, out, indent=1, sort_keys=True)
+    out.write('\n')
+
+def summary(report):
+    lines = []
+    for mod, vals in sorted(report['modules'].items()):
+        for test, metrics in sorted(vals['tests'].items()):
+            for metric, res in sorted(metrics.items()):
+                if not res['regression']:
+                    continue
+                lines.append("%s %s %s: %.3f s (median %.3f s over %d runs)" %
+                             (mod, test, metric, res['value'], res['median'],
+                              res['samples']))
+    return lines
+
+def main():
+    import argparse
+    from results_db import ResultsDB
+
+    parser = argparse.ArgumentParser(description='hwsim test duration regression report')
+    parser.add_argument('database', metavar='<sqlite3 db>')
+    parser.add_argument('--run', type=int, help='run to check (default: latest)')
+    parser.add_argument('--window', type=int, default=10,
+                        help='number of preceding runs used as the baseline')
+    parser.add_argument('--threshold', type=float, default=3.5,
+                        help='robust z-score threshold for regressions')
+    args = parser.parse_args()
+
+    db = ResultsDB(args.database, readonly=True)
+    try:
+        report = perf_report(db.conn, args.run, window=args.window,
+                             threshold=args.threshold,
+                             modules=test_modules())
+    finally:
+        db.close()
+    write_report(report)
+    sys.exit(1 if report['regressions'] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Process resource usage sampling
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import os
+import threading
+import time
+
+import logging
+logger = logging.getLogger()
+
+DAEMONS = ['hostapd', 'wpa_supplicant', 'hlr_auc_gw', 'wlantest']
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def find_processes(names=DAEMONS):
+    """Return a list of (pid, name) for running processes with given names"""
+    procs = []
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open('/proc/%s/comm' % pid, 'r') as f:
+                comm = f.read().strip()
+        except OSError:
+            continue
+        if comm in names:
+            procs.append((int(pid), comm))
+    return procs
+
+def _read_status(pid, vals):
+    with open('/proc/%d/status' % pid, 'r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                vals['rss'] = int(line.split()[1]) * 1024
+            elif line.startswith('voluntary_ctxt_switches:'):
+                vals['vol_ctxt'] = int(line.split()[1])
+            elif line.startswith('nonvoluntary_ctxt_switches:'):
+                vals['nonvol_ctxt'] = int(line.split()[1])
+
+def _read_pss(pid):
+    try:
+        with open('/proc/%d/smaps_rollup' % pid, 'r') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def _read_cpu(pid, vals):
+    with open('/proc/%d/stat' % pid, 'r') as f:
+        stat = f.read()
+    # comm may contain spaces, so parse the fields after the closing ')'
+    fields = stat[stat.rindex(')') + 2:].split()
+    vals['utime'] = int(fields[11]) / CLK_TCK
+    vals['stime'] = int(fields[12]) / CLK_TCK
+
+def sample_process(pid):
+    """Return a dict of resource usage values for a process or None if the
+    process is no longer available"""
+    vals = {'rss': None, 'pss': None, 'utime': None, 'stime': None,
+            'vol_ctxt': None, 'nonvol_ctxt': None, 'fds': None}
+    try:
+        _read_status(pid, vals)
+        _read_cpu(pid, vals)
+        vals['fds'] = len(os.listdir('/proc/%d/fd' % pid))
+    except (OSError, ValueError, IndexError):
+        return None
+    vals['pss'] = _read_pss(pid)
+    return vals
+
+class ResourceSampler(object):
+    """Periodically sample resource usage of the test daemons
+
+    A sample of each matching process is taken when the sampler is started,
+    every interval seconds while it is running, and when it is stopped.
+    The collected samples are available in the samples list as dicts with
+    time, pid, and process name in addition to the values from
+    sample_process().
+    """
+    def __init__(self, interval, names=DAEMONS):
+        self.interval = interval
+        self.names = names
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        now = time.time()
+        for pid, name in find_processes(self.names):
+            vals = sample_process(pid)
+            if vals is None:
+                continue
+            vals['time'] = now
+            vals['pid'] = pid
+            vals['process'] = name
+            self.samples.append(vals)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.info("Resource sampling failed: " + str(e))
+
+    def start(self):
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='proc-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.sample()
+
+    def peaks(self):
+        """Return {(pid, process): {'rss': max, 'pss': max, 'cpu': delta}}"""
+        res = {}
+        for s in self.samples:
+            key = (s['pid'], s['process'])
+            p = res.setdefault(key, {'rss': 0, 'pss': 0, 'cpu_start': None,
+                                     'cpu': 0.0})
+            p['rss'] = max(p['rss'], s['rss'] or 0)
+            p['pss'] = max(p['pss'], s['pss'] or 0)
+            cpu = s['utime'] + s['stime']
+            if p['cpu_start'] is None:
+                p['cpu_start'] = cpu
+            p['cpu'] = cpu - p['cpu_start']
+        for p in res.values():
+            del p['cpu_start']
+        return res
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+#
+# hwsim test results database
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from urllib.request import pathname2url
+import zlib
+
+try:
+    import zstandard
+    zstd_imported = True
+except ImportError:
+    zstd_imported = False
+
+import logging
+logger = logging.getLogger()
+
+CHUNK_SIZE = 65536
+
+class _ChunkReader(object):
+    """Minimal file object reading from an iterator of byte strings"""
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = bytearray()
+        self._pos = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) - self._pos < size:
+            buf = next(self._chunks, None)
+            if buf is None:
+                break
+            if self._pos:
+                del self._buf[:self._pos]
+                self._pos = 0
+            self._buf += buf
+        if size < 0:
+            size = len(self._buf) - self._pos
+        buf = bytes(self._buf[self._pos:self._pos + size])
+        self._pos += len(buf)
+        return buf
+
+class ResultsDB(object):
+    """sqlite3 database for run-tests.py results
+
+    The database is used in WAL mode and commits are batched: commit() is
+    only done when explicitly requested while batch_commit() commits once
+    enough rows or time has accumulated since the previous commit.
+
+    Log files are stored compressed in the blobs table, indexed by the
+    SHA-256 hash of the uncompressed contents, so that identical artifacts
+    from different test cases or runs are stored only once. The logs table
+    refers to these blobs. Rows written by older versions with the raw
+    file in logs.contents remain readable.
+
+    With readonly=True, the database is opened read-only and neither the
+    schema nor the journal mode is modified, e.g., for reports generated
+    while run-tests.py is writing to the same database.
+    """
+    def __init__(self, path, commit_rows=100, commit_interval=10,
+                 readonly=False):
+        self.readonly = readonly
+        self._commit_rows = commit_rows
+        self._commit_interval = commit_interval
+        self._pending = 0
+        self._last_commit = time.time()
+        if readonly:
+            uri = 'file:%s?mode=ro' % pathname2url(os.path.abspath(path))
+            self.conn = sqlite3.connect(uri, uri=True)
+            cols = [r[1] for r in self.conn.execute('PRAGMA table_info(logs)')]
+            self._blob_col = 'blob' if 'blob' in cols else 'NULL'
+            return
+        self._blob_col = 'blob'
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results (test,result,run,time,duration,build,commitid)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS tests (test,description)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS logs (test,run,type,contents)')
+        cols = [r[1] for r in self.conn.execute('PRAGMA table_info(logs)')]
+        if 'blob' not in cols:
+            self.conn.execute('ALTER TABLE logs ADD COLUMN blob')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS blobs (hash PRIMARY KEY,codec,size,data)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS phases (test,run,phase,duration)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS resources (test,run,time,pid,process,rss,pss,utime,stime,vol_ctxt,nonvol_ctxt,fds)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS event_latency (test,run,device,event,count,total,max,timeouts,buckets)')
+        self.conn.commit()
+
+    def execute(self, sql, params=()):
+        res = self.conn.execute(sql, params)
+        self._pending += 1
+        return res
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+        self._last_commit = time.time()
+
+    def batch_commit(self):
+        if self._pending >= self._commit_rows or \
+           time.time() - self._last_commit >= self._commit_interval:
+            self.commit()
+
+    def close(self):
+        if self.conn:
+            if not self.readonly:
+                self.commit()
+            self.conn.close()
+            self.conn = None
+
+    def _compressor(self):
+        if zstd_imported:
+            return 'zstd', zstandard.ZstdCompressor().compressobj()
+        return 'zlib', zlib.compressobj(6)
+
+    def add_blob(self, path):
+        h = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while buf := f.read(CHUNK_SIZE):
+                h.update(buf)
+                size += len(buf)
+        digest = h.hexdigest()
+        res = self.conn.execute('SELECT 1 FROM blobs WHERE hash=?', (digest, ))
+        if res.fetchone():
+            return digest
+
+        codec, comp = self._compressor()
+        data = []
+        with open(path, 'rb') as f:
+            while buf := f.read(CHUNK_SIZE):
+                data.append(comp.compress(buf))
+        data.append(comp.flush())
+        self.execute('INSERT OR IGNORE INTO blobs(hash,codec,size,data) VALUES(?, ?, ?, ?)',
+                     (digest, codec, size, sqlite3.Binary(b''.join(data))))
+        return digest
+
+    def add_log_file(self, test, run, type, path):
+        if not os.path.exists(path):
+            return
+        digest = self.add_blob(path)
+        self.execute('INSERT INTO logs(test,run,type,blob) VALUES(?, ?, ?, ?)',
+                     (test, run, type, digest))
+
+    def add_phases(self, test, run, phases):
+        for phase, duration in phases.items():
+            self.execute('INSERT INTO phases(test,run,phase,duration) VALUES(?, ?, ?, ?)',
+                         (test, run, phase, duration))
+
+    def add_resource_samples(self, test, run, samples):
+        cols = ['time', 'pid', 'process', 'rss', 'pss', 'utime', 'stime',
+                'vol_ctxt', 'nonvol_ctxt', 'fds']
+        sql = 'INSERT INTO resources(test,run,%s) VALUES(?, ?%s)' % (
+            ','.join(cols), ', ?' * len(cols))
+        self.conn.executemany(sql, [[test, run] + [s[c] for c in cols]
+                                    for s in samples])
+        self._pending += len(samples)
+
+    def add_event_latency(self, test, run, stats):
+        """Store {(device, event): event_stats.LatencyHistogram}"""
+        sql = 'INSERT INTO event_latency(test,run,device,event,count,total,max,timeouts,buckets) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)'
+        self.conn.executemany(sql, [(test, run, device, event, h.count,
+                                     h.total, h.max, h.timeouts, h.encode())
+                                    for (device, event), h in stats.items()])
+        self._pending += len(stats)
+
+    def _read_raw(self, rowid, table, column):
+        if hasattr(self.conn, 'blobopen'):
+            with self.conn.blobopen(table, column, rowid,
+                                    readonly=True) as blob:
+                while buf := blob.read(CHUNK_SIZE):
+                    yield buf
+            return
+        pos = 1
+        while True:
+            sql = 'SELECT substr(%s, ?, ?) FROM %s WHERE rowid=?' % (column,
+                                                                    table)
+            buf = self.conn.execute(sql, (pos, CHUNK_SIZE, rowid)).fetchone()[0]
+            if not buf:
+                break
+            yield bytes(buf)
+            pos += len(buf)
+
+    def read_blob(self, digest):
+        """Iterate over the uncompressed contents of a blob in chunks"""
+        row = self.conn.execute('SELECT rowid,codec FROM blobs WHERE hash=?',
+                                (digest, )).fetchone()
+        if row is None:
+            raise Exception("Unknown blob " + digest)
+        rowid, codec = row
+        if codec == 'zstd':
+            if not zstd_imported:
+                raise Exception("zstandard module needed for reading blob " + digest)
+            # Read in fixed-size pieces to keep memory use bounded even for
+            # highly compressible logs
+            raw = _ChunkReader(self._read_raw(rowid, 'blobs', 'data'))
+            with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                while buf := reader.read(CHUNK_SIZE):
+                    yield buf
+            return
+        if codec != 'zlib':
+            raise Exception("Unknown codec %s for blob %s" % (codec, digest))
+        decomp = zlib.decompressobj()
+        for buf in self._read_raw(rowid, 'blobs', 'data'):
+            # Limit the output size to keep memory use bounded even for
+            # highly compressible logs
+            while buf:
+                out = decomp.decompress(buf, CHUNK_SIZE)
+                if out:
+                    yield out
+                buf = decomp.unconsumed_tail
+        out = decomp.flush()
+        if out:
+            yield out
+
+    def read_log(self, test, run, type):
+        """Iterate over the contents of a stored log file in chunks"""
+        sql = 'SELECT rowid,%s FROM logs WHERE test=? AND run=? AND type=?' % \
+            self._blob_col
+        row = self.conn.execute(sql, (test, run, type)).fetchone()
+        if row is None:
+            raise Exception("No %s log for %s in run %s" % (type, test, run))
+        rowid, digest = row
+        if digest:
+            yield from self.read_blob(digest)
+        else:
+            yield from self._read_raw(rowid, 'logs', 'contents')
+
+    def log_types(self, test, run):
+        res = self.conn.execute('SELECT type FROM logs WHERE test=? AND run=?',
+                                (test, run))
+        return [r[0] for r in res]
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='read logs from hwsim test results database')
+    parser.add_argument('database', metavar='<sqlite3 db>')
+    parser.add_argument('test', metavar='<test>')
+    parser.add_argument('run', metavar='<run>', type=int)
+    parser.add_argument('type', metavar='<log type>', nargs='?',
+                        help='log type to write to stdout; list available types if not specified')
+    args = parser.parse_args()
+
+    db = ResultsDB(args.database, readonly=True)
+    try:
+        if args.type is None:
+            for t in db.log_types(args.test, args.run):
+                print(t)
+            return
+        out = sys.stdout.buffer
+        for buf in db.read_log(args.test, args.run, args.type):
+            out.write(buf)
+        out.flush()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
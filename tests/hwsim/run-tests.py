@@ -11,11 +11,12 @@ import re
 import gc
 import sys
 import time
-import glob
 from datetime import datetime
 import argparse
 import subprocess
 import termios
+import queue
+import threading
 
 import logging
 logger = logging.getLogger()
@@ -34,6 +35,12 @@ from hostapd import HostapdGlobal
 from check_kernel import check_kernel
 from wlantest import Wlantest
 from utils import HwsimSkip
+from proc_sampler import ResourceSampler, find_processes
+import perf_profile
+import perf_report
+import log_index
+import event_stats
+import hwsim
 
 def set_term_echo(fd, enabled):
     [iflag, oflag, cflag, lflag, ispeed, ospeed, cc] = termios.tcgetattr(fd)
@@ -80,25 +87,8 @@ def reset_devs(dev, apdev):
         ok = False
     return ok
 
-def add_log_file(conn, test, run, type, path):
-    if not os.path.exists(path):
-        return
-    contents = None
-    with open(path, 'rb') as f:
-        contents = f.read()
-    if contents is None:
-        return
-    sql = "INSERT INTO logs(test,run,type,contents) VALUES(?, ?, ?, ?)"
-    params = (test, run, type, sqlite3.Binary(contents))
-    try:
-        conn.execute(sql, params)
-        conn.commit()
-    except Exception as e:
-        logger.exception("sqlite:")
-        logger.error("sql: %r" % (params, ))
-
 def report(conn, prefill, build, commit, run, test, result, duration, logdir,
-           sql_commit=True):
+           sql_commit=True, phases=None, samples=None, event_latency=None):
     if conn:
         if not build:
             build = ''
@@ -110,27 +100,140 @@ def report(conn, prefill, build, commit, run, test, result, duration, logdir,
         params = (test, result, run, time.time(), duration, build, commit)
         try:
             conn.execute(sql, params)
-            if sql_commit:
-                conn.commit()
         except Exception as e:
             logger.exception("sqlite:")
             logger.error("sql: %r" % (params, ))
 
+        if phases:
+            try:
+                conn.add_phases(test, run, phases)
+            except Exception as e:
+                logger.exception("sqlite:")
+                logger.error("phases: %r" % (phases, ))
+
+        if samples:
+            try:
+                conn.add_resource_samples(test, run, samples)
+            except Exception as e:
+                logger.exception("sqlite:")
+
+        if event_latency:
+            try:
+                conn.add_event_latency(test, run, event_latency)
+            except Exception as e:
+                logger.exception("sqlite:")
+
         if result == "FAIL":
             for log in ["log", "log0", "log1", "log2", "log3", "log5",
                         "hostapd", "dmesg", "hwsim0", "hwsim0.pcapng"]:
-                add_log_file(conn, test, run, log,
-                             logdir + "/" + test + "." + log)
+                try:
+                    conn.add_log_file(test, run, log,
+                                      logdir + "/" + test + "." + log)
+                except Exception as e:
+                    logger.exception("sqlite:")
+                    logger.error("log file: %s" % log)
+
+        if sql_commit:
+            conn.batch_commit()
+
+def decrypt_capture(logdir, testname, pcap, logs):
+    found_key = False
+    pmks_name = os.path.join(logdir, f'{testname}.pmks')
+    ptks_name = os.path.join(logdir, f'{testname}.ptks')
+    with open(pmks_name, 'wb') as pmks, \
+         open(ptks_name, 'wb') as ptks:
+        for f in logs:
+            with open(f, 'rb') as logfile:
+                for line in logfile:
+                    if b'PTK - hexdump' in line:
+                        ptks.write(line.split(b':')[-1].replace(b' ', b''))
+                        found_key = True
+                    if b'PMK - hexdump' in line:
+                        pmks.write(line.split(b':')[-1].replace(b' ', b''))
+                        found_key = True
+
+    if found_key:
+        out_pcap = os.path.join(logdir, f'{testname}.hwsim0.dec.pcapng')
+        if os.path.isfile('../../wlantest/wlantest'):
+            wlantest_bin = '../../wlantest/wlantest'
+        else:
+            wlantest_bin = 'wlantest'
+        with open(os.path.join(logdir, f'{testname}.dec.log'), 'w') as dec_log:
+            subprocess.run([wlantest_bin, '-r', pcap, '-f', pmks_name,
+                            '-T', ptks_name, '-n', out_pcap],
+                           stdout=dec_log)
+
+class ArtifactPipeline(object):
+    """Background workers for post-test artifact processing
+
+    Jobs are queued from the test loop once all files they need have been
+    renamed into their final per-test names, so they can run while the next
+    test case is already executing. The queue is bounded: if the workers
+    fall behind, submit() blocks instead of letting pending work grow
+    without limits. With no workers, jobs are run synchronously.
+    """
+    def __init__(self, workers, queue_size):
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker,
+                                 name='artifact-%d' % i, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self, name, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            logger.exception("Post-test processing failed for " + name)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            self._run(*job)
+
+    def submit(self, name, func, *args):
+        if not self._threads:
+            self._run(name, func, args)
+            return
+        self._queue.put((name, func, args))
+
+    def close(self):
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
 
 class DataCollector(object):
-    def __init__(self, logdir, testname, kmemleak, args):
+    def __init__(self, logdir, testname, kmemleak, args, pipeline=None):
         self._logdir = logdir
         self._testname = testname
         self._tracing = args.tracing
         self._dmesg = args.dmesg
         self._kmemleak = kmemleak
         self._dbus = args.dbus
+        self._pipeline = pipeline
+        self._sample_interval = args.sample_interval
+        self._sampler = None
+        self.samples = []
+        self._profile = args.profile
+        self._perf = None
+        self._event_latency = args.event_latency
+        self.event_latency = None
     def __enter__(self):
+        if self._event_latency:
+            event_stats.start()
+        if self._profile:
+            output = os.path.join(self._logdir, f'{self._testname}.perf.data')
+            pids = [pid for pid, name in find_processes()]
+            self._perf = perf_profile.PerfRecorder(output, pids)
+            self._perf.start()
+        if self._sample_interval:
+            self._sampler = ResourceSampler(self._sample_interval)
+            self._sampler.start()
         if self._tracing:
             output = os.path.abspath(os.path.join(self._logdir, '%s.dat' % (self._testname, )))
             self._trace_cmd = subprocess.Popen(['trace-cmd', 'record', '-o', output, '-T', '-e', 'skb', '-e', 'mac80211', '-e', 'cfg80211', '-e', 'printk', 'sh', '-c', 'echo STARTED ; read l'],
@@ -155,41 +258,44 @@ class DataCollector(object):
             if res:
                 print("Failed calling dbus-monitor: returned exit status %d" % res)
                 sys.exit(1)
+        return self
     def __exit__(self, type, value, traceback):
+        if self._sampler:
+            self._sampler.stop()
+            self.samples = self._sampler.samples
+            for (pid, name), peak in self._sampler.peaks().items():
+                logger.info("%s[%d]: peak RSS %d kB, peak PSS %d kB, CPU %.2f s" %
+                            (name, pid, peak['rss'] // 1024,
+                             peak['pss'] // 1024, peak['cpu']))
+        if self._perf and self._perf.stop():
+            folded = os.path.join(self._logdir,
+                                  f'{self._testname}.perf.folded')
+            args = (self._perf.output, folded)
+            if self._pipeline:
+                self._pipeline.submit(self._testname, perf_profile.fold, *args)
+            else:
+                perf_profile.fold(*args)
         if self._tracing:
             self._trace_cmd.stdin.write(b'DONE\n')
             self._trace_cmd.stdin.flush()
             self._trace_cmd.wait()
 
+        if self._event_latency:
+            self.event_latency = event_stats.stop()
         pcap = os.path.join(self._logdir, f'{self._testname}.hwsim0.pcapng')
         if os.path.exists(pcap):
-            found_key = False
-            pmks_name = os.path.join(self._logdir, f'{self._testname}.pmks')
-            ptks_name = os.path.join(self._logdir, f'{self._testname}.ptks')
-            with open(pmks_name, 'wb') as pmks, \
-                 open(ptks_name, 'wb') as ptks:
-                logs = os.path.join(self._logdir, f'{self._testname}.*')
-                for f in glob.glob(logs):
-                    if f.endswith('.pcapng'): continue
-                    with open(f, 'rb') as logfile:
-                        for line in logfile:
-                            if b'PTK - hexdump' in line:
-                                ptks.write(line.split(b':')[-1].replace(b' ', b''))
-                                found_key = True
-                            if b'PMK - hexdump' in line:
-                                pmks.write(line.split(b':')[-1].replace(b' ', b''))
-                                found_key = True
-
-            if found_key:
-                out_pcap = os.path.join(self._logdir, f'{self._testname}.hwsim0.dec.pcapng')
-                if os.path.isfile('../../wlantest/wlantest'):
-                    wlantest_bin = '../../wlantest/wlantest'
-                else:
-                    wlantest_bin = 'wlantest'
-                with open(os.path.join(self._logdir, f'{self._testname}.dec.log'), 'w') as dec_log:
-                    subprocess.run([wlantest_bin, '-r', pcap, '-f', pmks_name,
-                                    '-T', ptks_name, '-n', out_pcap],
-                                   stdout=dec_log)
+            # The list of log files is taken here so that files created later
+            # (e.g., by a repeated run of the same test case) are not mixed
+            # in; the actual key extraction and decryption pass can be done
+            # in the background since these files are no longer written to.
+            # Only the text logs are included; the sidecar index files of
+            # --log-index are replaced concurrently by the log pipeline.
+            logs = log_index.test_logs(self._logdir, self._testname)
+            args = (self._logdir, self._testname, pcap, logs)
+            if self._pipeline:
+                self._pipeline.submit(self._testname, decrypt_capture, *args)
+            else:
+                decrypt_capture(*args)
 
         if self._kmemleak:
             output = os.path.join(self._logdir, '%s.kmemleak' % (self._testname, ))
@@ -228,7 +334,7 @@ class DataCollector(object):
                 num += 1
             subprocess.call(['dmesg', '-c'], stdout=open(output, 'w'))
 
-def rename_log(logdir, basename, testname, dev):
+def rename_log(logdir, basename, testname, dev, pipeline=None):
     try:
         import getpass
         srcname = os.path.join(logdir, basename)
@@ -242,6 +348,8 @@ def rename_log(logdir, basename, testname, dev):
         if dev:
             dev.relog()
             subprocess.call(['chown', '-f', getpass.getuser(), srcname])
+        if pipeline and log_index.is_text_log(dstname):
+            pipeline.submit(testname, log_index.update_index, dstname)
     except Exception as e:
         logger.exception("Failed to rename log files")
 
@@ -304,12 +412,40 @@ def main():
     parser.add_argument('-b', metavar='<build>', dest='build', help='build ID')
     parser.add_argument('-L', action='store_true', dest='update_tests_db',
                         help='List tests (and update descriptions in DB)')
+    parser.add_argument('--perf-report', metavar='<file>', nargs='?',
+                        const='-', dest='perf_report',
+                        help='write test duration regression report for a run in the database (JSON, default to stdout) and exit')
+    parser.add_argument('--perf-run', metavar='<run>', type=int,
+                        dest='perf_run',
+                        help='run to check with --perf-report (default: latest)')
+    parser.add_argument('--perf-window', metavar='<count>', type=int,
+                        default=10, dest='perf_window',
+                        help='number of preceding runs to use as the baseline for --perf-report')
     parser.add_argument('-T', action='store_true', dest='tracing',
                         help='collect tracing per test case (in log directory)')
     parser.add_argument('-D', action='store_true', dest='dmesg',
                         help='collect dmesg per test case (in log directory)')
     parser.add_argument('--dbus', action='store_true', dest='dbus',
                         help='collect dbus per test case (in log directory)')
+    parser.add_argument('--sample-interval', metavar='<seconds>', type=float,
+                        dest='sample_interval',
+                        help='sample resource usage of the daemons at this interval during each test case (stored in the database)')
+    parser.add_argument('--profile', action='store_true',
+                        help='record perf call graphs of the daemons per test case and merge folded stacks per test module (in log directory)')
+    parser.add_argument('--post-workers', metavar='<count>', type=int,
+                        default=0, dest='post_workers',
+                        help='number of background workers for post-test processing (default: 0 = process synchronously before the next test case)')
+    parser.add_argument('--post-queue', metavar='<count>', type=int,
+                        default=8, dest='post_queue',
+                        help='maximum number of test cases waiting for post-test processing')
+    parser.add_argument('--event-latency', action='store_true',
+                        dest='event_latency',
+                        help='record event wait latency histograms per test case (stored in the database)')
+    parser.add_argument('--log-index', action='store_true', dest='log_index',
+                        help='build sidecar indexes of the renamed debug logs for log_index.py queries')
+    parser.add_argument('--radio-pool', metavar='<count>', type=int,
+                        default=0, dest='radio_pool',
+                        help='keep this many pre-created radios per common capability set for HWSimRadio (0 = create a new radio for each use)')
     parser.add_argument('--shuffle-tests', action='store_true',
                         dest='shuffle_tests',
                         help='Shuffle test cases to randomize order')
@@ -357,13 +493,34 @@ def main():
         if not sqlite3_imported:
             print("No sqlite3 module found")
             sys.exit(2)
-        conn = sqlite3.connect(args.database)
-        conn.execute('CREATE TABLE IF NOT EXISTS results (test,result,run,time,duration,build,commitid)')
-        conn.execute('CREATE TABLE IF NOT EXISTS tests (test,description)')
-        conn.execute('CREATE TABLE IF NOT EXISTS logs (test,run,type,contents)')
+        from results_db import ResultsDB
+        conn = ResultsDB(args.database, readonly=bool(args.perf_report))
     else:
         conn = None
 
+    if args.perf_report:
+        if not conn:
+            print('--perf-report requires a database (-S)')
+            sys.exit(2)
+        modules = perf_report.test_modules()
+        try:
+            rep = perf_report.perf_report(conn.conn, args.perf_run,
+                                          window=args.perf_window,
+                                          modules=modules)
+        except Exception as e:
+            print("Could not generate performance report: " + str(e))
+            sys.exit(2)
+        finally:
+            conn.close()
+        if args.perf_report == '-':
+            perf_report.write_report(rep)
+        else:
+            with open(args.perf_report, 'w') as f:
+                perf_report.write_report(rep, f)
+            for l in perf_report.summary(rep):
+                print(l)
+        sys.exit(1 if rep['regressions'] else 0)
+
     if conn:
         run = int(time.time())
 
@@ -498,6 +655,9 @@ def main():
         from random import shuffle
         shuffle(tests_to_run)
 
+    pipeline = ArtifactPipeline(args.post_workers, args.post_queue)
+    index_pipeline = pipeline if args.log_index else None
+
     count = 0
     if args.stdin_ctrl:
         print("READY")
@@ -513,262 +673,297 @@ def main():
         if d.get_driver_status_field("country") != "00":
             check_country_00 = False
 
-    while True:
-        if args.stdin_ctrl:
-            test = sys.stdin.readline()
-            if not test:
-                break
-            test = test.splitlines()[0]
-            if test == '':
-                break
-            t = None
-            for tt in tests:
-                name = tt.__name__.replace('test_', '', 1)
-                if name == test:
-                    t = tt
+    if args.radio_pool:
+        hwsim.start_pool(idle=args.radio_pool,
+                         max_idle=max(args.radio_pool, 4))
+    try:
+        while True:
+            if args.stdin_ctrl:
+                test = sys.stdin.readline()
+                if not test:
                     break
-            if not t:
-                print("NOT-FOUND")
-                sys.stdout.flush()
-                continue
-        else:
-            if len(tests_to_run) == 0:
-                break
-            t = tests_to_run.pop(0)
-
-        if dev[0].get_driver_status_field("country") == "98":
-            # Work around cfg80211 regulatory issues in clearing intersected
-            # country code 98. Need to make station disconnect without any
-            # other wiphy being active in the system.
-            logger.info("country=98 workaround - try to clear state")
-            id = dev[1].add_network()
-            dev[1].set_network(id, "mode", "2")
-            dev[1].set_network_quoted(id, "ssid", "country98")
-            dev[1].set_network(id, "key_mgmt", "NONE")
-            dev[1].set_network(id, "frequency", "2412")
-            dev[1].set_network(id, "scan_freq", "2412")
-            dev[1].select_network(id)
-            ev = dev[1].wait_event(["CTRL-EVENT-CONNECTED"])
-            if ev:
-                dev[0].connect("country98", key_mgmt="NONE", scan_freq="2412")
-                dev[1].request("DISCONNECT")
-                dev[0].wait_disconnected()
-                dev[0].disconnect_and_stop_scan()
-            dev[0].reset()
-            dev[1].reset()
-            dev[0].dump_monitor()
-            dev[1].dump_monitor()
-
-        name = t.__name__.replace('test_', '', 1)
-        open('/dev/kmsg', 'w').write('running hwsim test case %s\n' % name)
-        if log_handler:
-            log_handler.stream.close()
-            logger.removeHandler(log_handler)
-            file_name = os.path.join(args.logdir, name + '.log')
-            log_handler = logging.FileHandler(file_name, encoding='utf-8')
-            log_handler.setLevel(logging.DEBUG)
-            log_handler.setFormatter(log_formatter)
-            logger.addHandler(log_handler)
+                test = test.splitlines()[0]
+                if test == '':
+                    break
+                t = None
+                for tt in tests:
+                    name = tt.__name__.replace('test_', '', 1)
+                    if name == test:
+                        t = tt
+                        break
+                if not t:
+                    print("NOT-FOUND")
+                    sys.stdout.flush()
+                    continue
+            else:
+                if len(tests_to_run) == 0:
+                    break
+                t = tests_to_run.pop(0)
+
+            if dev[0].get_driver_status_field("country") == "98":
+                # Work around cfg80211 regulatory issues in clearing intersected
+                # country code 98. Need to make station disconnect without any
+                # other wiphy being active in the system.
+                logger.info("country=98 workaround - try to clear state")
+                id = dev[1].add_network()
+                dev[1].set_network(id, "mode", "2")
+                dev[1].set_network_quoted(id, "ssid", "country98")
+                dev[1].set_network(id, "key_mgmt", "NONE")
+                dev[1].set_network(id, "frequency", "2412")
+                dev[1].set_network(id, "scan_freq", "2412")
+                dev[1].select_network(id)
+                ev = dev[1].wait_event(["CTRL-EVENT-CONNECTED"])
+                if ev:
+                    dev[0].connect("country98", key_mgmt="NONE", scan_freq="2412")
+                    dev[1].request("DISCONNECT")
+                    dev[0].wait_disconnected()
+                    dev[0].disconnect_and_stop_scan()
+                dev[0].reset()
+                dev[1].reset()
+                dev[0].dump_monitor()
+                dev[1].dump_monitor()
 
-        try:
-            with open('/sys/kernel/debug/clear_warn_once', 'w') as f:
-                f.write('1\n')
-        except FileNotFoundError:
-            pass
+            name = t.__name__.replace('test_', '', 1)
+            open('/dev/kmsg', 'w').write('running hwsim test case %s\n' % name)
+            if log_handler:
+                log_handler.stream.close()
+                logger.removeHandler(log_handler)
+                file_name = os.path.join(args.logdir, name + '.log')
+                log_handler = logging.FileHandler(file_name, encoding='utf-8')
+                log_handler.setLevel(logging.DEBUG)
+                log_handler.setFormatter(log_formatter)
+                logger.addHandler(log_handler)
 
-        reset_ok = True
-        with DataCollector(args.logdir, name, have_kmemleak, args):
-            count = count + 1
-            msg = "START {} {}/{}".format(name, count, num_tests)
-            logger.info(msg)
-            if args.loglevel == logging.WARNING:
-                print(msg)
-                sys.stdout.flush()
-            if t.__doc__:
-                logger.info("Test: " + t.__doc__)
-            start = datetime.now()
-            open('/dev/kmsg', 'w').write('TEST-START %s @%.6f\n' % (name, time.time()))
-            for d in dev:
+            try:
+                with open('/sys/kernel/debug/clear_warn_once', 'w') as f:
+                    f.write('1\n')
+            except FileNotFoundError:
+                pass
+
+            # Create pooled radios for the next test case before it starts
+            hwsim.refill_pool()
+
+            reset_ok = True
+            with DataCollector(args.logdir, name, have_kmemleak, args, pipeline) as collector:
+                count = count + 1
+                msg = "START {} {}/{}".format(name, count, num_tests)
+                logger.info(msg)
+                if args.loglevel == logging.WARNING:
+                    print(msg)
+                    sys.stdout.flush()
+                if t.__doc__:
+                    logger.info("Test: " + t.__doc__)
+                start = datetime.now()
+                phases = {}
+                phase_start = time.time()
+                open('/dev/kmsg', 'w').write('TEST-START %s @%.6f\n' % (name, time.time()))
+                for d in dev:
+                    try:
+                        d.dump_monitor()
+                        if not d.ping():
+                            raise Exception("PING failed for {}".format(d.ifname))
+                        if not d.global_ping():
+                            raise Exception("Global PING failed for {}".format(d.ifname))
+                        d.request("NOTE TEST-START " + name)
+                    except Exception as e:
+                        logger.exception("Failed to issue TEST-START before " + name + " for " + d.ifname)
+                        print("FAIL " + name + " - could not start test")
+                        if conn:
+                            conn.close()
+                            conn = None
+                        pipeline.close()
+                        if args.stdin_ctrl:
+                            set_term_echo(sys.stdin.fileno(), True)
+                        sys.exit(1)
+                for ifname in ['/tmp/wpas-wlan5']:
+                    wpas = None
+                    try:
+                        wpas = WpaSupplicant(global_iface=ifname, monitor=False)
+                        wpas.global_request("NOTE TEST-START " + name)
+                        del wpas
+                    except:
+                        logger.exception("Failed to issue TEST-START before " + name + " for " + ifname)
+                        print("FAIL " + name + " - could not start test")
                 try:
-                    d.dump_monitor()
-                    if not d.ping():
-                        raise Exception("PING failed for {}".format(d.ifname))
-                    if not d.global_ping():
-                        raise Exception("Global PING failed for {}".format(d.ifname))
-                    d.request("NOTE TEST-START " + name)
+                    hapd = HostapdGlobal()
+                    hapd.request("NOTE TEST-START " + name)
+                    del hapd
                 except Exception as e:
-                    logger.exception("Failed to issue TEST-START before " + name + " for " + d.ifname)
+                    logger.exception("Failed to issue TEST-START before " + name + " for hostapd")
                     print("FAIL " + name + " - could not start test")
-                    if conn:
-                        conn.close()
-                        conn = None
-                    if args.stdin_ctrl:
-                        set_term_echo(sys.stdin.fileno(), True)
-                    sys.exit(1)
-            for ifname in ['/tmp/wpas-wlan5']:
-                wpas = None
+                skip_reason = None
+                now = time.time()
+                phases['start'] = now - phase_start
+                phase_start = now
                 try:
-                    wpas = WpaSupplicant(global_iface=ifname, monitor=False)
-                    wpas.global_request("NOTE TEST-START " + name)
-                    del wpas
-                except:
-                    logger.exception("Failed to issue TEST-START before " + name + " for " + ifname)
-                    print("FAIL " + name + " - could not start test")
-            try:
-                hapd = HostapdGlobal()
-                hapd.request("NOTE TEST-START " + name)
-                del hapd
-            except Exception as e:
-                logger.exception("Failed to issue TEST-START before " + name + " for hostapd")
-                print("FAIL " + name + " - could not start test")
-            skip_reason = None
-            try:
-                if is_long_duration_test(t) and not args.long:
-                    raise HwsimSkip("Skip test case with long duration due to --long not specified")
-                if t.__code__.co_argcount > 2:
-                    params = {}
-                    params['logdir'] = args.logdir
-                    params['name'] = name
-                    params['prefix'] = os.path.join(args.logdir, name)
-                    t(dev, apdev, params)
-                elif t.__code__.co_argcount > 1:
-                    t(dev, apdev)
-                else:
-                    t(dev)
-                result = "PASS"
-                if check_country_00:
-                    for d in dev:
-                        country = d.get_driver_status_field("country")
-                        if country is None:
-                            logger.info(d.ifname + ": Could not fetch country code after the test case run")
-                        elif country != "00":
-                            d.dump_monitor()
-                            logger.info(d.ifname + ": Country code not reset back to 00: is " + country)
-                            print(d.ifname + ": Country code not reset back to 00: is " + country)
-                            result = "FAIL"
-
-                            # Try to wait for cfg80211 regulatory state to
-                            # clear.
-                            d.cmd_execute(['iw', 'reg', 'set', '00'])
-                            for i in range(5):
-                                time.sleep(1)
-                                country = d.get_driver_status_field("country")
+                    if is_long_duration_test(t) and not args.long:
+                        raise HwsimSkip("Skip test case with long duration due to --long not specified")
+                    if t.__code__.co_argcount > 2:
+                        params = {}
+                        params['logdir'] = args.logdir
+                        params['name'] = name
+                        params['prefix'] = os.path.join(args.logdir, name)
+                        t(dev, apdev, params)
+                    elif t.__code__.co_argcount > 1:
+                        t(dev, apdev)
+                    else:
+                        t(dev)
+                    result = "PASS"
+                    if check_country_00:
+                        for d in dev:
+                            country = d.get_driver_status_field("country")
+                            if country is None:
+                                logger.info(d.ifname + ": Could not fetch country code after the test case run")
+                            elif country != "00":
+                                d.dump_monitor()
+                                logger.info(d.ifname + ": Country code not reset back to 00: is " + country)
+                                print(d.ifname + ": Country code not reset back to 00: is " + country)
+                                result = "FAIL"
+
+                                # Try to wait for cfg80211 regulatory state to
+                                # clear.
+                                d.cmd_execute(['iw', 'reg', 'set', '00'])
+                                for i in range(5):
+                                    time.sleep(1)
+                                    country = d.get_driver_status_field("country")
+                                    if country == "00":
+                                        break
                                 if country == "00":
-                                    break
-                            if country == "00":
-                                print(d.ifname + ": Country code cleared back to 00")
-                                logger.info(d.ifname + ": Country code cleared back to 00")
-                            else:
-                                print("Country code remains set - expect following test cases to fail")
-                                logger.info("Country code remains set - expect following test cases to fail")
-                            break
-            except HwsimSkip as e:
-                logger.info("Skip test case: %s" % e)
-                skip_reason = e
-                result = "SKIP"
-            except Exception as e:
-                logger.exception(f"Exception during test execution: {str(e)}")
-                result = "FAIL"
-
-            # Work around some objects having __del__, we really should
-            # use context managers, but that's complex. Doing this here
-            # will (on cpython at least) at make sure those objects that
-            # are no longer reachable will be collected now, invoking
-            # __del__() on them. This then ensures that __del__() isn't
-            # invoked at a bad time, e.g. causing recursion in locking.
-            gc.collect()
-
-            open('/dev/kmsg', 'w').write('TEST-STOP %s @%.6f\n' % (name, time.time()))
-            for d in dev:
-                try:
-                    d.dump_monitor()
-                    d.request("NOTE TEST-STOP " + name)
+                                    print(d.ifname + ": Country code cleared back to 00")
+                                    logger.info(d.ifname + ": Country code cleared back to 00")
+                                else:
+                                    print("Country code remains set - expect following test cases to fail")
+                                    logger.info("Country code remains set - expect following test cases to fail")
+                                break
+                except HwsimSkip as e:
+                    logger.info("Skip test case: %s" % e)
+                    skip_reason = e
+                    result = "SKIP"
                 except Exception as e:
-                    logger.exception("Failed to issue TEST-STOP after {} for {}".format(name, d.ifname))
+                    logger.exception(f"Exception during test execution: {str(e)}")
                     result = "FAIL"
-            if args.no_reset:
-                print("Leaving devices in current state")
-            else:
-                reset_ok = reset_devs(dev, apdev)
 
-            for i in [5, 6, 7]:
-                wpas = None
+                # Work around some objects having __del__, we really should
+                # use context managers, but that's complex. Doing this here
+                # will (on cpython at least) at make sure those objects that
+                # are no longer reachable will be collected now, invoking
+                # __del__() on them. This then ensures that __del__() isn't
+                # invoked at a bad time, e.g. causing recursion in locking.
+                gc.collect()
+                now = time.time()
+                phases['test'] = now - phase_start
+                phase_start = now
+
+                open('/dev/kmsg', 'w').write('TEST-STOP %s @%.6f\n' % (name, time.time()))
+                for d in dev:
+                    try:
+                        d.dump_monitor()
+                        d.request("NOTE TEST-STOP " + name)
+                    except Exception as e:
+                        logger.exception("Failed to issue TEST-STOP after {} for {}".format(name, d.ifname))
+                        result = "FAIL"
+                if args.no_reset:
+                    print("Leaving devices in current state")
+                else:
+                    reset_ok = reset_devs(dev, apdev)
+
+                for i in [5, 6, 7]:
+                    wpas = None
+                    try:
+                        wpas = WpaSupplicant(global_iface="/tmp/wpas-wlan%d" % i,
+                                             monitor=False)
+                        rename_log(args.logdir, 'log%d' % i, name, wpas,
+                                   index_pipeline)
+                        if not args.no_reset:
+                            wpas.remove_ifname()
+                    except Exception as e:
+                        pass
+                    if wpas:
+                        wpas.close_ctrl()
+                        del wpas
+
+                for i in range(0, 3):
+                    rename_log(args.logdir, 'log' + str(i), name, dev[i],
+                               index_pipeline)
                 try:
-                    wpas = WpaSupplicant(global_iface="/tmp/wpas-wlan%d" % i,
-                                         monitor=False)
-                    rename_log(args.logdir, 'log%d' % i, name, wpas)
-                    if not args.no_reset:
-                        wpas.remove_ifname()
+                    hapd = HostapdGlobal()
                 except Exception as e:
-                    pass
-                if wpas:
-                    wpas.close_ctrl()
-                    del wpas
-
-            for i in range(0, 3):
-                rename_log(args.logdir, 'log' + str(i), name, dev[i])
-            try:
-                hapd = HostapdGlobal()
-            except Exception as e:
-                logger.exception("Failed to connect to hostapd interface")
-                reset_ok = False
-                result = "FAIL"
-                hapd = None
-            rename_log(args.logdir, 'hostapd', name, hapd)
-            if hapd:
-                del hapd
-                hapd = None
-
-            # Use None here since this instance of Wlantest() will never be
-            # used for remote host hwsim tests on real hardware.
-            Wlantest.setup(None)
-            wt = Wlantest()
-            rename_log(args.logdir, 'hwsim0.pcapng', name, wt)
-            rename_log(args.logdir, 'hwsim0', name, wt)
-            if os.path.exists(os.path.join(args.logdir, 'fst-wpa_supplicant')):
-                rename_log(args.logdir, 'fst-wpa_supplicant', name, None)
-            if os.path.exists(os.path.join(args.logdir, 'fst-hostapd')):
-                rename_log(args.logdir, 'fst-hostapd', name, None)
-            if os.path.exists(os.path.join(args.logdir, 'wmediumd.log')):
-                rename_log(args.logdir, 'wmediumd.log', name, None)
-
-        end = datetime.now()
-        diff = end - start
-
-        if result == 'PASS' and args.dmesg:
-            if not check_kernel(os.path.join(args.logdir, name + '.dmesg')):
-                logger.info("Kernel issue found in dmesg - mark test failed")
-                result = 'FAIL'
-
-        if result == 'PASS' and have_kmemleak:
-            # The file is only created if a leak was found
-            if os.path.exists(os.path.join(args.logdir, name + '.kmemleak')):
-                logger.info("Kernel memory leak found - mark test failed")
-                result = 'FAIL'
-
-        if result == 'PASS':
-            passed.append(name)
-        elif result == 'SKIP':
-            skipped.append(name)
-        else:
-            failed.append(name)
+                    logger.exception("Failed to connect to hostapd interface")
+                    reset_ok = False
+                    result = "FAIL"
+                    hapd = None
+                rename_log(args.logdir, 'hostapd', name, hapd, index_pipeline)
+                if hapd:
+                    del hapd
+                    hapd = None
+
+                # Use None here since this instance of Wlantest() will never be
+                # used for remote host hwsim tests on real hardware.
+                Wlantest.setup(None)
+                wt = Wlantest()
+                rename_log(args.logdir, 'hwsim0.pcapng', name, wt)
+                rename_log(args.logdir, 'hwsim0', name, wt, index_pipeline)
+                if os.path.exists(os.path.join(args.logdir, 'fst-wpa_supplicant')):
+                    rename_log(args.logdir, 'fst-wpa_supplicant', name, None,
+                               index_pipeline)
+                if os.path.exists(os.path.join(args.logdir, 'fst-hostapd')):
+                    rename_log(args.logdir, 'fst-hostapd', name, None,
+                               index_pipeline)
+                if os.path.exists(os.path.join(args.logdir, 'wmediumd.log')):
+                    rename_log(args.logdir, 'wmediumd.log', name, None,
+                               index_pipeline)
+                now = time.time()
+                phases['stop'] = now - phase_start
+                phase_start = now
+
+            phases['collect'] = time.time() - phase_start
+            end = datetime.now()
+            diff = end - start
+
+            if result == 'PASS' and args.dmesg:
+                if not check_kernel(os.path.join(args.logdir, name + '.dmesg')):
+                    logger.info("Kernel issue found in dmesg - mark test failed")
+                    result = 'FAIL'
+
+            if result == 'PASS' and have_kmemleak:
+                # The file is only created if a leak was found
+                if os.path.exists(os.path.join(args.logdir, name + '.kmemleak')):
+                    logger.info("Kernel memory leak found - mark test failed")
+                    result = 'FAIL'
+
+            if result == 'PASS':
+                passed.append(name)
+            elif result == 'SKIP':
+                skipped.append(name)
+            else:
+                failed.append(name)
+
+            report(conn, args.prefill, args.build, args.commit, run, name, result,
+                   diff.total_seconds(), args.logdir, phases=phases,
+                   samples=collector.samples,
+                   event_latency=collector.event_latency)
+            result = "{} {} {} {}".format(result, name, diff.total_seconds(), end)
+            logger.info(result)
+            if args.loglevel == logging.WARNING:
+                print(result)
+                if skip_reason:
+                    print("REASON", skip_reason)
+                sys.stdout.flush()
 
-        report(conn, args.prefill, args.build, args.commit, run, name, result,
-               diff.total_seconds(), args.logdir)
-        result = "{} {} {} {}".format(result, name, diff.total_seconds(), end)
-        logger.info(result)
-        if args.loglevel == logging.WARNING:
-            print(result)
-            if skip_reason:
-                print("REASON", skip_reason)
-            sys.stdout.flush()
+            if not reset_ok:
+                print("Terminating early due to device reset failure")
+                break
 
-        if not reset_ok:
-            print("Terminating early due to device reset failure")
-            break
+        for d in dev:
+            d.close_ctrl()
+    finally:
+        hwsim.stop_pool()
+    pipeline.close()
 
-    for d in dev:
-        d.close_ctrl()
+    if args.profile:
+        modules = perf_report.test_modules()
+        for f in perf_profile.merge_modules(args.logdir, modules):
+            logger.info("Profile: " + f)
 
     if args.stdin_ctrl:
         set_term_echo(sys.stdin.fileno(), True)
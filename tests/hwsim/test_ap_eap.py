@@ -5824,7 +5824,7 @@ def run_eap_key_lifetime_in_memory(dev, params, id, password):
     time.sleep(1)
     dev[0].ping()
     password = password.encode()
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid)
 
     dev[0].request("DISCONNECT")
     dev[0].wait_disconnected()
@@ -5862,11 +5862,13 @@ def run_eap_key_lifetime_in_memory(dev, params, id, password):
     kck = ptk[0:16]
     kek = ptk[16:32]
     tk = ptk[32:48]
+    keys = [password, pmk, msk, emsk, kck, kek, tk, gtk]
 
     fname = os.path.join(params['logdir'],
                          'wpa2_eap_ttls_pap_key_lifetime_in_memory.memctx-')
 
     logger.info("Checking keys in memory while associated")
+    buf = buf.scan(keys)
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
     get_key_locations(buf, msk, "MSK")
@@ -5883,7 +5885,7 @@ def run_eap_key_lifetime_in_memory(dev, params, id, password):
     #    raise Exception("TK found from memory")
 
     logger.info("Checking keys in memory after disassociation")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     # Note: Password is still present in network configuration
     # Note: PMK is in PMKSA cache and EAP fast re-auth data
@@ -5902,7 +5904,7 @@ def run_eap_key_lifetime_in_memory(dev, params, id, password):
     dev[0].request("PMKSA_FLUSH")
     dev[0].set_network_quoted(id, "identity", "foo")
     logger.info("Checking keys in memory after PMKSA cache and EAP fast reauth flush")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
     get_key_locations(buf, msk, "MSK")
@@ -5912,7 +5914,7 @@ def run_eap_key_lifetime_in_memory(dev, params, id, password):
     dev[0].request("REMOVE_NETWORK all")
 
     logger.info("Checking keys in memory after network profile removal")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
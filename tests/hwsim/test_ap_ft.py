@@ -11,7 +11,6 @@ import time
 import logging
 logger = logging.getLogger()
 import signal
-import struct
 import subprocess
 import tempfile
 
@@ -2205,7 +2204,7 @@ def test_ft_psk_key_lifetime_in_memory(dev, apdev, params):
     time.sleep(1)
     dev[0].ping()
 
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid)
 
     dev[0].request("DISCONNECT")
     dev[0].wait_disconnected()
@@ -2239,8 +2238,10 @@ def test_ft_psk_key_lifetime_in_memory(dev, apdev, params):
         raise Exception("Could not find keys from debug log")
     if len(gtk) != 16:
         raise Exception("Unexpected GTK length")
+    keys = [pmk, pmkr0, pmkr1, kck, kek, tk, gtk]
 
     logger.info("Checking keys in memory while associated")
+    buf = buf.scan(keys)
     get_key_locations(buf, pmk, "PMK")
     get_key_locations(buf, pmkr0, "PMK-R0")
     get_key_locations(buf, pmkr1, "PMK-R1")
@@ -2258,7 +2259,7 @@ def test_ft_psk_key_lifetime_in_memory(dev, apdev, params):
     #    raise Exception("TK found from memory")
 
     logger.info("Checking keys in memory after disassociation")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, pmk, "PMK")
     get_key_locations(buf, pmkr0, "PMK-R0")
     get_key_locations(buf, pmkr1, "PMK-R1")
@@ -2279,7 +2280,7 @@ def test_ft_psk_key_lifetime_in_memory(dev, apdev, params):
     dev[0].request("REMOVE_NETWORK all")
 
     logger.info("Checking keys in memory after network profile removal")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, pmk, "PMK")
     get_key_locations(buf, pmkr0, "PMK-R0")
     get_key_locations(buf, pmkr1, "PMK-R1")
@@ -3231,7 +3232,7 @@ def test_ap_ft_ric(dev, apdev):
         dev[0].dump_monitor()
 
 def ie_hex(ies, id):
-    return binascii.hexlify(struct.pack('BB', id, len(ies[id])) + ies[id]).decode()
+    return binascii.hexlify(ies.raw(id)).decode()
 
 def test_ap_ft_reassoc_proto(dev, apdev):
     """WPA2-PSK-FT AP Reassociation Request frame parsing"""
@@ -11,6 +11,7 @@ logger = logging.getLogger()
 import struct
 
 import hostapd
+import frames
 from wpasupplicant import WpaSupplicant
 from utils import *
 import hwsim_utils
@@ -1659,9 +1660,10 @@ def run_ap_ht_wmm(dev, apdev, country):
         dev[0].connect("test", key_mgmt="NONE", scan_freq=freq)
         bss = dev[0].get_bss(bssid)
         ie = parse_ie(bss['ie'])
-        if 221 not in ie:
+        wmm = ie.vendor(frames.OUI_MSFT, 2)
+        if not wmm:
             raise Exception("Could not find WMM IE")
-        wmm = ie[221]
+        wmm = wmm[0]
         if len(wmm) != 24:
             raise Exception("Unexpected WMM IE length")
         id, subtype, version, info, reserved = struct.unpack('>LBBBB', wmm[0:8])
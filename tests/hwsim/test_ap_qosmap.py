@@ -11,6 +11,7 @@ logger = logging.getLogger()
 
 import hwsim_utils
 import hostapd
+import traffic
 from utils import HwsimSkip, alloc_fail, fail_test
 from wlantest import Wlantest
 
@@ -123,6 +124,33 @@ def test_ap_qosmap_default(dev, apdev):
     dev[0].request("DATA_TEST_CONFIG 0")
     hapd.request("DATA_TEST_CONFIG 0")
 
+def test_ap_qosmap_default_traffic(dev, apdev):
+    """QoS mapping with default values and bulk traffic for each AC"""
+    ssid = "test-qosmap-default"
+    hapd = hostapd.add_ap(apdev[0], {"ssid": ssid})
+    dev[0].connect(ssid, key_mgmt="NONE", scan_freq="2412")
+    hapd.wait_sta()
+    bssid = apdev[0]['bssid']
+    addr = dev[0].own_addr()
+    Wlantest.setup(hapd)
+    wt = Wlantest()
+    wt.clear_sta_counters(bssid, addr)
+
+    tos = [0x00, 0x20, 0x80, 0xe0]
+    res = hwsim_utils.measure_traffic(dev[0], hapd, tos=tos, count=200,
+                                      rate=1000)
+    for t in tos:
+        if res[t].received < res[t].sent // 2:
+            raise Exception("Too many frames lost for TOS 0x%x: %s" %
+                            (t, str(res[t])))
+
+    time.sleep(0.1)
+    tids = {'BK': [1, 2], 'BE': [0, 3], 'VI': [4, 5], 'VO': [6, 7]}
+    for t in tos:
+        ac = traffic.tos_to_ac(t)
+        if not any(wt.get_tx_tid(bssid, addr, tid) for tid in tids[ac]):
+            raise Exception("No STA->AP data frames with %s TID" % ac)
+
 @remote_compatible
 def test_ap_qosmap_default_acm(dev, apdev):
     """QoS mapping with default values and ACM=1 for VO/VI"""
@@ -75,11 +75,9 @@ def wlantest_setup(hapd):
 
 def wlantest_tdls_packet_counters(bssid, addr0, addr1):
     wt = Wlantest()
-    dl = wt.get_tdls_counter("valid_direct_link", bssid, addr0, addr1)
-    inv_dl = wt.get_tdls_counter("invalid_direct_link", bssid, addr0, addr1)
-    ap = wt.get_tdls_counter("valid_ap_path", bssid, addr0, addr1)
-    inv_ap = wt.get_tdls_counter("invalid_ap_path", bssid, addr0, addr1)
-    return [dl, inv_dl, ap, inv_ap]
+    c = wt.get_tdls_counters(bssid, addr0, addr1)
+    return [c.valid_direct_link, c.invalid_direct_link, c.valid_ap_path,
+            c.invalid_ap_path]
 
 def tdls_check_dl(sta0, sta1, bssid, addr0, addr1):
     wt = Wlantest()
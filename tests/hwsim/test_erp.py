@@ -370,7 +370,7 @@ def test_erp_key_lifetime_in_memory(dev, apdev, params):
     time.sleep(1)
     dev[0].ping()
     password = password.encode()
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid)
 
     dev[0].request("DISCONNECT")
     dev[0].wait_disconnected(timeout=15)
@@ -414,11 +414,13 @@ def test_erp_key_lifetime_in_memory(dev, apdev, params):
     kck = ptk[0:16]
     kek = ptk[16:32]
     tk = ptk[32:48]
+    keys = [password, pmk, msk, emsk, rRK, rIK, kck, kek, tk, gtk]
 
     fname = os.path.join(params['logdir'],
                          'erp_key_lifetime_in_memory.memctx-')
 
     logger.info("Checking keys in memory while associated")
+    buf = buf.scan(keys)
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
     get_key_locations(buf, msk, "MSK")
@@ -437,7 +439,7 @@ def test_erp_key_lifetime_in_memory(dev, apdev, params):
     #    raise Exception("TK found from memory")
 
     logger.info("Checking keys in memory after disassociation")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     # Note: Password is still present in network configuration
     # Note: PMK is in EAP fast re-auth data
@@ -487,9 +489,10 @@ def test_erp_key_lifetime_in_memory(dev, apdev, params):
     kck = ptk[0:16]
     kek = ptk[16:32]
     tk = ptk[32:48]
+    keys = [password, pmk, msk, emsk, rRK, rIK, kck, kek, tk, gtk]
 
     logger.info("Checking keys in memory after ERP and disassociation")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     # Note: Password is still present in network configuration
 
@@ -507,7 +510,7 @@ def test_erp_key_lifetime_in_memory(dev, apdev, params):
     dev[0].request("REMOVE_NETWORK all")
 
     logger.info("Checking keys in memory after network profile removal")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     # Note: rRK and rIK are still in memory
 
@@ -528,7 +531,7 @@ def test_erp_key_lifetime_in_memory(dev, apdev, params):
 
     dev[0].request("ERP_FLUSH")
     logger.info("Checking keys in memory after ERP_FLUSH")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, rRK, "rRK")
     get_key_locations(buf, rIK, "rIK")
     verify_not_present(buf, rRK, fname, "rRK")
@@ -12,24 +12,24 @@ import logging
 logger = logging.getLogger()
 
 import hostapd
+import frames
 from p2p_utils import *
 from test_gas import anqp_adv_proto
 from test_p2ps import set_random_listen_chan
 
 def ie_ssid(ssid):
-    return struct.pack("<BB", WLAN_EID_SSID, len(ssid)) + ssid.encode()
+    return frames.ie(WLAN_EID_SSID, ssid.encode())
+
+SUPP_RATES = bytes([2*6, 2*9, 2*12, 2*18, 2*24, 2*36, 2*48, 2*54])
 
 def ie_supp_rates():
-    return struct.pack("<BBBBBBBBBB", WLAN_EID_SUPP_RATES, 8,
-                       2*6, 2*9, 2*12, 2*18, 2*24, 2*36, 2*48, 2*54)
+    return frames.ie(WLAN_EID_SUPP_RATES, SUPP_RATES)
 
 def ie_p2p(attrs):
-    return struct.pack("<BBBBBB", WLAN_EID_VENDOR_SPECIFIC, 4 + len(attrs),
-                       0x50, 0x6f, 0x9a, 9) + attrs
+    return frames.vendor_ie(frames.OUI_WFA, 9, attrs)
 
 def ie_wsc(attrs):
-    return struct.pack("<BBBBBB", WLAN_EID_VENDOR_SPECIFIC, 4 + len(attrs),
-                       0x00, 0x50, 0xf2, 4) + attrs
+    return frames.vendor_ie(frames.OUI_MSFT, 4, attrs)
 
 def wsc_attr_config_methods(methods=0):
     return struct.pack(">HHH", WSC_ATTR_CONFIG_METHODS, 2, methods)
@@ -1994,20 +1994,8 @@ GAS_COMEBACK_REQUEST = 12
 GAS_COMEBACK_RESPONSE = 13
 
 def gas_hdr(dst, src, type, req=True, dialog_token=0):
-    msg = {}
-    msg['fc'] = MGMT_SUBTYPE_ACTION << 4
-    msg['da'] = dst
-    msg['sa'] = src
-    if req:
-        msg['bssid'] = dst
-    else:
-        msg['bssid'] = src
-    if dialog_token is None:
-        msg['payload'] = struct.pack("<BB", ACTION_CATEG_PUBLIC, type)
-    else:
-        msg['payload'] = struct.pack("<BBB", ACTION_CATEG_PUBLIC, type,
-                                     dialog_token)
-    return msg
+    return frames.action_msg(dst, src, dst if req else src,
+                             ACTION_CATEG_PUBLIC, type, dialog_token)
 
 @remote_compatible
 def test_p2p_msg_sd(dev, apdev):
@@ -15,6 +15,7 @@ import subprocess
 import time
 
 import hostapd
+import frames
 from wpasupplicant import WpaSupplicant
 from utils import *
 from remotehost import remote_compatible
@@ -816,10 +817,12 @@ class BeaconReport:
 
         return txt
 
+_beacon_req = struct.Struct("<BBHHB")
+
 def build_beacon_request(opclass=81, chan=0, rand_int=0, duration=0, mode=0,
                          bssid="FF:FF:FF:FF:FF:FF"):
-    req = struct.pack("<BBHHB", opclass, chan, rand_int, duration, mode)
-    return binascii.hexlify(req).decode() + bssid.replace(':', '')
+    req = _beacon_req.pack(opclass, chan, rand_int, duration, mode)
+    return binascii.hexlify(req + frames.mac2bytes(bssid)).decode()
 
 def run_req_beacon(hapd, addr, request):
     token = hapd.request("REQ_BEACON " + addr + " " + request)
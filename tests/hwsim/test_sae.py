@@ -17,6 +17,7 @@ import tempfile
 
 import hwsim_utils
 import hostapd
+import frames
 from wpasupplicant import WpaSupplicant
 from utils import *
 from test_ap_psk import find_wpas_process, read_process_memory, verify_not_present, get_key_locations
@@ -736,7 +737,7 @@ def test_sae_key_lifetime_in_memory(dev, apdev, params):
     time.sleep(1)
     dev[0].ping()
     password = password.encode()
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid)
 
     dev[0].request("DISCONNECT")
     dev[0].wait_disconnected()
@@ -776,11 +777,13 @@ def test_sae_key_lifetime_in_memory(dev, apdev, params):
     kck = ptk[0:16]
     kek = ptk[16:32]
     tk = ptk[32:48]
+    keys = [password, pmk, kck, kek, tk, gtk, sae_k, sae_keyseed, sae_kck]
 
     fname = os.path.join(params['logdir'],
                          'sae_key_lifetime_in_memory.memctx-')
 
     logger.info("Checking keys in memory while associated")
+    buf = buf.scan(keys)
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
     if password not in buf:
@@ -798,7 +801,7 @@ def test_sae_key_lifetime_in_memory(dev, apdev, params):
     verify_not_present(buf, sae_kck, fname, "SAE(KCK)")
 
     logger.info("Checking keys in memory after disassociation")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     # Note: Password is still present in network configuration
     # Note: PMK is in PMKSA cache
@@ -817,7 +820,7 @@ def test_sae_key_lifetime_in_memory(dev, apdev, params):
 
     dev[0].request("PMKSA_FLUSH")
     logger.info("Checking keys in memory after PMKSA cache flush")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
     verify_not_present(buf, pmk, fname, "PMK")
@@ -825,7 +828,7 @@ def test_sae_key_lifetime_in_memory(dev, apdev, params):
     dev[0].request("REMOVE_NETWORK all")
 
     logger.info("Checking keys in memory after network profile removal")
-    buf = read_process_memory(pid, password)
+    buf = read_process_memory(pid, keys)
 
     get_key_locations(buf, password, "Password")
     get_key_locations(buf, pmk, "PMK")
@@ -2284,6 +2287,8 @@ def test_sae_anti_clogging_during_attack(dev, apdev):
     finally:
         stop_monitor(apdev[1]["ifname"])
 
+_sae_auth_hdr = struct.Struct("<HHHH")
+
 def build_sae_commit(bssid, addr, group=21, token=None):
     if group == 19:
         scalar = binascii.unhexlify("7332d3ebff24804005ccd8c56141e3ed8d84f40638aa31cd2fac11d4d2e89e7b")
@@ -2292,13 +2297,12 @@ def build_sae_commit(bssid, addr, group=21, token=None):
         scalar = binascii.unhexlify("001eec673111b902f5c8a61c8cb4c1c4793031aeea8c8c319410903bc64bcbaea134ab01c4e016d51436f5b5426f7e2af635759a3033fb4031ea79f89a62a3e2f828")
         element = binascii.unhexlify("00580eb4b448ea600ea277d5e66e4ed37db82bb04ac90442e9c3727489f366ba4b82f0a472d02caf4cdd142e96baea5915d71374660ee23acbaca38cf3fe8c5fb94b01abbc5278121635d7c06911c5dad8f18d516e1fbe296c179b7c87a1dddfab393337d3d215ed333dd396da6d8f20f798c60d054f1093c24d9c2d98e15c030cc375f0")
         pass
-    frame = binascii.unhexlify("b0003a01")
-    frame += bssid + addr + bssid
-    frame += binascii.unhexlify("1000")
+    frame = frames.mgmt_hdr(0xb0, bssid, addr, bssid, duration=0x13a,
+                            seq_ctrl=0x10)
     auth_alg = 3
     transact = 1
     status = 0
-    frame += struct.pack("<HHHH", auth_alg, transact, status, group)
+    frame += _sae_auth_hdr.pack(auth_alg, transact, status, group)
     if token:
         frame += token
     frame += scalar + element
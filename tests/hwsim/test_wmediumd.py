@@ -5,6 +5,8 @@
 # See README for more details.
 
 import tempfile, os, subprocess, errno, hwsim_utils, time
+import hostapd
+import hwsim_medium
 from utils import HwsimSkip
 from wpasupplicant import WpaSupplicant
 from tshark import run_tshark
@@ -478,3 +480,39 @@ def test_wmediumd_scan_only_one(dev, apdev, params):
             stop_wmediumd(p, params)
     finally:
         os.unlink(fn)
+
+def test_wmediumd_python_medium_loss(dev, apdev, params):
+    """Python wireless medium with a lost link"""
+    hapd = hostapd.add_ap(apdev[0], {"ssid": "medium"})
+    ap = apdev[0]['bssid']
+    sta = dev[0].own_addr()
+    with hwsim_medium.Medium(seed=1) as medium:
+        medium.set_link(ap, sta, loss=1.0)
+        dev[0].connect("medium", key_mgmt="NONE", scan_freq="2412",
+                       wait_connect=False)
+        ev = dev[0].wait_event(["CTRL-EVENT-CONNECTED"], timeout=5)
+        dev[0].request("DISCONNECT")
+        if ev is not None:
+            raise Exception("Connected over a link with full loss")
+        stats = medium.link_stats()
+        for tx, rx in [(ap, sta), (sta, ap)]:
+            link = stats.get((tx, rx))
+            if link is None or link['lost'] == 0:
+                raise Exception("No lost frames from %s to %s" % (tx, rx))
+            if link['delivered'] != 0:
+                raise Exception("Frames delivered from %s to %s" % (tx, rx))
+
+        medium.set_link(ap, sta, loss=0.0)
+        medium.reset_stats()
+        dev[0].dump_monitor()
+        dev[0].request("RECONNECT")
+        dev[0].wait_connected()
+        hwsim_utils.test_connectivity(dev[0], hapd)
+        stats = medium.link_stats()
+        if stats[(ap, sta)]['delivered'] == 0 or \
+           stats[(sta, ap)]['delivered'] == 0:
+            raise Exception("No frames delivered after the link recovered")
+        if medium.radio_stats()[sta]['acked'] == 0:
+            raise Exception("No acknowledged frames from the station")
+        dev[0].request("DISCONNECT")
+        dev[0].wait_disconnected()
@@ -13,6 +13,7 @@ logger = logging.getLogger()
 import subprocess
 
 import hostapd
+import frames
 from wpasupplicant import WpaSupplicant
 from utils import *
 from wlantest import Wlantest
@@ -552,18 +553,14 @@ WNM_STATUS_DENIED_OTHER_WNM_SERVICE = 5
 WNM_SLEEP_SUBELEM_GTK = 0
 WNM_SLEEP_SUBELEM_IGTK = 1
 
+_bss_tm_req = struct.Struct("<BHB")
+
 def bss_tm_req(dst, src, dialog_token=1, req_mode=0, disassoc_timer=0,
                validity_interval=1):
-    msg = {}
-    msg['fc'] = MGMT_SUBTYPE_ACTION << 4
-    msg['da'] = dst
-    msg['sa'] = src
-    msg['bssid'] = src
-    msg['payload'] = struct.pack("<BBBBHB",
-                                 ACTION_CATEG_WNM, WNM_ACT_BSS_TM_REQ,
-                                 dialog_token, req_mode, disassoc_timer,
-                                 validity_interval)
-    return msg
+    return frames.action_msg(dst, src, src, ACTION_CATEG_WNM,
+                             WNM_ACT_BSS_TM_REQ, dialog_token,
+                             _bss_tm_req.pack(req_mode, disassoc_timer,
+                                              validity_interval))
 
 def rx_bss_tm_resp(hapd, expect_dialog=None, expect_status=None):
     for i in range(0, 100):
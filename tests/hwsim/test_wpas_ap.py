@@ -1081,32 +1081,32 @@ def run_wpas_ap_lifetime_in_memory(dev, apdev, params, raw):
     dev[0].set_network(id, "scan_freq", "2412")
 
     logger.info("Checking keys in memory after network profile configuration")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, [pmk])
     get_key_locations(buf, pmk, "PMK")
 
     dev[0].select_network(id)
     wait_ap_ready(dev[0])
 
     logger.info("Checking keys in memory after AP start")
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid, [pmk])
     get_key_locations(buf, pmk, "PMK")
 
     dev[1].connect(ssid, psk=passphrase, scan_freq="2412")
     dev[0].wait_sta()
 
-    buf = read_process_memory(pid, pmk)
+    buf = read_process_memory(pid)
 
     dev[1].request("DISCONNECT")
     dev[1].wait_disconnected()
     dev[0].wait_sta_disconnect()
     time.sleep(1)
 
-    buf2 = read_process_memory(pid, pmk)
+    buf2 = read_process_memory(pid)
 
     dev[0].request("REMOVE_NETWORK all")
     dev[0].wait_disconnected()
 
-    buf3 = read_process_memory(pid, pmk)
+    buf3 = read_process_memory(pid)
 
     dev[1].relog()
     ptk = None
@@ -1127,6 +1127,10 @@ def run_wpas_ap_lifetime_in_memory(dev, apdev, params, raw):
     kck = ptk[0:16]
     kek = ptk[16:32]
     tk = ptk[32:48]
+    keys = [pmk, kck, kek, tk, gtk]
+    buf = buf.scan(keys)
+    buf2 = buf2.scan(keys)
+    buf3 = buf3.scan(keys)
 
     logger.info("Checking keys in memory while associated")
     get_key_locations(buf, pmk, "PMK")
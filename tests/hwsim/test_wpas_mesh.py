@@ -10,7 +10,6 @@ import os
 import struct
 import subprocess
 import time
-import json
 import binascii
 
 import hwsim_utils
@@ -947,8 +946,7 @@ def test_wpas_mesh_max_peering(dev, apdev, params):
         addrs = [addr0, addr1, addr2]
         for idx in range(3):
             addr = addrs[idx]
-            out = run_tshark_json(capfile, filt + " && wlan.sa == " + addr)
-            pkts = json.loads(out)
+            pkts = run_tshark_json(capfile, filt + " && wlan.sa == " + addr)
             for pkt in pkts:
                 wlan = pkt["_source"]["layers"]["wlan"]
                 if "wlan.tagged.all" not in wlan:
@@ -1068,9 +1066,7 @@ def _test_wpas_mesh_open_ht40(dev, apdev):
     check_mesh_peer_connected(dev[1])
     check_mesh_peer_connected(dev[2])
 
-    hwsim_utils.test_connectivity(dev[0], dev[1])
-    hwsim_utils.test_connectivity(dev[0], dev[2])
-    hwsim_utils.test_connectivity(dev[1], dev[2])
+    hwsim_utils.connectivity_matrix(dev)
 
     dev[0].mesh_group_remove()
     dev[1].mesh_group_remove()
@@ -1451,9 +1447,7 @@ def test_wpas_mesh_gate_forwarding(dev, apdev, p):
     for i in range(3):
         check_mesh_peer_connected(dev[i])
 
-    hwsim_utils.test_connectivity(dev[0], dev[1])
-    hwsim_utils.test_connectivity(dev[1], dev[2])
-    hwsim_utils.test_connectivity(dev[0], dev[2])
+    hwsim_utils.connectivity_matrix(dev)
 
     # dev0 and dev1 are mesh gates
     subprocess.call(['iw', 'dev', dev[0].ifname, 'set', 'mesh_param',
@@ -2467,9 +2461,7 @@ def test_mesh_forwarding(dev):
         for i in range(3):
             check_mesh_peer_connected(dev[i])
 
-        hwsim_utils.test_connectivity(dev[0], dev[1])
-        hwsim_utils.test_connectivity(dev[1], dev[2])
-        hwsim_utils.test_connectivity(dev[0], dev[2])
+        hwsim_utils.connectivity_matrix(dev)
     finally:
         # reset groups
         set_group_map(dev[0], 1)
@@ -2491,9 +2483,7 @@ def test_mesh_forwarding_secure(dev):
         for i in range(3):
             check_mesh_peer_connected(dev[i])
 
-        hwsim_utils.test_connectivity(dev[0], dev[1])
-        hwsim_utils.test_connectivity(dev[1], dev[2])
-        hwsim_utils.test_connectivity(dev[0], dev[2])
+        hwsim_utils.connectivity_matrix(dev)
     finally:
         # reset groups
         set_group_map(dev[0], 1)
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+#
+# Merged event timeline of hwsim test case artifacts
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Merge the per-test debug logs, kernel log, and wlantest capture into a
+single timestamp ordered event stream
+
+All sources are read as streams and combined with a k-way merge. The debug
+logs (wpa_supplicant/hostapd -t) and the capture use the system real time
+clock. Kernel log timestamps are from the monotonic clock since boot and
+are converted to real time based on the TEST-START/TEST-STOP markers that
+run-tests.py writes into /dev/kmsg with the real time clock value.
+"""
+
+import collections
+import heapq
+import json
+import os
+import re
+import struct
+
+import pcap_dissect
+
+import logging
+logger = logging.getLogger()
+
+# frame is a dict with the 802.11 frame summary for capture events and None
+# for log lines
+Event = collections.namedtuple('Event', ['ts', 'source', 'text', 'frame'])
+
+_log_ts_re = re.compile(r'^([0-9]+\.[0-9]+): (.*)$')
+_dmesg_re = re.compile(r'^\[\s*([0-9]+\.[0-9]+)\] (.*)$')
+_kmsg_re = re.compile(r'^[0-9]+,[0-9]+,([0-9]+),[^;]*;(.*)$')
+_marker_re = re.compile(r'TEST-(?:START|STOP) \S+ @([0-9]+\.[0-9]+)')
+_addr_re = re.compile(r'([0-9a-f]{2}(?::[0-9a-f]{2}){5})')
+
+MGMT_SUBTYPES = {
+    0: 'Association Request',
+    1: 'Association Response',
+    2: 'Reassociation Request',
+    3: 'Reassociation Response',
+    4: 'Probe Request',
+    5: 'Probe Response',
+    8: 'Beacon',
+    10: 'Disassociation',
+    11: 'Authentication',
+    12: 'Deauthentication',
+    13: 'Action',
+    14: 'Action No Ack',
+}
+
+# Frames that are left out of the timeline unless all frames are requested
+NOISE_SUBTYPES = (4, 5, 8)
+
+def log_events(path, source):
+    """Iterate over Events from a debug log with -t timestamps
+
+    Lines without a timestamp (e.g., multi-line output) get the timestamp of
+    the previous line."""
+    ts = None
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            m = _log_ts_re.match(line)
+            if m:
+                ts = float(m.group(1))
+                line = m.group(2)
+            if ts is None:
+                continue
+            yield Event(ts, source, line, None)
+
+def kernel_events(path, source='kernel'):
+    """Iterate over Events from dmesg output or /dev/kmsg records
+
+    Lines before the first TEST-START/TEST-STOP marker are buffered until
+    the clock offset is known. Nothing is returned if the log does not
+    include a marker."""
+    offset = None
+    pending = []
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            m = _dmesg_re.match(line)
+            if m:
+                mono = float(m.group(1))
+            else:
+                m = _kmsg_re.match(line)
+                if not m:
+                    continue
+                mono = int(m.group(1)) / 1000000.0
+            text = m.group(2)
+            if offset is None:
+                marker = _marker_re.search(text)
+                if not marker:
+                    pending.append((mono, text))
+                    continue
+                offset = float(marker.group(1)) - mono
+                for p_mono, p_text in pending:
+                    yield Event(p_mono + offset, source, p_text, None)
+                pending = []
+            yield Event(mono + offset, source, text, None)
+    if offset is None and pending:
+        logger.info("No TEST-START/STOP marker in %s - kernel log not included" % path)
+
+def eapol_key_msg(key_info):
+    """Return the 4-way handshake message number (1-4) or 0 for group key
+    handshake messages based on the Key Information field"""
+    if not key_info & 0x0008:
+        return 0
+    ack = key_info & 0x0080
+    mic = key_info & 0x0100
+    secure = key_info & 0x0200
+    if ack:
+        return 3 if mic else 1
+    return 4 if secure else 2
+
+def _first(fields, name):
+    val = fields.get(name)
+    return val[0] if val else None
+
+def _frame_summary(fields, all_frames):
+    ftype = _first(fields, 'wlan.fc.type')
+    if ftype is None:
+        return None
+    ftype = int(ftype)
+    subtype = int(_first(fields, 'wlan.fc.subtype'))
+    frame = {'sa': _first(fields, 'wlan.sa'),
+             'da': _first(fields, 'wlan.da'),
+             'bssid': _first(fields, 'wlan.bssid')}
+    if ftype == 0:
+        if subtype in NOISE_SUBTYPES and not all_frames:
+            return None
+        frame['type'] = MGMT_SUBTYPES.get(subtype, 'Management %d' % subtype)
+        text = frame['type']
+        if subtype == 11:
+            frame['alg'] = int(_first(fields, 'wlan.fixed.auth.alg'))
+            frame['seq'] = int(_first(fields, 'wlan.fixed.auth_seq'), 16)
+            text += ' alg=%d seq=%d' % (frame['alg'], frame['seq'])
+        status = _first(fields, 'wlan.fixed.status_code')
+        if status is not None:
+            frame['status'] = int(status)
+            text += ' status=%d' % frame['status']
+        reason = _first(fields, 'wlan.fixed.reason_code')
+        if reason is not None:
+            frame['reason'] = int(reason)
+            text += ' reason=%d' % frame['reason']
+    elif ftype == 2 and _first(fields, 'eapol.type') == '3':
+        key_info = _first(fields, 'wlan_rsna_eapol.keydes.key_info')
+        frame['type'] = 'EAPOL-Key'
+        text = frame['type']
+        if key_info is not None:
+            frame['msg'] = eapol_key_msg(int(key_info, 16))
+            if frame['msg']:
+                text += ' %d/4' % frame['msg']
+            else:
+                text += ' group'
+    elif ftype == 2 and _first(fields, 'eapol.type') is not None:
+        frame['type'] = 'EAPOL'
+        text = 'EAPOL type=%s' % _first(fields, 'eapol.type')
+        code = _first(fields, 'eap.code')
+        if code is not None:
+            text += ' EAP code=%s' % code
+    elif all_frames:
+        frame['type'] = 'Data' if ftype == 2 else 'Control'
+        text = '%s subtype=%d' % (frame['type'], subtype)
+    else:
+        return None
+    text += ' %s -> %s' % (frame['sa'], frame['da'])
+    return text, frame
+
+def capture_events(path, source='capture', all_frames=False):
+    """Iterate over Events for the frames in a capture file
+
+    Only Management frames other than Beacon/Probe Request/Response frames
+    and EAPOL frames are included unless all_frames is set."""
+    number = 0
+    with pcap_dissect.PcapReader(path) as reader:
+        for ts, linktype, data, origlen in reader.packets():
+            number += 1
+            try:
+                fields = pcap_dissect.dissect(linktype, data, origlen, number)
+            except (pcap_dissect.Unsupported, struct.error, IndexError):
+                continue
+            finally:
+                data.release()
+            if ts is None:
+                continue
+            res = _frame_summary(fields, all_frames)
+            if res:
+                yield Event(ts, source, res[0], res[1])
+
+# Per-test artifacts that are not debug logs
+_skip_suffixes = ('.idx', '.tmp', '.perf.data', '.perf.folded', '.svg',
+                  '.dec.pcapng', '.pcap')
+
+def artifacts(logdir, testname):
+    """Return [(source, path, kind)] for the artifacts of a test case
+
+    kind is 'log', 'kernel', or 'capture'."""
+    prefix = testname + '.'
+    res = []
+    for fname in sorted(os.listdir(logdir)):
+        if not fname.startswith(prefix):
+            continue
+        source = fname[len(prefix):]
+        path = os.path.join(logdir, fname)
+        if source.startswith('dmesg'):
+            res.append((source, path, 'kernel'))
+        elif source.endswith('.pcapng'):
+            if not source.endswith('.dec.pcapng'):
+                res.append((source[:-len('.pcapng')], path, 'capture'))
+        elif not source.endswith(_skip_suffixes) and \
+             not source.startswith(('perf', 'kmemleak')):
+            res.append((source, path, 'log'))
+    return res
+
+def merge(streams):
+    """k-way merge of timestamp ordered Event iterators"""
+    return heapq.merge(*streams, key=lambda e: e.ts)
+
+def timeline(logdir, testname, all_frames=False, sources=None):
+    """Iterate over the merged Events of all the artifacts of a test case"""
+    streams = []
+    for source, path, kind in artifacts(logdir, testname):
+        if sources is not None and source not in sources:
+            continue
+        if kind == 'kernel':
+            streams.append(kernel_events(path, source))
+        elif kind == 'capture':
+            streams.append(capture_events(path, source, all_frames))
+        else:
+            streams.append(log_events(path, source))
+    return merge(streams)
+
+def test_start(events):
+    """Return the timestamp of the first TEST-START marker"""
+    for ev in events:
+        if 'TEST-START' in ev.text:
+            return ev.ts
+    return None
+
+# (name, from milestone, to milestone)
+INTERVALS = [('auth_assoc', 'auth', 'assoc'),
+             ('assoc_4way', 'assoc', '4way_start'),
+             ('4way', '4way_start', '4way_done'),
+             ('4way_connected', '4way_done', 'connected'),
+             ('total', 'auth', 'connected')]
+
+def _finish(attempt):
+    for name, start, end in INTERVALS:
+        if start in attempt and end in attempt:
+            attempt[name] = attempt[end] - attempt[start]
+        else:
+            attempt[name] = None
+    return attempt
+
+def handshake_latency(events):
+    """Return per-STA connection attempts with milestone timestamps
+
+    Milestones are the first Authentication frame from the STA (auth), the
+    successful (Re)Association Response frame (assoc), EAPOL-Key messages
+    1/4 (4way_start) and 4/4 (4way_done) from the capture, and
+    CTRL-EVENT-CONNECTED from the wpa_supplicant log (connected). The
+    intervals listed in INTERVALS are added for each attempt; missing
+    milestones (e.g., no 4-way handshake with FT) result in None values.
+
+    wpa_supplicant logs do not show the own address in every test case, so
+    CTRL-EVENT-CONNECTED is mapped to the STA that last sent a
+    (Re)Association Request frame to the indicated BSSID.
+    """
+    attempts = []
+    current = {}
+    last_assoc_req = {}
+
+    def start(sta, bssid, ts, milestone):
+        prev = current.get(sta)
+        if prev:
+            attempts.append(_finish(prev))
+        current[sta] = {'sta': sta, 'bssid': bssid, milestone: ts}
+
+    for ev in events:
+        frame = ev.frame
+        if frame:
+            ftype = frame.get('type')
+            sta_tx = frame['sa'] != frame['bssid']
+            sta = frame['sa'] if sta_tx else frame['da']
+            att = current.get(sta)
+            if ftype == 'Authentication' and sta_tx:
+                if att is None or 'assoc' in att or 'connected' in att:
+                    start(sta, frame['bssid'], ev.ts, 'auth')
+            elif ftype in ('Association Request',
+                           'Reassociation Request') and sta_tx:
+                last_assoc_req[frame['bssid']] = sta
+                if att is None or 'assoc' in att:
+                    start(sta, frame['bssid'], ev.ts, 'assoc_req')
+                else:
+                    att.setdefault('assoc_req', ev.ts)
+            elif ftype in ('Association Response',
+                           'Reassociation Response') and not sta_tx:
+                if att is not None and frame.get('status') == 0:
+                    att.setdefault('assoc', ev.ts)
+            elif ftype == 'EAPOL-Key' and att is not None and \
+                 'assoc' in att:
+                if frame.get('msg') == 1 and not sta_tx:
+                    att.setdefault('4way_start', ev.ts)
+                elif frame.get('msg') == 4 and sta_tx:
+                    att.setdefault('4way_done', ev.ts)
+            continue
+
+        if 'CTRL-EVENT-CONNECTED' in ev.text:
+            m = _addr_re.search(ev.text)
+            sta = last_assoc_req.get(m.group(1)) if m else None
+            att = current.get(sta)
+            if att is not None and 'connected' not in att:
+                att['connected'] = ev.ts
+        elif 'AP-STA-CONNECTED' in ev.text:
+            m = _addr_re.search(ev.text)
+            att = current.get(m.group(1)) if m else None
+            if att is not None:
+                att.setdefault('ap_connected', ev.ts)
+
+    for att in current.values():
+        attempts.append(_finish(att))
+    attempts.sort(key=lambda a: a.get('auth', a.get('assoc_req')))
+    return attempts
+
+def latency_summary(attempts):
+    """Return {interval: (count, min, median, max)} over attempts"""
+    res = {}
+    for name, start, end in INTERVALS:
+        vals = sorted(a[name] for a in attempts if a.get(name) is not None)
+        if vals:
+            res[name] = (len(vals), vals[0], vals[len(vals) // 2], vals[-1])
+    return res
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='merged event timeline of hwsim test case logs')
+    parser.add_argument('--logdir', metavar='<directory>', default='.',
+                        help='log directory')
+    parser.add_argument('--source', action='append', dest='sources',
+                        metavar='<source>',
+                        help='include only this source (e.g., log0, hostapd, hwsim0, dmesg); can be used multiple times')
+    parser.add_argument('--all-frames', action='store_true',
+                        help='include all frames from the capture')
+    parser.add_argument('--relative', action='store_true',
+                        help='show times relative to TEST-START')
+    parser.add_argument('--latency', action='store_true',
+                        help='show connection handshake latency per STA instead of the timeline')
+    parser.add_argument('--json', action='store_true',
+                        help='write latency results as JSON (for comparing builds)')
+    parser.add_argument('tests', metavar='<test case>', nargs='+')
+    args = parser.parse_args()
+
+    if args.latency:
+        results = {}
+        for test in args.tests:
+            results[test] = handshake_latency(timeline(args.logdir, test,
+                                                       sources=args.sources))
+        if args.json:
+            print(json.dumps(results, indent=1, sort_keys=True))
+            return
+        all_attempts = []
+        for test, attempts in results.items():
+            for a in attempts:
+                all_attempts.append(a)
+                vals = ' '.join(['%s=%s' % (name, '-' if a[name] is None else
+                                            '%.3f' % (a[name] * 1000))
+                                 for name, s, e in INTERVALS])
+                print("%s %s -> %s %s" % (test, a['sta'], a['bssid'], vals))
+        print("interval count min median max (ms)")
+        for name, vals in latency_summary(all_attempts).items():
+            print("%s %d %.3f %.3f %.3f" % (name, vals[0], vals[1] * 1000,
+                                           vals[2] * 1000, vals[3] * 1000))
+        return
+
+    for test in args.tests:
+        base = 0
+        if args.relative:
+            base = test_start(timeline(args.logdir, test,
+                                       sources=args.sources)) or 0
+        for ev in timeline(args.logdir, test, args.all_frames, args.sources):
+            print("%.6f [%s] %s" % (ev.ts - base, ev.source, ev.text))
+
+if __name__ == "__main__":
+    main()
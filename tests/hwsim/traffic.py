@@ -0,0 +1,296 @@
+# Bulk data traffic generator and throughput/latency meter
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+"""
+Bulk traffic over AF_PACKET raw sockets on the local netdevs
+
+Frames are IPv4 packets with the TOS field set, so mac80211 maps them to
+the access category based on the DSCP value like for the DATA_TEST_TX
+frames from wpa_supplicant. Each payload includes a magic value, flow id,
+sequence number and the transmit time. The receiver uses kernel receive
+timestamps to measure one-way latency; both ends are on the same host and
+use the same clock.
+"""
+
+import binascii
+import select
+import socket
+import struct
+import threading
+import time
+
+from event_stats import LatencyHistogram
+
+import logging
+logger = logging.getLogger()
+
+ETH_P_IP = 0x0800
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+IPPROTO_EXPERIMENT = 253
+MAGIC = b'HWTG'
+
+_eth_hdr = struct.Struct("!6s6sH")
+_ip_hdr = struct.Struct("!BBHHHBBH4s4s")
+# magic, flow id, sequence number, TX time (ns)
+_payload_hdr = struct.Struct("!4sIIQ")
+_timespec = struct.Struct("@qq")
+
+HDR_LEN = _eth_hdr.size + _ip_hdr.size + _payload_hdr.size
+PAYLOAD_OFFSET = _eth_hdr.size + _ip_hdr.size
+
+def tos_to_ac(tos):
+    """Return access category name for IPv4 TOS using the 802.1D mapping"""
+    up = tos >> 5
+    if up in (1, 2):
+        return 'BK'
+    if up in (4, 5):
+        return 'VI'
+    if up in (6, 7):
+        return 'VO'
+    return 'BE'
+
+def _mac(addr):
+    return binascii.unhexlify(addr.replace(':', ''))
+
+def _ip_checksum(hdr):
+    s = sum(struct.unpack("!10H", hdr))
+    while s >> 16:
+        s = (s & 0xffff) + (s >> 16)
+    return ~s & 0xffff
+
+def build_frame(dst, src, tos, flow, size):
+    """Return a frame template (bytearray) for a flow
+
+    size is the IPv4 packet length. The sequence number and TX time are
+    filled in by set_seq() before each transmission."""
+    size = max(size, _ip_hdr.size + _payload_hdr.size)
+    frame = bytearray(_eth_hdr.size + size)
+    _eth_hdr.pack_into(frame, 0, _mac(dst), _mac(src), ETH_P_IP)
+    ip = _ip_hdr.pack(0x45, tos, size, 0, 0, 64, IPPROTO_EXPERIMENT, 0,
+                      socket.inet_aton('192.168.1.1'),
+                      socket.inet_aton('192.168.1.2'))
+    ip = ip[:10] + struct.pack("!H", _ip_checksum(ip)) + ip[12:]
+    frame[_eth_hdr.size:PAYLOAD_OFFSET] = ip
+    _payload_hdr.pack_into(frame, PAYLOAD_OFFSET, MAGIC, flow, 0, 0)
+    return frame
+
+def set_seq(frame, flow, seq):
+    _payload_hdr.pack_into(frame, PAYLOAD_OFFSET, MAGIC, flow, seq,
+                           time.time_ns())
+
+class FlowStats(object):
+    def __init__(self, tos, sent=0):
+        self.tos = tos
+        self.ac = tos_to_ac(tos)
+        self.sent = sent
+        self.tx_errors = 0
+        self.received = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.first_rx = None
+        self.last_rx = None
+        self.receiver_drops = 0
+        self.latency = LatencyHistogram()
+        self._seen = set()
+        self._last_seq = -1
+
+    def rx(self, seq, tx_ns, rx_ns):
+        if seq in self._seen:
+            self.duplicates += 1
+            return
+        self._seen.add(seq)
+        if seq < self._last_seq:
+            self.reordered += 1
+        self._last_seq = max(seq, self._last_seq)
+        self.received += 1
+        if self.first_rx is None:
+            self.first_rx = rx_ns
+        self.last_rx = rx_ns
+        self.latency.add(max(0, (rx_ns - tx_ns) // 1000))
+
+    @property
+    def lost(self):
+        return max(0, self.sent - self.tx_errors - self.received)
+
+    @property
+    def loss(self):
+        sent = self.sent - self.tx_errors
+        return float(self.lost) / sent if sent else 0.0
+
+    @property
+    def pps(self):
+        if self.received < 2 or self.last_rx == self.first_rx:
+            return 0.0
+        return (self.received - 1) * 1e9 / (self.last_rx - self.first_rx)
+
+    def summary(self):
+        """Return results as a dict; latencies are in microseconds"""
+        return {'tos': self.tos, 'ac': self.ac, 'sent': self.sent,
+                'tx_errors': self.tx_errors, 'received': self.received,
+                'lost': self.lost, 'loss': self.loss,
+                'duplicates': self.duplicates, 'reordered': self.reordered,
+                'pps': self.pps, 'receiver_drops': self.receiver_drops,
+                'latency_p50': self.latency.percentile(50),
+                'latency_p90': self.latency.percentile(90),
+                'latency_p99': self.latency.percentile(99),
+                'latency_max': self.latency.max if self.latency.count else None}
+
+    def __str__(self):
+        s = self.summary()
+        lat = ' '.join(['-' if s[k] is None else str(s[k]) for k in
+                        ['latency_p50', 'latency_p90', 'latency_p99',
+                         'latency_max']])
+        return "tos=0x%x ac=%s sent=%d received=%d lost=%d (%.1f%%) pps=%.0f latency(us) p50/p90/p99/max=%s" % (
+            self.tos, self.ac, self.sent, self.received, self.lost,
+            100 * self.loss, self.pps, lat.replace(' ', '/'))
+
+class TrafficReceiver(object):
+    """Receive generated frames on a netdev and collect per-flow stats"""
+    def __init__(self, ifname):
+        self.ifname = ifname
+        self.flows = {}
+        self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW,
+                                   socket.htons(ETH_P_IP))
+        self._sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4194304)
+        self._sock.bind((ifname, ETH_P_IP))
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def add_flow(self, flow, stats):
+        self.flows[flow] = stats
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        buf = bytearray(2048)
+        cmsg_size = socket.CMSG_SPACE(_timespec.size)
+        while not self._stop:
+            r, w, x = select.select([self._sock], [], [], 0.05)
+            if not r:
+                continue
+            while True:
+                try:
+                    nbytes, anc, flags, addr = self._sock.recvmsg_into(
+                        [buf], cmsg_size, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    break
+                if addr[2] == socket.PACKET_OUTGOING:
+                    continue
+                self._handle(buf, nbytes, anc)
+
+    def _handle(self, buf, nbytes, anc):
+        # Received frames start with the Ethernet header for SOCK_RAW
+        if nbytes < HDR_LEN:
+            return
+        magic, flow, seq, tx_ns = _payload_hdr.unpack_from(buf,
+                                                           PAYLOAD_OFFSET)
+        if magic != MAGIC:
+            return
+        stats = self.flows.get(flow)
+        if stats is None:
+            return
+        rx_ns = None
+        for level, ctype, data in anc:
+            if level == socket.SOL_SOCKET and ctype == SO_TIMESTAMPNS:
+                sec, nsec = _timespec.unpack_from(data)
+                rx_ns = sec * 1000000000 + nsec
+        if rx_ns is None:
+            rx_ns = time.time_ns()
+        stats.rx(seq, tx_ns, rx_ns)
+
+    def stop(self):
+        """Stop receiving and return the number of frames dropped because
+        the receiver did not keep up"""
+        self._stop = True
+        if self._thread.ident is not None:
+            self._thread.join()
+        try:
+            packets, drops = struct.unpack("II", self._sock.getsockopt(
+                SOL_PACKET, PACKET_STATISTICS, 8))
+        except OSError:
+            drops = 0
+        self._sock.close()
+        return drops
+
+def send_flows(sock, flows, count, burst=32, rate=None):
+    """Send count frames for each (frame, flow) and return the number of
+    send errors for each flow
+
+    The flows are interleaved burst by burst so that frames from all of them
+    are queued for transmission at the same time. With rate (frames per
+    second for each flow), the bursts are paced to that rate; otherwise the
+    frames are sent as fast as the socket accepts them."""
+    errors = [0] * len(flows)
+    start = time.monotonic()
+    seq = 0
+    while seq < count:
+        n = min(burst, count - seq)
+        for i, (frame, flow) in enumerate(flows):
+            for s in range(seq, seq + n):
+                set_seq(frame, flow, s)
+                try:
+                    sock.send(frame)
+                except OSError:
+                    # ENOBUFS: TX queue full
+                    errors[i] += 1
+        seq += n
+        if rate:
+            delay = start + float(seq) / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    return errors
+
+def measure(tx_ifname, rx_ifname, dst, src, tos=(0,), count=1000, size=100,
+            burst=32, rate=None, drain=0.5):
+    """Send bursts of frames for each TOS value and return {tos: FlowStats}
+
+    The flows are sent at the same time, interleaved burst by burst, from
+    tx_ifname (with source address src) to the destination address dst, so
+    the access categories contend for the medium. They are received on
+    rx_ifname. Frames that have not been received within drain seconds of
+    the end of transmission are counted as lost."""
+    receiver = TrafficReceiver(rx_ifname)
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW,
+                         socket.htons(ETH_P_IP))
+    results = {}
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4194304)
+        sock.bind((tx_ifname, ETH_P_IP))
+        flows = []
+        base = int(time.monotonic() * 1000) & 0xffff0000
+        for i, t in enumerate(tos):
+            stats = FlowStats(t, count)
+            flow = base | i
+            receiver.add_flow(flow, stats)
+            flows.append((flow, t, stats))
+            results[t] = stats
+        receiver.start()
+        frames = [(build_frame(dst, src, t, flow, size), flow)
+                  for flow, t, stats in flows]
+        errors = send_flows(sock, frames, count, burst, rate)
+        for (flow, t, stats), err in zip(flows, errors):
+            stats.tx_errors = err
+        end = time.monotonic() + drain
+        while time.monotonic() < end:
+            if all(s.received + s.tx_errors >= s.sent for s in results.values()):
+                break
+            time.sleep(0.01)
+    finally:
+        sock.close()
+        drops = receiver.stop()
+    if drops:
+        # Frames dropped on the receiving socket are counted as lost even
+        # though they were delivered over the medium; use rate to avoid this
+        logger.info("Traffic receiver on %s dropped %d frames" % (rx_ifname,
+                                                                  drops))
+    for t, stats in results.items():
+        stats.receiver_drops = drops
+        logger.info("Traffic %s -> %s: %s" % (tx_ifname, rx_ifname, stats))
+    return results
@@ -7,12 +7,19 @@
 # This software may be distributed under the terms of the BSD license.
 # See README for more details.
 
+import os
+import re
+import json
 import time
+import codecs
 import subprocess
+import collections
 import logging
 logger = logging.getLogger()
 
 from utils import *
+from wlantest import Wlantest
+import pcap_dissect
 
 class UnknownFieldsException(Exception):
     def __init__(self, fields):
@@ -21,14 +28,480 @@ class UnknownFieldsException(Exception):
 
 _tshark_filter_arg = '-Y'
 
+# Cleared if the running wlantest does not support the sync command
+_wlantest_sync = True
+
+def _unknown_fields(res, out1):
+    if res == 1:
+        errmsg = "Some fields aren't valid"
+        if errmsg in out1:
+            errors = out1.split('\n')
+            fields = []
+            collect = False
+            for f in errors:
+                if collect:
+                    f = f.strip()
+                    if f:
+                        fields.append(f)
+                    continue
+                if errmsg in f:
+                    collect = True
+                    continue
+            return fields
+    if res == 2:
+        if "tshark: Neither" in out1 and "are field or protocol names" in out1:
+            errors = out1.split('\n')
+            fields = []
+            for f in errors:
+                if f.startswith("tshark: Neither "):
+                    f = f.split(' ')[2].strip('"')
+                    if f:
+                        fields.append(f)
+                    continue
+            return fields
+    return None
+
+# Cached capture dissection
+#
+# Instead of running tshark with a display filter for each query, a capture
+# file is dissected once into a table of per-frame field values (one column
+# per field, with the raw -Tfields output for each frame). Display filters
+# are evaluated in Python against that table. The table is keyed by the file
+# name, size, and modification time, so a capture that is still being
+# written is dissected again once it has changed. Columns for fields that
+# were not yet included are added with a single extra tshark pass. Filters
+# using constructs that are not supported here are passed to tshark as-is.
+#
+# Comparisons are evaluated only for the fields listed in _field_types since
+# the -Tfields output does not tell how tshark would compare a value. Any
+# other field in a comparison makes the filter go to tshark. Presence checks
+# do not depend on the field type and are evaluated for all fields.
+#
+# If all the needed fields are supported by pcap_dissect, the columns are
+# extracted from the capture file in-process without running tshark. The
+# -Tfields formatting differs between tshark versions (e.g., True/False or
+# 1/0 for booleans), so each field is used natively only after its values
+# for a capture have been found identical to the output of the installed
+# tshark.
+
+use_cache = True
+use_native = True
+
+_CACHE_SIZE = 4
+_cache = collections.OrderedDict()
+_unknown = set()
+# pcap_dissect fields with the same formatting as the installed tshark
+_native_verified = set()
+_native_mismatch = set()
+
+# Fields dissected on the first query for a capture in addition to the ones
+# needed for that query to cover most of the following queries.
+_default_fields = ['frame.number', 'wlan.fc.type', 'wlan.fc.subtype',
+                   'wlan.fc.type_subtype', 'wlan.fc.protected', 'wlan.sa',
+                   'wlan.da', 'wlan.ta', 'wlan.ra', 'wlan.bssid',
+                   'wlan.fixed.category_code', 'wlan.fixed.publicact',
+                   'wlan.tag.number', 'wlan.ext_tag.number',
+                   'wlan.ext_tag.length', 'radiotap.channel.freq',
+                   'llc.type', 'eapol.type', 'eth.src', 'eth.dst']
+
+# Field types for comparisons: 'uint' (decimal or hex output), 'bool'
+# (True/False or 1/0 output depending on the tshark version), 'ether' (MAC
+# address) and 'bytes' (hex octets)
+_field_types = {
+    'frame.number': 'uint',
+    'wlan.fc.type': 'uint',
+    'wlan.fc.subtype': 'uint',
+    'wlan.fc.type_subtype': 'uint',
+    'wlan.fc.protected': 'bool',
+    'wlan.sa': 'ether',
+    'wlan.da': 'ether',
+    'wlan.ta': 'ether',
+    'wlan.ra': 'ether',
+    'wlan.bssid': 'ether',
+    'wlan.addr': 'ether',
+    'wlan.fixed.category_code': 'uint',
+    'wlan.fixed.publicact': 'uint',
+    'wlan.fixed.mesh_action': 'uint',
+    'wlan.tag.number': 'uint',
+    'wlan.ext_tag.number': 'uint',
+    'wlan.ext_tag.length': 'uint',
+    'wlan.ext_tag.data': 'bytes',
+    'radiotap.channel.freq': 'uint',
+    'llc.type': 'uint',
+    'eapol.type': 'uint',
+    'arp.opcode': 'uint',
+    'wps.message_type': 'uint',
+    'eth.src': 'ether',
+    'eth.dst': 'ether',
+}
+
+# Operators supported for each field type
+_type_ops = {
+    'uint': ['==', '!=', '>', '<', '>=', '<=', '&'],
+    'bool': ['==', '!='],
+    'ether': ['==', '!='],
+    'bytes': ['==', '!=', 'contains'],
+}
+
+_uint_re = re.compile(r'^(0x[0-9a-fA-F]+|[0-9]+)$')
+
+class _Unsupported(Exception):
+    pass
+
+class _CaptureTable(object):
+    def __init__(self):
+        self.frames = None
+        self.columns = {}
+
+def _dissect(filename, fields):
+    arg = ["tshark", "-r", filename, "-Tfields", "-E", "occurrence=a"]
+    for f in fields:
+        arg += ['-e', f]
+    try:
+        cmd = subprocess.Popen(arg, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    except Exception as e:
+        if "No such file or directory: 'tshark'" in str(e):
+            raise HwsimSkip("No tshark available")
+        raise _Unsupported("could not run tshark: " + str(e))
+    output = cmd.communicate()
+    res = cmd.wait()
+    out1 = output[1].decode(errors='ignore')
+    unknown = _unknown_fields(res, out1)
+    if unknown is not None:
+        raise UnknownFieldsException(unknown)
+    if res != 0:
+        raise _Unsupported("tshark reported an error: " + out1)
+    columns = [[] for f in fields]
+    for line in output[0].decode(errors='ignore').splitlines():
+        vals = line.split('\t')
+        if len(vals) != len(fields):
+            raise _Unsupported("unexpected tshark output: " + line)
+        for i, v in enumerate(vals):
+            columns[i].append(v)
+    return dict(zip(fields, columns))
+
+def _native_field(f):
+    return f in pcap_dissect.FIELDS and f not in _native_mismatch
+
+def _verify_native(filename, cols):
+    """Compare natively dissected columns with the tshark output
+
+    Fields whose values differ are not dissected natively anymore. A field
+    is considered verified only once it had values in a compared capture.
+    Returns False if any of the columns differs."""
+    fields = [f for f in cols if f not in _native_verified]
+    if not fields:
+        return True
+    try:
+        ref = _dissect(filename, fields)
+    except (UnknownFieldsException, _Unsupported) as e:
+        logger.debug("Native dissection not verified: " + str(e))
+        _native_mismatch.update(fields)
+        return False
+    if len(ref[fields[0]]) != len(cols[fields[0]]):
+        # Capture changed in between
+        return False
+    ok = True
+    for f in fields:
+        if ref[f] != cols[f]:
+            logger.info("Native dissection of %s differs from tshark" % f)
+            _native_mismatch.add(f)
+            ok = False
+        elif any(ref[f]):
+            _native_verified.add(f)
+    return ok
+
+def _native_dissect(filename, fields, extra):
+    if not all(_native_field(f) for f in fields):
+        return None
+    extra = [f for f in extra if _native_field(f)]
+    for f in [fields + extra, fields]:
+        try:
+            cols = pcap_dissect.read_fields(filename, f)
+        except pcap_dissect.Unsupported as e:
+            logger.debug("Native dissection not used: " + str(e))
+            continue
+        if _verify_native(filename, cols):
+            return cols
+        return None
+    return None
+
+def _get_table(filename, fields):
+    unknown = [f for f in fields if f in _unknown]
+    if unknown:
+        raise UnknownFieldsException(unknown)
+    try:
+        st = os.stat(filename)
+    except OSError as e:
+        raise _Unsupported(str(e))
+    key = (os.path.realpath(filename), st.st_size, st.st_mtime_ns)
+    table = _cache.get(key)
+    if table is None:
+        table = _CaptureTable()
+        _cache[key] = table
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+
+    missing = [f for f in dict.fromkeys(fields) if f not in table.columns]
+    if not missing:
+        return table
+    extra = []
+    if table.frames is None:
+        extra = [f for f in _default_fields
+                 if f not in missing and f not in table.columns]
+    cols = None
+    if use_native:
+        cols = _native_dissect(filename, missing, extra)
+    while cols is None:
+        try:
+            cols = _dissect(filename, missing + extra)
+        except UnknownFieldsException as e:
+            if not e.fields:
+                raise _Unsupported(str(e))
+            _unknown.update(e.fields)
+            unknown = [f for f in e.fields if f in missing]
+            if unknown:
+                raise UnknownFieldsException(unknown)
+            # Not all fields are known in every tshark version; do not
+            # try the unknown ones again.
+            for f in e.fields:
+                if f in _default_fields:
+                    _default_fields.remove(f)
+            extra = [f for f in extra if f not in e.fields]
+    frames = len(next(iter(cols.values())))
+    if table.frames is not None and table.frames != frames:
+        raise _Unsupported("capture changed during dissection")
+    table.frames = frames
+    table.columns.update(cols)
+    return table
+
+_filter_token = re.compile(r'''\s*(?:
+    (?P<str>"(?:[^"\\]|\\.)*") |
+    (?P<op>&&|\|\||==|!=|>=|<=|>|<|!|\(|\)|&) |
+    (?P<bytes>[0-9a-fA-F]{2}(?:[:-][0-9a-fA-F]{2})+(?![\w.:-])) |
+    (?P<value>[0-9][\w.:]*) |
+    (?P<word>[A-Za-z_][\w.-]*)
+    )''', re.X)
+
+_word_ops = {'and': '&&', 'or': '||', 'not': '!', 'eq': '==', 'ne': '!=',
+             'gt': '>', 'lt': '<', 'ge': '>=', 'le': '<=',
+             'contains': 'contains'}
+_cmp_ops = ['==', '!=', '>', '<', '>=', '<=', 'contains', '&']
+
+def _tokenize(filter):
+    tokens = []
+    pos = 0
+    filter = filter.strip()
+    while pos < len(filter):
+        m = _filter_token.match(filter, pos)
+        if not m or m.end() == pos:
+            raise _Unsupported("unsupported filter syntax at '%s'" % filter[pos:])
+        pos = m.end()
+        kind = m.lastgroup
+        val = m.group(kind)
+        if kind == 'word' and val in _word_ops:
+            kind, val = 'op', _word_ops[val]
+        tokens.append((kind, val))
+    return tokens
+
+class _FilterParser(object):
+    def __init__(self, filter):
+        self.tokens = _tokenize(filter)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def next(self):
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        expr = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise _Unsupported("trailing tokens in filter")
+        return expr
+
+    def parse_or(self):
+        expr = self.parse_and()
+        while self.peek() == ('op', '||'):
+            self.next()
+            expr = ('or', expr, self.parse_and())
+        return expr
+
+    def parse_and(self):
+        expr = self.parse_not()
+        while self.peek() == ('op', '&&'):
+            self.next()
+            expr = ('and', expr, self.parse_not())
+        return expr
+
+    def parse_not(self):
+        if self.peek() == ('op', '!'):
+            self.next()
+            return ('not', self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, val = self.next()
+        if (kind, val) == ('op', '('):
+            expr = self.parse_or()
+            if self.next() != ('op', ')'):
+                raise _Unsupported("unbalanced parentheses")
+            return expr
+        if kind != 'word' or '.' not in val:
+            # Protocol names and other constructs are left for tshark
+            raise _Unsupported("unsupported filter term '%s'" % val)
+        kind2, op = self.peek()
+        if kind2 != 'op' or op not in _cmp_ops:
+            return ('exists', val)
+        self.next()
+        kind3, lit = self.next()
+        ftype = _field_types.get(val)
+        if ftype is None:
+            raise _Unsupported("no type information for field '%s'" % val)
+        if op not in _type_ops[ftype]:
+            raise _Unsupported("unsupported operator %s for %s" % (op, val))
+        return ('cmp', val, op, _literal(ftype, kind3, lit))
+
+def _literal(ftype, kind, lit):
+    """Return (type, value) of a filter literal in the form used by _match()"""
+    if ftype == 'uint' and kind == 'value' and _uint_re.match(lit):
+        return (ftype, int(lit, 0))
+    if ftype == 'bool' and lit in ['0', '1', 'True', 'False']:
+        return (ftype, _to_bool(lit))
+    if ftype in ['ether', 'bytes'] and kind == 'bytes':
+        return (ftype, _normalize_bytes(lit))
+    raise _Unsupported("unsupported %s value '%s'" % (ftype, lit))
+
+def _filter_fields(expr, fields):
+    if expr[0] in ['and', 'or']:
+        _filter_fields(expr[1], fields)
+        _filter_fields(expr[2], fields)
+    elif expr[0] == 'not':
+        _filter_fields(expr[1], fields)
+    else:
+        fields.append(expr[1])
+    return fields
+
+def _to_bool(val):
+    if val in ['1', 'True']:
+        return 1
+    if val in ['0', 'False']:
+        return 0
+    raise _Unsupported("non-boolean value '%s'" % val)
+
+def _normalize_bytes(val):
+    return val.replace(':', '').replace('-', '').lower()
+
+def _match(occ, op, lit):
+    ftype, lval = lit
+    if ftype == 'uint':
+        if not _uint_re.match(occ):
+            raise _Unsupported("non-numeric value '%s'" % occ)
+        a = int(occ, 0)
+        if op == '==':
+            return a == lval
+        if op == '>':
+            return a > lval
+        if op == '<':
+            return a < lval
+        if op == '>=':
+            return a >= lval
+        if op == '<=':
+            return a <= lval
+        return (a & lval) != 0
+    if ftype == 'bool':
+        return _to_bool(occ) == lval
+    if op == 'contains':
+        return lval in _normalize_bytes(occ)
+    return _normalize_bytes(occ) == lval
+
+def _eval(expr, columns, i):
+    t = expr[0]
+    if t == 'and':
+        return _eval(expr[1], columns, i) and _eval(expr[2], columns, i)
+    if t == 'or':
+        return _eval(expr[1], columns, i) or _eval(expr[2], columns, i)
+    if t == 'not':
+        return not _eval(expr[1], columns, i)
+    raw = columns[expr[1]][i]
+    if t == 'exists':
+        return raw != ''
+    if raw == '':
+        return False
+    field, op, lit = expr[1:]
+    if op == '!=':
+        return not _match_any(raw, '==', lit)
+    return _match_any(raw, op, lit)
+
+def _match_any(raw, op, lit):
+    for occ in raw.split(','):
+        if _match(occ, op, lit):
+            return True
+    return False
+
+_parsed_filters = {}
+
+def _parse_filter(filter):
+    if filter not in _parsed_filters:
+        try:
+            _parsed_filters[filter] = _FilterParser(filter).parse()
+        except _Unsupported as e:
+            _parsed_filters[filter] = e
+    res = _parsed_filters[filter]
+    if isinstance(res, _Unsupported):
+        raise res
+    return res
+
+def _cached_query(filename, filter, display):
+    expr = _parse_filter(filter)
+    fields = _filter_fields(expr, []) + list(display)
+    table = _get_table(filename, fields)
+    columns = table.columns
+    out = []
+    for i in range(table.frames):
+        if _eval(expr, columns, i):
+            out.append('\t'.join([columns[d][i] for d in display]) + '\n')
+    return ''.join(out)
+
+def _sync_capture():
+    """Make sure the wlantest sniffer has written all frames captured so far
+
+    Returns False if this could not be confirmed."""
+    global _wlantest_sync
+
+    if not _wlantest_sync or not Wlantest.setup_done:
+        return False
+    try:
+        frames = Wlantest().sync()
+    except Exception as e:
+        logger.debug("wlantest sync not available: " + str(e))
+        _wlantest_sync = False
+        return False
+    logger.debug("wlantest sync: %d frames captured" % frames)
+    return True
+
 def _run_tshark(filename, filter, display=None, wait=True):
     global _tshark_filter_arg
 
-    if wait:
+    if wait and not _sync_capture():
         # wait a bit to make it more likely for wlantest sniffer to have
         # captured and written the results into a file that we can process here
         time.sleep(0.1)
 
+    if display and use_cache:
+        try:
+            return _cached_query(filename, filter, display)
+        except _Unsupported as e:
+            logger.debug("tshark cache not used for '%s': %s" % (filter, e))
+
     try:
         arg = ["tshark", "-r", filename,
                _tshark_filter_arg, filter]
@@ -52,22 +525,10 @@ def _run_tshark(filename, filter, display=None, wait=True):
     out = output[0].decode(errors='ignore')
     out1 = output[1].decode()
     res = cmd.wait()
+    fields = _unknown_fields(res, out1)
+    if fields is not None:
+        raise UnknownFieldsException(fields)
     if res == 1:
-        errmsg = "Some fields aren't valid"
-        if errmsg in out1:
-            errors = out1.split('\n')
-            fields = []
-            collect = False
-            for f in errors:
-                if collect:
-                    f = f.strip()
-                    if f:
-                        fields.append(f)
-                    continue
-                if errmsg in f:
-                    collect = True
-                    continue
-            raise UnknownFieldsException(fields)
         # remember this for efficiency
         _tshark_filter_arg = '-R'
         arg[3] = '-R'
@@ -75,17 +536,6 @@ def _run_tshark(filename, filter, display=None, wait=True):
                                stderr=open('/dev/null', 'w'))
         out = cmd.communicate()[0].decode()
         cmd.wait()
-    if res == 2:
-        if "tshark: Neither" in out1 and "are field or protocol names" in out1:
-            errors = out1.split('\n')
-            fields = []
-            for f in errors:
-                if f.startswith("tshark: Neither "):
-                    f = f.split(' ')[2].strip('"')
-                    if f:
-                        fields.append(f)
-                    continue
-            raise UnknownFieldsException(fields)
 
     if res != 0:
         raise AssertionError('tshark reported an error: ' + out1)
@@ -125,19 +575,57 @@ def run_tshark(filename, filters, display=None, wait=True):
     raise last_exception
 
 def run_tshark_json(filename, filter):
+    """Iterate over the packets matching filter as parsed tshark JSON
+
+    The tshark output is parsed incrementally so that only one packet needs
+    to be kept in memory at a time. If the caller stops iterating early
+    (e.g., after finding the packet it needs), tshark is terminated.
+    """
     arg = ["tshark", "-r", filename,
            _tshark_filter_arg, filter]
     arg.append('-Tjson')
     arg.append('-x')
     try:
         cmd = subprocess.Popen(arg, stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE)
+                               stderr=subprocess.DEVNULL)
     except Exception as e:
         logger.info("Could run run tshark: " + str(e))
         if "No such file or directory: 'tshark'" in str(e):
             raise HwsimSkip("No tshark available")
-        return None
-    output = cmd.communicate()
-    out = output[0].decode()
-    res = cmd.wait()
-    return out
+        return
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buf = ''
+    pos = 0
+    eof = False
+    try:
+        while True:
+            # Skip the array delimiters between packet objects
+            while pos < len(buf) and buf[pos] in ' \t\r\n[],':
+                pos += 1
+            if pos < len(buf):
+                try:
+                    pkt, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    pkt = None
+                if pkt is not None:
+                    pos = end
+                    yield pkt
+                    continue
+            elif eof:
+                break
+            data = cmd.stdout.read1(65536)
+            if not data:
+                eof = True
+                buf = buf[pos:] + utf8.decode(b'', final=True)
+            else:
+                buf = buf[pos:] + utf8.decode(data)
+            pos = 0
+    finally:
+        if cmd.poll() is None:
+            cmd.terminate()
+        cmd.stdout.close()
+        cmd.wait()
@@ -15,6 +15,9 @@ import logging
 import re
 logger = logging.getLogger()
 import hostapd
+import frames
+import nl80211_events
+import nl80211_ops
 
 def get_ifnames():
     ifnames = []
@@ -202,6 +205,11 @@ def get_phy(ap, ifname=None):
 
     if ifname == None:
         ifname = ap['ifname']
+    if hostname is None:
+        try:
+            return nl80211_ops.get_phy(ifname)
+        except OSError:
+            pass
     status, buf = host.execute(["iw", "dev", ifname, "info"])
     if status != 0:
         raise Exception("iw " + ifname + " info failed")
@@ -214,16 +222,11 @@ def get_phy(ap, ifname=None):
     return phy
 
 def parse_ie(buf):
-    ret = {}
-    data = binascii.unhexlify(buf)
-    while len(data) >= 2:
-        ie, elen = struct.unpack('BB', data[0:2])
-        data = data[2:]
-        if elen > len(data):
-            break
-        ret[ie] = data[0:elen]
-        data = data[elen:]
-    return ret
+    """Parse hexdump of elements into frames.IEs
+
+    ie[eid] is the first instance of the Element ID; use ie.all(eid) or
+    ie.vendor(oui, type) for elements that can be included multiple times."""
+    return frames.parse_ies(binascii.unhexlify(buf))
 
 def wait_regdom_changes(dev):
     for i in range(10):
@@ -265,8 +268,29 @@ def clear_regdom_dev(dev, count=1):
         dev[i].request("DISCONNECT")
     for i in range(count):
         dev[i].disconnect_and_stop_scan()
-    dev[0].cmd_execute(['iw', 'reg', 'set', '00'])
-    wait_regdom_changes(dev[0])
+    listener = None
+    wait = True
+    if dev[0].hostname is None:
+        if dev[0].get_driver_status_field("country") == "00":
+            # The kernel does not send an event if the regulatory domain
+            # does not change
+            wait = False
+        else:
+            try:
+                listener = nl80211_events.EventListener(['regulatory'])
+            except Exception as e:
+                logger.debug("Could not listen for nl80211 events: " + str(e))
+    try:
+        dev[0].cmd_execute(['iw', 'reg', 'set', '00'])
+        if listener:
+            if listener.wait_regdom("00", timeout=2) is None:
+                logger.info("No kernel regulatory domain change to 00")
+                wait_regdom_changes(dev[0])
+        elif wait:
+            wait_regdom_changes(dev[0])
+    finally:
+        if listener:
+            listener.close()
     country = dev[0].get_driver_status_field("country")
     logger.info("Country code at the end: " + country)
     if country != "00":
@@ -283,9 +307,12 @@ def radiotap_build():
     return radiotap_hdr + radiotap_payload
 
 def start_monitor(ifname, freq=2412):
-    subprocess.check_call(["iw", ifname, "set", "type", "monitor"])
-    subprocess.call(["ip", "link", "set", "dev", ifname, "up"])
-    subprocess.check_call(["iw", ifname, "set", "freq", str(freq)])
+    nl80211_ops.set_iftype(ifname, "monitor")
+    try:
+        nl80211_ops.set_link_up(ifname)
+    except OSError as e:
+        logger.info("Could not set %s up: %s" % (ifname, str(e)))
+    nl80211_ops.set_freq(ifname, freq)
 
     ETH_P_ALL = 3
     sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW,
@@ -295,8 +322,14 @@ def start_monitor(ifname, freq=2412):
     return sock
 
 def stop_monitor(ifname):
-    subprocess.call(["ip", "link", "set", "dev", ifname, "down"])
-    subprocess.call(["iw", ifname, "set", "type", "managed"])
+    try:
+        nl80211_ops.set_link_up(ifname, False)
+    except OSError as e:
+        logger.info("Could not set %s down: %s" % (ifname, str(e)))
+    try:
+        nl80211_ops.set_iftype(ifname, "managed")
+    except OSError as e:
+        logger.info("Could not set %s to managed mode: %s" % (ifname, str(e)))
 
 def clear_scan_cache(apdev):
     ifname = apdev['ifname']
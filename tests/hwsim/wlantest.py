@@ -11,6 +11,7 @@ import time
 import subprocess
 import logging
 import wpaspy
+from wlantest_ctrl import WlantestCtrl, StaCounters, BssCounters, TdlsCounters
 
 logger = logging.getLogger()
 
@@ -21,6 +22,7 @@ class Wlantest:
     exe_res = []
     monitor_mod = None
     setup_done = False
+    ctrl_conn = None
 
     @classmethod
     def stop_remote_wlantest(cls):
@@ -42,6 +44,7 @@ class Wlantest:
         cls.exe_res = []
         cls.monitor_mod = None
         cls.setup_done = False
+        cls.close_ctrl()
 
     @classmethod
     def start_remote_wlantest(cls):
@@ -104,6 +107,32 @@ class Wlantest:
         else:
             self.wlantest_cli = 'wlantest_cli'
 
+    @classmethod
+    def close_ctrl(cls):
+        if cls.ctrl_conn:
+            cls.ctrl_conn.close()
+            cls.ctrl_conn = None
+
+    def ctrl(self, name, *args):
+        """Run a WlantestCtrl request over the shared control connection
+
+        The connection is (re)opened as needed, e.g., if wlantest has been
+        restarted since the previous request. Any failure closes the
+        connection so that a partially read response cannot be taken as
+        the response to the next request."""
+        cls = Wlantest
+        for i in range(2):
+            if cls.ctrl_conn is None:
+                cls.ctrl_conn = WlantestCtrl()
+            try:
+                return getattr(cls.ctrl_conn, name)(*args)
+            except Exception as e:
+                cls.close_ctrl()
+                if i > 0 or not isinstance(e, (BrokenPipeError,
+                                               ConnectionError)):
+                    raise
+                logger.debug("wlantest control connection lost: " + str(e))
+
     def cli_cmd(self, params):
         if self.remote_host is not None:
             exe = self.setup_params["wlantest_cli"]
@@ -114,27 +143,83 @@ class Wlantest:
         else:
             return subprocess.check_output([self.wlantest_cli] + params).decode()
 
+    def cli_counters(self, params, record):
+        res = self.cli_cmd(params)
+        if "FAIL" in res:
+            raise Exception("wlantest_cli command failed")
+        vals = {}
+        for line in res.splitlines():
+            name, sep, val = line.partition('=')
+            if sep:
+                vals[name] = int(val)
+        return record(**vals)
+
+    def sync(self):
+        """Make wlantest process all queued frames and flush its capture files
+
+        Returns the number of frames wlantest has captured so far."""
+        if self.remote_host is None:
+            return self.ctrl("sync")
+        res = self.cli_cmd(["sync"])
+        try:
+            return int(res.strip())
+        except ValueError:
+            raise Exception("wlantest_cli sync failed")
+
     def flush(self):
+        if self.remote_host is None:
+            self.ctrl("flush")
+            return
         res = self.cli_cmd(["flush"])
         if "FAIL" in res:
             raise Exception("wlantest_cli flush failed")
 
     def relog(self):
+        if self.remote_host is None:
+            self.ctrl("relog")
+            return
         res = self.cli_cmd(["relog"])
         if "FAIL" in res:
             raise Exception("wlantest_cli relog failed")
 
     def add_passphrase(self, passphrase):
+        if self.remote_host is None:
+            self.ctrl("add_passphrase", passphrase)
+            return
         res = self.cli_cmd(["add_passphrase", passphrase])
         if "FAIL" in res:
             raise Exception("wlantest_cli add_passphrase failed")
 
     def add_wepkey(self, key):
+        if self.remote_host is None:
+            self.ctrl("add_wepkey", key)
+            return
         res = self.cli_cmd(["add_wepkey", key])
         if "FAIL" in res:
             raise Exception("wlantest_cli add_key failed")
 
+    def add_pmk(self, pmk):
+        if self.remote_host is None:
+            self.ctrl("add_pmk", bytes.fromhex(pmk))
+            return
+        res = self.cli_cmd(["add_pmk", pmk])
+        if "FAIL" in res:
+            raise Exception("wlantest_cli add_pmk failed")
+
+    def add_ptk(self, ptk):
+        if self.remote_host is None:
+            self.ctrl("add_ptk", bytes.fromhex(ptk))
+            return
+        res = self.cli_cmd(["add_ptk", ptk])
+        if "FAIL" in res:
+            raise Exception("wlantest_cli add_ptk failed")
+
     def info_bss(self, field, bssid):
+        if self.remote_host is None:
+            try:
+                return self.ctrl("info_bss", field, bssid)
+            except Exception as e:
+                raise Exception("Could not get BSS info from wlantest for " + bssid)
         res = self.cli_cmd(["info_bss", field, bssid])
         if "FAIL" in res:
             raise Exception("Could not get BSS info from wlantest for " + bssid)
@@ -142,6 +227,8 @@ class Wlantest:
 
     def get_bss_counter(self, field, bssid):
         try:
+            if self.remote_host is None:
+                return self.ctrl("get_bss_counter", field, bssid)
             res = self.cli_cmd(["get_bss_counter", field, bssid])
         except Exception as e:
             return 0
@@ -149,35 +236,79 @@ class Wlantest:
             return 0
         return int(res)
 
+    def get_bss_counters(self, bssid):
+        """Return all BSS counters as a wlantest_ctrl.BssCounters record"""
+        if self.remote_host is None:
+            return self.ctrl("get_bss_counters", bssid)
+        return self.cli_counters(["get_bss_counters", bssid], BssCounters)
+
     def clear_bss_counters(self, bssid):
+        if self.remote_host is None:
+            try:
+                self.ctrl("clear_bss_counters", bssid)
+            except Exception:
+                pass
+            return
         self.cli_cmd(["clear_bss_counters", bssid])
 
     def info_sta(self, field, bssid, addr):
+        if self.remote_host is None:
+            try:
+                return self.ctrl("info_sta", field, bssid, addr)
+            except Exception as e:
+                raise Exception("Could not get STA info from wlantest for " + addr)
         res = self.cli_cmd(["info_sta", field, bssid, addr])
         if "FAIL" in res:
             raise Exception("Could not get STA info from wlantest for " + addr)
         return res
 
     def get_sta_counter(self, field, bssid, addr):
+        if self.remote_host is None:
+            return self.ctrl("get_sta_counter", field, bssid, addr)
         res = self.cli_cmd(["get_sta_counter", field, bssid, addr])
         if "FAIL" in res:
             raise Exception("wlantest_cli command failed")
         return int(res)
 
+    def get_sta_counters(self, bssid, addr):
+        """Return all STA counters as a wlantest_ctrl.StaCounters record"""
+        if self.remote_host is None:
+            return self.ctrl("get_sta_counters", bssid, addr)
+        return self.cli_counters(["get_sta_counters", bssid, addr],
+                                 StaCounters)
+
     def clear_sta_counters(self, bssid, addr):
+        if self.remote_host is None:
+            self.ctrl("clear_sta_counters", bssid, addr)
+            return
         res = self.cli_cmd(["clear_sta_counters", bssid, addr])
         if "FAIL" in res:
             raise Exception("wlantest_cli command failed")
 
     def tdls_clear(self, bssid, addr1, addr2):
+        if self.remote_host is None:
+            try:
+                self.ctrl("clear_tdls_counters", bssid, addr1, addr2)
+            except Exception:
+                pass
+            return
         self.cli_cmd(["clear_tdls_counters", bssid, addr1, addr2])
 
     def get_tdls_counter(self, field, bssid, addr1, addr2):
+        if self.remote_host is None:
+            return self.ctrl("get_tdls_counter", field, bssid, addr1, addr2)
         res = self.cli_cmd(["get_tdls_counter", field, bssid, addr1, addr2])
         if "FAIL" in res:
             raise Exception("wlantest_cli command failed")
         return int(res)
 
+    def get_tdls_counters(self, bssid, addr1, addr2):
+        """Return all TDLS counters as a wlantest_ctrl.TdlsCounters record"""
+        if self.remote_host is None:
+            return self.ctrl("get_tdls_counters", bssid, addr1, addr2)
+        return self.cli_counters(["get_tdls_counters", bssid, addr1, addr2],
+                                 TdlsCounters)
+
     def require_ap_pmf_mandatory(self, bssid):
         res = self.info_bss("rsn_capab", bssid)
         if "MFPR" not in res:
@@ -225,23 +356,36 @@ class Wlantest:
             raise Exception("Unexpected STA key_mgmt")
 
     def get_tx_tid(self, bssid, addr, tid):
+        if self.remote_host is None:
+            return self.ctrl("get_tx_tid", bssid, addr, tid)
         res = self.cli_cmd(["get_tx_tid", bssid, addr, str(tid)])
         if "FAIL" in res:
             raise Exception("wlantest_cli command failed")
         return int(res)
 
     def get_rx_tid(self, bssid, addr, tid):
+        if self.remote_host is None:
+            return self.ctrl("get_rx_tid", bssid, addr, tid)
         res = self.cli_cmd(["get_rx_tid", bssid, addr, str(tid)])
         if "FAIL" in res:
             raise Exception("wlantest_cli command failed")
         return int(res)
 
     def get_tid_counters(self, bssid, addr):
+        if self.remote_host is None:
+            res = self.ctrl("get_tid_counters", bssid, addr)
+            return [dict(enumerate(res.tx)), dict(enumerate(res.rx))]
+        res = self.cli_cmd(["get_tid_counters", bssid, addr])
+        if "FAIL" in res:
+            raise Exception("wlantest_cli command failed")
         tx = {}
         rx = {}
-        for tid in range(0, 17):
-            tx[tid] = self.get_tx_tid(bssid, addr, tid)
-            rx[tid] = self.get_rx_tid(bssid, addr, tid)
+        for line in res.splitlines():
+            name, sep, val = line.partition('=')
+            if name.startswith('tx_tid_'):
+                tx[int(name[7:])] = int(val)
+            elif name.startswith('rx_tid_'):
+                rx[int(name[7:])] = int(val)
         return [tx, rx]
 
 class WlantestCapture:
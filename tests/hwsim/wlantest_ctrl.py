@@ -0,0 +1,368 @@
+# wlantest control interface client
+# Copyright (c) 2026, agent <agent@local>
+#
+# This software may be distributed under the terms of the BSD license.
+# See README for more details.
+
+import collections
+import socket
+import struct
+
+WLANTEST_SOCK_NAME = "w1.fi.wlantest"
+WLANTEST_CTRL_MAX_RESP_LEN = 1000
+
+# enum wlantest_ctrl_cmd (wlantest/wlantest_ctrl.h)
+(WLANTEST_CTRL_SUCCESS,
+ WLANTEST_CTRL_FAILURE,
+ WLANTEST_CTRL_INVALID_CMD,
+ WLANTEST_CTRL_UNKNOWN_CMD,
+ WLANTEST_CTRL_PING,
+ WLANTEST_CTRL_TERMINATE,
+ WLANTEST_CTRL_LIST_BSS,
+ WLANTEST_CTRL_LIST_STA,
+ WLANTEST_CTRL_FLUSH,
+ WLANTEST_CTRL_CLEAR_STA_COUNTERS,
+ WLANTEST_CTRL_CLEAR_BSS_COUNTERS,
+ WLANTEST_CTRL_GET_STA_COUNTER,
+ WLANTEST_CTRL_GET_BSS_COUNTER,
+ WLANTEST_CTRL_INJECT,
+ WLANTEST_CTRL_VERSION,
+ WLANTEST_CTRL_ADD_PASSPHRASE,
+ WLANTEST_CTRL_INFO_STA,
+ WLANTEST_CTRL_INFO_BSS,
+ WLANTEST_CTRL_SEND,
+ WLANTEST_CTRL_CLEAR_TDLS_COUNTERS,
+ WLANTEST_CTRL_GET_TDLS_COUNTER,
+ WLANTEST_CTRL_RELOG,
+ WLANTEST_CTRL_GET_TX_TID,
+ WLANTEST_CTRL_GET_RX_TID,
+ WLANTEST_CTRL_SYNC,
+ WLANTEST_CTRL_GET_STA_COUNTERS,
+ WLANTEST_CTRL_GET_BSS_COUNTERS,
+ WLANTEST_CTRL_GET_TDLS_COUNTERS,
+ WLANTEST_CTRL_GET_TID_COUNTERS,
+ WLANTEST_CTRL_ADD_PMK,
+ WLANTEST_CTRL_ADD_PTK,
+ WLANTEST_CTRL_CLEAR_KEYS) = range(32)
+
+# enum wlantest_ctrl_attr
+(WLANTEST_ATTR_BSSID,
+ WLANTEST_ATTR_STA_ADDR,
+ WLANTEST_ATTR_STA_COUNTER,
+ WLANTEST_ATTR_BSS_COUNTER,
+ WLANTEST_ATTR_COUNTER,
+ WLANTEST_ATTR_INJECT_FRAME,
+ WLANTEST_ATTR_INJECT_SENDER_AP,
+ WLANTEST_ATTR_INJECT_PROTECTION,
+ WLANTEST_ATTR_VERSION,
+ WLANTEST_ATTR_PASSPHRASE,
+ WLANTEST_ATTR_STA_INFO,
+ WLANTEST_ATTR_BSS_INFO,
+ WLANTEST_ATTR_INFO,
+ WLANTEST_ATTR_FRAME,
+ WLANTEST_ATTR_TDLS_COUNTER,
+ WLANTEST_ATTR_STA2_ADDR,
+ WLANTEST_ATTR_WEPKEY,
+ WLANTEST_ATTR_TID,
+ WLANTEST_ATTR_COUNTERS,
+ WLANTEST_ATTR_PMK,
+ WLANTEST_ATTR_PTK) = range(21)
+
+# Counter and info names as used by wlantest_cli, in enum order
+STA_COUNTERS = [
+    'auth_tx', 'auth_rx', 'assocreq_tx', 'reassocreq_tx', 'ptk_learned',
+    'valid_deauth_tx', 'valid_deauth_rx',
+    'invalid_deauth_tx', 'invalid_deauth_rx',
+    'valid_disassoc_tx', 'valid_disassoc_rx',
+    'invalid_disassoc_tx', 'invalid_disassoc_rx',
+    'valid_saqueryreq_tx', 'valid_saqueryreq_rx',
+    'invalid_saqueryreq_tx', 'invalid_saqueryreq_rx',
+    'valid_saqueryresp_tx', 'valid_saqueryresp_rx',
+    'invalid_saqueryresp_tx', 'invalid_saqueryresp_rx',
+    'ping_ok', 'assocresp_comeback', 'reassocresp_comeback',
+    'ping_ok_first_assoc',
+    'valid_deauth_rx_ack', 'valid_disassoc_rx_ack',
+    'invalid_deauth_rx_ack', 'invalid_disassoc_rx_ack',
+    'deauth_rx_asleep', 'deauth_rx_awake',
+    'disassoc_rx_asleep', 'disassoc_rx_awake',
+    'prot_data_tx',
+    'deauth_rx_rc6', 'deauth_rx_rc7', 'disassoc_rx_rc6', 'disassoc_rx_rc7']
+
+BSS_COUNTERS = [
+    'valid_bip_mmie', 'invalid_bip_mmie', 'missing_bip_mmie',
+    'bip_deauth', 'bip_disassoc', 'probe_response']
+
+TDLS_COUNTERS = [
+    'valid_direct_link', 'invalid_direct_link',
+    'valid_ap_path', 'invalid_ap_path',
+    'setup_req', 'setup_resp_ok', 'setup_resp_fail',
+    'setup_conf_ok', 'setup_conf_fail', 'teardown']
+
+STA_INFOS = ['proto', 'pairwise', 'key_mgmt', 'rsn_capab', 'state', 'gtk']
+
+BSS_INFOS = ['proto', 'pairwise', 'group', 'group_mgmt', 'key_mgmt',
+             'rsn_capab']
+
+NUM_TIDS = 16 + 1
+
+StaCounters = collections.namedtuple('StaCounters', STA_COUNTERS)
+BssCounters = collections.namedtuple('BssCounters', BSS_COUNTERS)
+TdlsCounters = collections.namedtuple('TdlsCounters', TDLS_COUNTERS)
+TidCounters = collections.namedtuple('TidCounters', ['tx', 'rx'])
+
+_be32 = struct.Struct('>I')
+_attr_hdr = struct.Struct('>II')
+
+def _addr(addr):
+    res = bytes.fromhex(addr.replace(':', ''))
+    if len(res) != 6:
+        raise Exception("Invalid address " + addr)
+    return res
+
+def _index(names, name, type):
+    try:
+        return names.index(name.lower())
+    except ValueError:
+        raise Exception("Unknown %s '%s'" % (type, name))
+
+def build_attrs(attrs):
+    """Encode a list of (attribute, value) pairs
+
+    The value can be bytes, a str, or an int (encoded as be32)."""
+    buf = bytearray()
+    for attr, val in attrs:
+        if isinstance(val, int):
+            val = _be32.pack(val)
+        elif isinstance(val, str):
+            val = val.encode()
+        buf += _attr_hdr.pack(attr, len(val))
+        buf += val
+    return buf
+
+def parse_attrs(buf):
+    """Decode control message attributes into {attribute: memoryview}"""
+    buf = memoryview(buf)
+    attrs = {}
+    pos = 0
+    while pos + 8 <= len(buf):
+        attr, alen = _attr_hdr.unpack_from(buf, pos)
+        pos += 8
+        if pos + alen > len(buf):
+            raise Exception("Invalid control message attribute")
+        attrs[attr] = buf[pos:pos + alen]
+        pos += alen
+    return attrs
+
+def _counters(val):
+    if len(val) % 4:
+        raise Exception("Invalid counters attribute length %d" % len(val))
+    return list(struct.unpack('>%dI' % (len(val) // 4), val))
+
+class WlantestCtrl(object):
+    """Client for the wlantest control interface
+
+    This uses the same SOCK_SEQPACKET socket protocol as wlantest_cli: a
+    be32 command followed by (be32 attribute, be32 length, value)
+    attributes; responses start with a be32 status. A single connection
+    can be used for any number of requests.
+    """
+    def __init__(self, name=WLANTEST_SOCK_NAME, timeout=5):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect('\0' + name)
+        except:
+            self.sock.close()
+            self.sock = None
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def request(self, cmd, attrs=()):
+        """Send a command and return the response attributes
+
+        An exception is raised if wlantest did not report success."""
+        if self.sock is None:
+            raise Exception("wlantest control connection closed")
+        self.sock.send(_be32.pack(cmd) + build_attrs(attrs))
+        resp = self.sock.recv(WLANTEST_CTRL_MAX_RESP_LEN)
+        if len(resp) == 0:
+            raise ConnectionResetError("wlantest closed the control connection")
+        if len(resp) < 4:
+            raise Exception("Invalid wlantest control response")
+        status = _be32.unpack_from(resp)[0]
+        if status == WLANTEST_CTRL_UNKNOWN_CMD:
+            raise Exception("Unknown wlantest control command %d" % cmd)
+        if status == WLANTEST_CTRL_INVALID_CMD:
+            raise Exception("Invalid wlantest control command %d" % cmd)
+        if status != WLANTEST_CTRL_SUCCESS:
+            raise Exception("wlantest control command %d failed" % cmd)
+        return parse_attrs(resp[4:])
+
+    def _get(self, cmd, attrs, attr):
+        res = self.request(cmd, attrs)
+        if attr not in res:
+            raise Exception("Missing attribute %d in wlantest response" % attr)
+        return res[attr]
+
+    def _get_counter(self, cmd, attrs):
+        val = self._get(cmd, attrs, WLANTEST_ATTR_COUNTER)
+        if len(val) != 4:
+            raise Exception("Invalid counter attribute length %d" % len(val))
+        return _be32.unpack(val)[0]
+
+    def ping(self):
+        self.request(WLANTEST_CTRL_PING)
+
+    def flush(self):
+        self.request(WLANTEST_CTRL_FLUSH)
+
+    def relog(self):
+        self.request(WLANTEST_CTRL_RELOG)
+
+    def sync(self):
+        return self._get_counter(WLANTEST_CTRL_SYNC, [])
+
+    def version(self):
+        return bytes(self._get(WLANTEST_CTRL_VERSION, [],
+                               WLANTEST_ATTR_VERSION)).decode()
+
+    def list_bss(self):
+        val = self._get(WLANTEST_CTRL_LIST_BSS, [], WLANTEST_ATTR_BSSID)
+        return [':'.join('%02x' % b for b in val[i:i + 6])
+                for i in range(0, len(val) - 5, 6)]
+
+    def list_sta(self, bssid):
+        val = self._get(WLANTEST_CTRL_LIST_STA,
+                        [(WLANTEST_ATTR_BSSID, _addr(bssid))],
+                        WLANTEST_ATTR_STA_ADDR)
+        return [':'.join('%02x' % b for b in val[i:i + 6])
+                for i in range(0, len(val) - 5, 6)]
+
+    def add_passphrase(self, passphrase, bssid=None):
+        attrs = [(WLANTEST_ATTR_PASSPHRASE, passphrase)]
+        if bssid:
+            attrs.append((WLANTEST_ATTR_BSSID, _addr(bssid)))
+        self.request(WLANTEST_CTRL_ADD_PASSPHRASE, attrs)
+
+    def add_wepkey(self, key):
+        self.request(WLANTEST_CTRL_ADD_PASSPHRASE,
+                     [(WLANTEST_ATTR_WEPKEY, key)])
+
+    def add_pmk(self, pmk):
+        self.request(WLANTEST_CTRL_ADD_PMK, [(WLANTEST_ATTR_PMK, pmk)])
+
+    def add_ptk(self, ptk):
+        self.request(WLANTEST_CTRL_ADD_PTK, [(WLANTEST_ATTR_PTK, ptk)])
+
+    def clear_keys(self):
+        self.request(WLANTEST_CTRL_CLEAR_KEYS)
+
+    def clear_sta_counters(self, bssid, addr):
+        self.request(WLANTEST_CTRL_CLEAR_STA_COUNTERS,
+                     [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                      (WLANTEST_ATTR_STA_ADDR, _addr(addr))])
+
+    def clear_bss_counters(self, bssid):
+        self.request(WLANTEST_CTRL_CLEAR_BSS_COUNTERS,
+                     [(WLANTEST_ATTR_BSSID, _addr(bssid))])
+
+    def clear_tdls_counters(self, bssid, addr1, addr2):
+        self.request(WLANTEST_CTRL_CLEAR_TDLS_COUNTERS,
+                     [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                      (WLANTEST_ATTR_STA_ADDR, _addr(addr1)),
+                      (WLANTEST_ATTR_STA2_ADDR, _addr(addr2))])
+
+    def get_sta_counter(self, field, bssid, addr):
+        idx = _index(STA_COUNTERS, field, "STA counter")
+        return self._get_counter(WLANTEST_CTRL_GET_STA_COUNTER,
+                                 [(WLANTEST_ATTR_STA_COUNTER, idx),
+                                  (WLANTEST_ATTR_BSSID, _addr(bssid)),
+                                  (WLANTEST_ATTR_STA_ADDR, _addr(addr))])
+
+    def get_bss_counter(self, field, bssid):
+        idx = _index(BSS_COUNTERS, field, "BSS counter")
+        return self._get_counter(WLANTEST_CTRL_GET_BSS_COUNTER,
+                                 [(WLANTEST_ATTR_BSS_COUNTER, idx),
+                                  (WLANTEST_ATTR_BSSID, _addr(bssid))])
+
+    def get_tdls_counter(self, field, bssid, addr1, addr2):
+        idx = _index(TDLS_COUNTERS, field, "TDLS counter")
+        return self._get_counter(WLANTEST_CTRL_GET_TDLS_COUNTER,
+                                 [(WLANTEST_ATTR_TDLS_COUNTER, idx),
+                                  (WLANTEST_ATTR_BSSID, _addr(bssid)),
+                                  (WLANTEST_ATTR_STA_ADDR, _addr(addr1)),
+                                  (WLANTEST_ATTR_STA2_ADDR, _addr(addr2))])
+
+    def get_tx_tid(self, bssid, addr, tid):
+        return self._get_counter(WLANTEST_CTRL_GET_TX_TID,
+                                 [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                                  (WLANTEST_ATTR_STA_ADDR, _addr(addr)),
+                                  (WLANTEST_ATTR_TID, tid)])
+
+    def get_rx_tid(self, bssid, addr, tid):
+        return self._get_counter(WLANTEST_CTRL_GET_RX_TID,
+                                 [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                                  (WLANTEST_ATTR_STA_ADDR, _addr(addr)),
+                                  (WLANTEST_ATTR_TID, tid)])
+
+    def info_sta(self, field, bssid, addr):
+        idx = _index(STA_INFOS, field, "STA info")
+        val = self._get(WLANTEST_CTRL_INFO_STA,
+                        [(WLANTEST_ATTR_STA_INFO, idx),
+                         (WLANTEST_ATTR_BSSID, _addr(bssid)),
+                         (WLANTEST_ATTR_STA_ADDR, _addr(addr))],
+                        WLANTEST_ATTR_INFO)
+        return bytes(val).decode()
+
+    def info_bss(self, field, bssid):
+        idx = _index(BSS_INFOS, field, "BSS info")
+        val = self._get(WLANTEST_CTRL_INFO_BSS,
+                        [(WLANTEST_ATTR_BSS_INFO, idx),
+                         (WLANTEST_ATTR_BSSID, _addr(bssid))],
+                        WLANTEST_ATTR_INFO)
+        return bytes(val).decode()
+
+    def get_sta_counters(self, bssid, addr):
+        """Return all STA counters as a StaCounters record"""
+        val = self._get(WLANTEST_CTRL_GET_STA_COUNTERS,
+                        [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                         (WLANTEST_ATTR_STA_ADDR, _addr(addr))],
+                        WLANTEST_ATTR_COUNTERS)
+        return StaCounters(*_counters(val)[:len(STA_COUNTERS)])
+
+    def get_bss_counters(self, bssid):
+        """Return all BSS counters as a BssCounters record"""
+        val = self._get(WLANTEST_CTRL_GET_BSS_COUNTERS,
+                        [(WLANTEST_ATTR_BSSID, _addr(bssid))],
+                        WLANTEST_ATTR_COUNTERS)
+        return BssCounters(*_counters(val)[:len(BSS_COUNTERS)])
+
+    def get_tdls_counters(self, bssid, addr1, addr2):
+        """Return all TDLS counters as a TdlsCounters record"""
+        val = self._get(WLANTEST_CTRL_GET_TDLS_COUNTERS,
+                        [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                         (WLANTEST_ATTR_STA_ADDR, _addr(addr1)),
+                         (WLANTEST_ATTR_STA2_ADDR, _addr(addr2))],
+                        WLANTEST_ATTR_COUNTERS)
+        return TdlsCounters(*_counters(val)[:len(TDLS_COUNTERS)])
+
+    def get_tid_counters(self, bssid, addr):
+        """Return TX and RX TID counters as a TidCounters record of lists"""
+        val = self._get(WLANTEST_CTRL_GET_TID_COUNTERS,
+                        [(WLANTEST_ATTR_BSSID, _addr(bssid)),
+                         (WLANTEST_ATTR_STA_ADDR, _addr(addr))],
+                        WLANTEST_ATTR_COUNTERS)
+        vals = _counters(val)
+        if len(vals) != 2 * NUM_TIDS:
+            raise Exception("Unexpected number of TID counters")
+        return TidCounters(vals[:NUM_TIDS], vals[NUM_TIDS:])
@@ -9,11 +9,12 @@ import time
 import logging
 import binascii
 import re
-import struct
 import wpaspy
 import remotehost
 import subprocess
 from remotectrl import RemoteCtrl
+import frames
+import event_stats
 
 logger = logging.getLogger()
 wpas_ctrl = '/var/run/wpa_supplicant'
@@ -883,6 +884,9 @@ class WpaSupplicant:
     def _wait_event(self, mon, pfx, events, timeout):
         if not isinstance(events, list):
             raise Exception("WpaSupplicant._wait_event() called with incorrect events argument type")
+        rec = event_stats.recorder
+        if rec:
+            wait_start = time.monotonic()
         start = os.times()[4]
         while True:
             while mon.pending():
@@ -890,6 +894,9 @@ class WpaSupplicant:
                 logger.debug(self.dbg + pfx + ev)
                 for event in events:
                     if event in ev:
+                        if rec:
+                            rec.record(self.dbg + pfx.rstrip(': '), events,
+                                       ev, wait_start)
                         return ev
             now = os.times()[4]
             remaining = start + timeout - now
@@ -897,6 +904,8 @@ class WpaSupplicant:
                 break
             if not mon.pending(timeout=remaining):
                 break
+        if rec:
+            rec.record(self.dbg + pfx.rstrip(': '), events, None, wait_start)
         return None
 
     def wait_event(self, events, timeout=10):
@@ -914,6 +923,9 @@ class WpaSupplicant:
         if self.group_ifname and self.group_ifname != self.ifname:
             if self.gctrl_mon is None:
                 return None
+            rec = event_stats.recorder
+            if rec:
+                wait_start = time.monotonic()
             start = os.times()[4]
             while True:
                 while self.gctrl_mon.pending():
@@ -921,6 +933,9 @@ class WpaSupplicant:
                     logger.debug(self.group_dbg + "(group): " + ev)
                     for event in events:
                         if event in ev:
+                            if rec:
+                                rec.record(self.group_dbg + "(group)", events,
+                                           ev, wait_start)
                             return ev
                 now = os.times()[4]
                 remaining = start + timeout - now
@@ -928,6 +943,9 @@ class WpaSupplicant:
                     break
                 if not self.gctrl_mon.pending(timeout=remaining):
                     break
+            if rec:
+                rec.record(self.group_dbg + "(group)", events, None,
+                           wait_start)
             return None
 
         return self.wait_event(events, timeout)
@@ -1444,24 +1462,7 @@ class WpaSupplicant:
             raise Exception("Unexpected MGMT-RX event format: " + ev)
         msg['ssi_signal'] = val
 
-        frame = binascii.unhexlify(items[4])
-        msg['frame'] = frame
-
-        hdr = struct.unpack('<HH6B6B6BH', frame[0:24])
-        msg['fc'] = hdr[0]
-        msg['subtype'] = (hdr[0] >> 4) & 0xf
-        hdr = hdr[1:]
-        msg['duration'] = hdr[0]
-        hdr = hdr[1:]
-        msg['da'] = "%02x:%02x:%02x:%02x:%02x:%02x" % hdr[0:6]
-        hdr = hdr[6:]
-        msg['sa'] = "%02x:%02x:%02x:%02x:%02x:%02x" % hdr[0:6]
-        hdr = hdr[6:]
-        msg['bssid'] = "%02x:%02x:%02x:%02x:%02x:%02x" % hdr[0:6]
-        hdr = hdr[6:]
-        msg['seq_ctrl'] = hdr[0]
-        msg['payload'] = frame[24:]
-
+        msg.update(frames.parse_mgmt(binascii.unhexlify(items[4])))
         return msg
 
     def wait_connected(self, timeout=10, error="Connection timed out"):
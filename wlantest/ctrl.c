@@ -284,10 +284,8 @@ static void ctrl_clear_sta_counters(struct wlantest *wt, int sock, u8 *cmd,
 
 	bss = ctrl_get_bss(wt, sock, cmd, clen);
 	sta = ctrl_get_sta(wt, sock, cmd, clen, bss);
-	if (sta == NULL) {
-		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+	if (sta == NULL)
 		return;
-	}
 
 	os_memset(sta->counters, 0, sizeof(sta->counters));
 	os_memset(sta->tx_tid, 0, sizeof(sta->tx_tid));
@@ -302,10 +300,8 @@ static void ctrl_clear_bss_counters(struct wlantest *wt, int sock, u8 *cmd,
 	struct wlantest_bss *bss;
 
 	bss = ctrl_get_bss(wt, sock, cmd, clen);
-	if (bss == NULL) {
-		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+	if (bss == NULL)
 		return;
-	}
 
 	os_memset(bss->counters, 0, sizeof(bss->counters));
 	ctrl_send_simple(wt, sock, WLANTEST_CTRL_SUCCESS);
@@ -322,11 +318,11 @@ static void ctrl_clear_tdls_counters(struct wlantest *wt, int sock, u8 *cmd,
 
 	bss = ctrl_get_bss(wt, sock, cmd, clen);
 	sta = ctrl_get_sta(wt, sock, cmd, clen, bss);
+	if (sta == NULL)
+		return;
 	sta2 = ctrl_get_sta2(wt, sock, cmd, clen, bss);
-	if (sta == NULL || sta2 == NULL) {
-		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+	if (sta2 == NULL)
 		return;
-	}
 
 	dl_list_for_each(tdls, &bss->tdls, struct wlantest_tdls, list) {
 		if ((tdls->init == sta && tdls->resp == sta2) ||
@@ -422,11 +418,11 @@ static void ctrl_get_tdls_counter(struct wlantest *wt, int sock, u8 *cmd,
 
 	bss = ctrl_get_bss(wt, sock, cmd, clen);
 	sta = ctrl_get_sta(wt, sock, cmd, clen, bss);
+	if (sta == NULL)
+		return;
 	sta2 = ctrl_get_sta2(wt, sock, cmd, clen, bss);
-	if (sta == NULL || sta2 == NULL) {
-		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+	if (sta2 == NULL)
 		return;
-	}
 
 	addr = attr_get(cmd, clen, WLANTEST_ATTR_TDLS_COUNTER, &addr_len);
 	if (addr == NULL || addr_len != 4) {
@@ -461,6 +457,88 @@ static void ctrl_get_tdls_counter(struct wlantest *wt, int sock, u8 *cmd,
 }
 
 
+static void ctrl_send_counters(struct wlantest *wt, int sock,
+			       const u32 *counters, size_t num)
+{
+	u8 buf[WLANTEST_CTRL_MAX_RESP_LEN], *pos;
+	size_t i;
+
+	if (4 + 8 + num * 4 > sizeof(buf)) {
+		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+		return;
+	}
+
+	pos = buf;
+	WPA_PUT_BE32(pos, WLANTEST_CTRL_SUCCESS);
+	pos += 4;
+	WPA_PUT_BE32(pos, WLANTEST_ATTR_COUNTERS);
+	pos += 4;
+	WPA_PUT_BE32(pos, num * 4);
+	pos += 4;
+	for (i = 0; i < num; i++) {
+		WPA_PUT_BE32(pos, counters[i]);
+		pos += 4;
+	}
+	ctrl_send(wt, sock, buf, pos - buf);
+}
+
+
+static void ctrl_get_sta_counters(struct wlantest *wt, int sock, u8 *cmd,
+				  size_t clen)
+{
+	struct wlantest_bss *bss;
+	struct wlantest_sta *sta;
+
+	bss = ctrl_get_bss(wt, sock, cmd, clen);
+	sta = ctrl_get_sta(wt, sock, cmd, clen, bss);
+	if (sta == NULL)
+		return;
+
+	ctrl_send_counters(wt, sock, sta->counters, NUM_WLANTEST_STA_COUNTER);
+}
+
+
+static void ctrl_get_bss_counters(struct wlantest *wt, int sock, u8 *cmd,
+				  size_t clen)
+{
+	struct wlantest_bss *bss;
+
+	bss = ctrl_get_bss(wt, sock, cmd, clen);
+	if (bss == NULL)
+		return;
+
+	ctrl_send_counters(wt, sock, bss->counters, NUM_WLANTEST_BSS_COUNTER);
+}
+
+
+static void ctrl_get_tdls_counters(struct wlantest *wt, int sock, u8 *cmd,
+				   size_t clen)
+{
+	struct wlantest_bss *bss;
+	struct wlantest_sta *sta;
+	struct wlantest_sta *sta2;
+	struct wlantest_tdls *tdls;
+
+	bss = ctrl_get_bss(wt, sock, cmd, clen);
+	sta = ctrl_get_sta(wt, sock, cmd, clen, bss);
+	if (sta == NULL)
+		return;
+	sta2 = ctrl_get_sta2(wt, sock, cmd, clen, bss);
+	if (sta2 == NULL)
+		return;
+
+	dl_list_for_each(tdls, &bss->tdls, struct wlantest_tdls, list) {
+		if (tdls->init == sta && tdls->resp == sta2) {
+			ctrl_send_counters(wt, sock, tdls->counters,
+					   NUM_WLANTEST_TDLS_COUNTER);
+			return;
+		}
+	}
+
+	ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+}
+
+
 static void build_mgmt_hdr(struct ieee80211_mgmt *mgmt,
 			   struct wlantest_bss *bss, struct wlantest_sta *sta,
 			   int sender_ap, int stype)
@@ -855,6 +933,54 @@ static void ctrl_add_passphrase(struct wlantest *wt, int sock, u8 *cmd,
 }
 
 
+static void ctrl_add_pmk(struct wlantest *wt, int sock, u8 *cmd, size_t clen)
+{
+	u8 *pmk;
+	size_t len;
+
+	pmk = attr_get(cmd, clen, WLANTEST_ATTR_PMK, &len);
+	if (pmk == NULL) {
+		ctrl_send_simple(wt, sock, WLANTEST_CTRL_INVALID_CMD);
+		return;
+	}
+
+	if (add_pmk(wt, pmk, len) < 0) {
+		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+		return;
+	}
+
+	ctrl_send_simple(wt, sock, WLANTEST_CTRL_SUCCESS);
+}
+
+
+static void ctrl_add_ptk(struct wlantest *wt, int sock, u8 *cmd, size_t clen)
+{
+	u8 *ptk;
+	size_t len;
+
+	ptk = attr_get(cmd, clen, WLANTEST_ATTR_PTK, &len);
+	if (ptk == NULL) {
+		ctrl_send_simple(wt, sock, WLANTEST_CTRL_INVALID_CMD);
+		return;
+	}
+
+	if (add_ptk(wt, ptk, len) < 0) {
+		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+		return;
+	}
+
+	ctrl_send_simple(wt, sock, WLANTEST_CTRL_SUCCESS);
+}
+
+
+static void ctrl_clear_keys(struct wlantest *wt, int sock)
+{
+	wpa_printf(MSG_DEBUG, "Drop all added PMKs and PTKs");
+	clear_keys(wt);
+	ctrl_send_simple(wt, sock, WLANTEST_CTRL_SUCCESS);
+}
+
+
 static void info_print_proto(char *buf, size_t len, int proto)
 {
 	char *pos, *end;
@@ -1218,6 +1344,30 @@ static void ctrl_relog(struct wlantest *wt, int sock)
 }
 
 
+static void ctrl_sync(struct wlantest *wt, int sock)
+{
+	u8 buf[4 + 12], *end, *pos;
+	int res;
+
+	res = monitor_sync(wt);
+	if (res < 0) {
+		ctrl_send_simple(wt, sock, WLANTEST_CTRL_FAILURE);
+		return;
+	}
+	if (res > 0)
+		wpa_printf(MSG_DEBUG, "Processed %d queued frame(s) on sync",
+			   res);
+
+	pos = buf;
+	end = buf + sizeof(buf);
+	WPA_PUT_BE32(pos, WLANTEST_CTRL_SUCCESS);
+	pos += 4;
+	pos = attr_add_be32(pos, end, WLANTEST_ATTR_COUNTER,
+			    wt->captured_frames);
+	ctrl_send(wt, sock, buf, pos - buf);
+}
+
+
 static void ctrl_get_tx_tid(struct wlantest *wt, int sock, u8 *cmd, size_t clen)
 {
 	u8 *addr;
@@ -1288,6 +1438,25 @@ static void ctrl_get_rx_tid(struct wlantest *wt, int sock, u8 *cmd, size_t clen)
 }
 
 
+static void ctrl_get_tid_counters(struct wlantest *wt, int sock, u8 *cmd,
+				  size_t clen)
+{
+	struct wlantest_bss *bss;
+	struct wlantest_sta *sta;
+	u32 counters[2 * (16 + 1)];
+
+	bss = ctrl_get_bss(wt, sock, cmd, clen);
+	sta = ctrl_get_sta(wt, sock, cmd, clen, bss);
+	if (sta == NULL)
+		return;
+
+	/* TX TID counters followed by RX TID counters */
+	os_memcpy(counters, sta->tx_tid, sizeof(sta->tx_tid));
+	os_memcpy(&counters[16 + 1], sta->rx_tid, sizeof(sta->rx_tid));
+	ctrl_send_counters(wt, sock, counters, ARRAY_SIZE(counters));
+}
+
+
 static void ctrl_read(int sock, void *eloop_ctx, void *sock_ctx)
 {
 	struct wlantest *wt = eloop_ctx;
@@ -1380,6 +1549,30 @@ static void ctrl_read(int sock, void *eloop_ctx, void *sock_ctx)
 	case WLANTEST_CTRL_GET_RX_TID:
 		ctrl_get_rx_tid(wt, sock, buf + 4, len - 4);
 		break;
+	case WLANTEST_CTRL_SYNC:
+		ctrl_sync(wt, sock);
+		break;
+	case WLANTEST_CTRL_GET_STA_COUNTERS:
+		ctrl_get_sta_counters(wt, sock, buf + 4, len - 4);
+		break;
+	case WLANTEST_CTRL_GET_BSS_COUNTERS:
+		ctrl_get_bss_counters(wt, sock, buf + 4, len - 4);
+		break;
+	case WLANTEST_CTRL_GET_TDLS_COUNTERS:
+		ctrl_get_tdls_counters(wt, sock, buf + 4, len - 4);
+		break;
+	case WLANTEST_CTRL_GET_TID_COUNTERS:
+		ctrl_get_tid_counters(wt, sock, buf + 4, len - 4);
+		break;
+	case WLANTEST_CTRL_ADD_PMK:
+		ctrl_add_pmk(wt, sock, buf + 4, len - 4);
+		break;
+	case WLANTEST_CTRL_ADD_PTK:
+		ctrl_add_ptk(wt, sock, buf + 4, len - 4);
+		break;
+	case WLANTEST_CTRL_CLEAR_KEYS:
+		ctrl_clear_keys(wt, sock);
+		break;
 	default:
 		ctrl_send_simple(wt, sock, WLANTEST_CTRL_UNKNOWN_CMD);
 		break;
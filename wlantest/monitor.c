@@ -35,8 +35,26 @@ void monitor_deinit(struct wlantest *wt)
 {
 }
 
+
+int monitor_sync(struct wlantest *wt)
+{
+	return 0;
+}
+
 #else /* __APPLE__ */
 
+static void monitor_process(struct wlantest *wt, const u8 *buf, size_t len)
+{
+	clear_notes(wt);
+	os_free(wt->decrypted);
+	wt->decrypted = NULL;
+	write_pcap_captured(wt, buf, len);
+	wlantest_process(wt, buf, len);
+	write_pcapng_captured(wt, buf, len);
+	wt->captured_frames++;
+}
+
+
 static void monitor_read(int sock, void *eloop_ctx, void *sock_ctx)
 {
 	struct wlantest *wt = eloop_ctx;
@@ -49,12 +67,7 @@ static void monitor_read(int sock, void *eloop_ctx, void *sock_ctx)
 		return;
 	}
 
-	clear_notes(wt);
-	os_free(wt->decrypted);
-	wt->decrypted = NULL;
-	write_pcap_captured(wt, buf, len);
-	wlantest_process(wt, buf, len);
-	write_pcapng_captured(wt, buf, len);
+	monitor_process(wt, buf, len);
 }
 
 
@@ -169,4 +182,39 @@ void monitor_deinit(struct wlantest *wt)
 	}
 }
 
+
+/**
+ * monitor_sync - Process all frames queued on the monitor socket
+ * @wt: wlantest data
+ * Returns: Number of processed frames or -1 on failure
+ *
+ * This is used to make sure that all frames that have been delivered to the
+ * monitor interface before this call have been processed and written into
+ * the capture files without having to wait for the event loop to get to
+ * them.
+ */
+int monitor_sync(struct wlantest *wt)
+{
+	u8 buf[3000];
+	int len, count = 0;
+
+	if (wt->monitor_sock < 0)
+		return 0;
+
+	for (;;) {
+		len = recv(wt->monitor_sock, buf, sizeof(buf), MSG_DONTWAIT);
+		if (len < 0) {
+			if (errno == EAGAIN || errno == EWOULDBLOCK)
+				break;
+			wpa_printf(MSG_INFO, "recv(PACKET): %s",
+				   strerror(errno));
+			return -1;
+		}
+		monitor_process(wt, buf, len);
+		count++;
+	}
+
+	return count;
+}
+
 #endif /* __APPLE__ */
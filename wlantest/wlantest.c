@@ -89,8 +89,6 @@ static void wlantest_deinit(struct wlantest *wt)
 	struct wlantest_passphrase *p, *pn;
 	struct wlantest_radius_secret *s, *sn;
 	struct wlantest_radius *r, *rn;
-	struct wlantest_pmk *pmk, *np;
-	struct wlantest_ptk *ptk, *npt;
 	struct wlantest_wep *wep, *nw;
 
 	if (wt->ctrl_sock >= 0)
@@ -106,10 +104,7 @@ static void wlantest_deinit(struct wlantest *wt)
 		secret_deinit(s);
 	dl_list_for_each_safe(r, rn, &wt->radius, struct wlantest_radius, list)
 		radius_deinit(r);
-	dl_list_for_each_safe(pmk, np, &wt->pmk, struct wlantest_pmk, list)
-		pmk_deinit(pmk);
-	dl_list_for_each_safe(ptk, npt, &wt->ptk, struct wlantest_ptk, list)
-		ptk_deinit(ptk);
+	clear_keys(wt);
 	dl_list_for_each_safe(wep, nw, &wt->wep, struct wlantest_wep, list)
 		wep_deinit(wep);
 	write_pcap_deinit(wt);
@@ -152,13 +147,41 @@ static void add_secret(struct wlantest *wt, const char *secret)
 }
 
 
+int add_pmk(struct wlantest *wt, const u8 *pmk, size_t pmk_len)
+{
+	struct wlantest_pmk *p;
+
+	if (pmk_len < PMK_LEN || pmk_len > PMK_LEN_MAX)
+		return -1;
+
+	dl_list_for_each(p, &wt->pmk, struct wlantest_pmk, list) {
+		if (p->pmk_len == pmk_len &&
+		    os_memcmp(p->pmk, pmk, pmk_len) == 0)
+			return 0;
+	}
+
+	p = os_zalloc(sizeof(*p));
+	if (p == NULL)
+		return -1;
+	os_memcpy(p->pmk, pmk, pmk_len);
+	p->pmk_len = pmk_len;
+	dl_list_add(&wt->pmk, &p->list);
+	wpa_hexdump(MSG_DEBUG, "Added PMK", pmk, pmk_len);
+
+	/* For FT, the send half of MSK is used */
+	if (pmk_len >= 2 * PMK_LEN)
+		return add_pmk(wt, pmk + PMK_LEN, PMK_LEN);
+
+	return 0;
+}
+
+
 static int add_pmk_file(struct wlantest *wt, const char *pmk_file)
 {
 	FILE *f;
 	u8 pmk[PMK_LEN_MAX];
 	size_t pmk_len;
 	char buf[300], *pos;
-	struct wlantest_pmk *p;
 
 	f = fopen(pmk_file, "r");
 	if (f == NULL) {
@@ -178,25 +201,8 @@ static int add_pmk_file(struct wlantest *wt, const char *pmk_file)
 			pmk_len = PMK_LEN_MAX;
 		if (hexstr2bin(buf, pmk, pmk_len) < 0)
 			continue;
-		p = os_zalloc(sizeof(*p));
-		if (p == NULL)
-			break;
-		os_memcpy(p->pmk, pmk, pmk_len);
-		p->pmk_len = pmk_len;
-		dl_list_add(&wt->pmk, &p->list);
-		wpa_hexdump(MSG_DEBUG, "Added PMK from file", pmk, pmk_len);
-
-		/* For FT, the send half of MSK is used */
-		if (hexstr2bin(&buf[2 * PMK_LEN], pmk, PMK_LEN) < 0)
-			continue;
-		p = os_zalloc(sizeof(*p));
-		if (p == NULL)
+		if (add_pmk(wt, pmk, pmk_len) < 0)
 			break;
-		os_memcpy(p->pmk, pmk, PMK_LEN);
-		p->pmk_len = PMK_LEN;
-		dl_list_add(&wt->pmk, &p->list);
-		wpa_hexdump(MSG_DEBUG, "Added PMK from file (2nd half of MSK)",
-			    pmk, PMK_LEN);
 	}
 
 	fclose(f);
@@ -204,13 +210,59 @@ static int add_pmk_file(struct wlantest *wt, const char *pmk_file)
 }
 
 
+int add_ptk(struct wlantest *wt, const u8 *ptk, size_t ptk_len)
+{
+	struct wlantest_ptk *p, *pa;
+
+	if (ptk_len != 16 && ptk_len != 32 &&
+	    ptk_len != 48 && ptk_len != 64 &&
+	    ptk_len != 80)
+		return -1;
+
+	p = os_zalloc(sizeof(*p));
+	if (p == NULL)
+		return -1;
+	if (ptk_len < 48) {
+		os_memcpy(p->ptk.tk, ptk, ptk_len);
+		p->ptk.tk_len = ptk_len;
+		p->ptk_len = 32 + ptk_len;
+	} else if (ptk_len == 80) {
+		os_memcpy(p->ptk.kck, ptk, 32);
+		p->ptk.kck_len = 32;
+		os_memcpy(p->ptk.kek, ptk + 32, 16);
+		p->ptk.kek_len = 16;
+		os_memcpy(p->ptk.tk, ptk + 32 + 16, ptk_len - 32 - 16);
+		p->ptk.tk_len = ptk_len - 32 - 16;
+		p->ptk_len = ptk_len;
+	} else {
+		os_memcpy(p->ptk.kck, ptk, 16);
+		p->ptk.kck_len = 16;
+		os_memcpy(p->ptk.kek, ptk + 16, 16);
+		p->ptk.kek_len = 16;
+		os_memcpy(p->ptk.tk, ptk + 32, ptk_len - 32);
+		p->ptk.tk_len = ptk_len - 32;
+		p->ptk_len = ptk_len;
+	}
+
+	dl_list_for_each(pa, &wt->ptk, struct wlantest_ptk, list) {
+		if (os_memcmp(&pa->ptk, &p->ptk, sizeof(p->ptk)) == 0) {
+			os_free(p);
+			return 0;
+		}
+	}
+
+	dl_list_add(&wt->ptk, &p->list);
+	wpa_hexdump(MSG_DEBUG, "Added PTK", ptk, ptk_len);
+	return 0;
+}
+
+
 static int add_ptk_file(struct wlantest *wt, const char *ptk_file)
 {
 	FILE *f;
 	u8 ptk[80];
 	size_t ptk_len;
 	char buf[300], *pos;
-	struct wlantest_ptk *p;
 
 	f = fopen(ptk_file, "r");
 	if (f == NULL) {
@@ -233,32 +285,8 @@ static int add_ptk_file(struct wlantest *wt, const char *ptk_file)
 			continue;
 		if (hexstr2bin(buf, ptk, ptk_len) < 0)
 			continue;
-		p = os_zalloc(sizeof(*p));
-		if (p == NULL)
+		if (add_ptk(wt, ptk, ptk_len) < 0)
 			break;
-		if (ptk_len < 48) {
-			os_memcpy(p->ptk.tk, ptk, ptk_len);
-			p->ptk.tk_len = ptk_len;
-			p->ptk_len = 32 + ptk_len;
-		} else if (ptk_len == 80) {
-			os_memcpy(p->ptk.kck, ptk, 32);
-			p->ptk.kck_len = 32;
-			os_memcpy(p->ptk.kek, ptk + 32, 16);
-			p->ptk.kek_len = 16;
-			os_memcpy(p->ptk.tk, ptk + 32 + 16, ptk_len - 32 - 16);
-			p->ptk.tk_len = ptk_len - 32 - 16;
-			p->ptk_len = ptk_len;
-		} else {
-			os_memcpy(p->ptk.kck, ptk, 16);
-			p->ptk.kck_len = 16;
-			os_memcpy(p->ptk.kek, ptk + 16, 16);
-			p->ptk.kek_len = 16;
-			os_memcpy(p->ptk.tk, ptk + 32, ptk_len - 32);
-			p->ptk.tk_len = ptk_len - 32;
-			p->ptk_len = ptk_len;
-		}
-		dl_list_add(&wt->ptk, &p->list);
-		wpa_hexdump(MSG_DEBUG, "Added PTK from file", ptk, ptk_len);
 	}
 
 	fclose(f);
@@ -266,6 +294,18 @@ static int add_ptk_file(struct wlantest *wt, const char *ptk_file)
 }
 
 
+void clear_keys(struct wlantest *wt)
+{
+	struct wlantest_pmk *pmk, *np;
+	struct wlantest_ptk *ptk, *npt;
+
+	dl_list_for_each_safe(pmk, np, &wt->pmk, struct wlantest_pmk, list)
+		pmk_deinit(pmk);
+	dl_list_for_each_safe(ptk, npt, &wt->ptk, struct wlantest_ptk, list)
+		ptk_deinit(ptk);
+}
+
+
 int add_wep(struct wlantest *wt, const char *key)
 {
 	struct wlantest_wep *w;
@@ -227,6 +227,7 @@ struct wlantest {
 	unsigned int rx_data;
 	unsigned int fcs_error;
 	unsigned int frame_num;
+	unsigned int captured_frames;
 
 	void *write_pcap; /* pcap_t* */
 	void *write_pcap_dumper; /* pcpa_dumper_t */
@@ -262,6 +263,9 @@ void write_decrypted_note(struct wlantest *wt, const u8 *decrypted,
 			  const u8 *tk, size_t tk_len, int keyid);
 
 int add_wep(struct wlantest *wt, const char *key);
+int add_pmk(struct wlantest *wt, const u8 *pmk, size_t pmk_len);
+int add_ptk(struct wlantest *wt, const u8 *ptk, size_t ptk_len);
+void clear_keys(struct wlantest *wt);
 int read_cap_file(struct wlantest *wt, const char *fname);
 int read_wired_cap_file(struct wlantest *wt, const char *fname);
 
@@ -285,6 +289,7 @@ void wlantest_process_wired(struct wlantest *wt, const u8 *data, size_t len);
 int monitor_init(struct wlantest *wt, const char *ifname);
 int monitor_init_wired(struct wlantest *wt, const char *ifname);
 void monitor_deinit(struct wlantest *wt);
+int monitor_sync(struct wlantest *wt);
 void rx_mgmt(struct wlantest *wt, const u8 *data, size_t len);
 void rx_mgmt_ack(struct wlantest *wt, const struct ieee80211_hdr *hdr);
 void rx_data(struct wlantest *wt, const u8 *data, size_t len);
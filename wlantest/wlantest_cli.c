@@ -733,6 +733,26 @@ static int cmd_relog(int s, int argc, char *argv[])
 }
 
 
+static int cmd_sync(int s, int argc, char *argv[])
+{
+	u8 resp[WLANTEST_CTRL_MAX_RESP_LEN];
+	u8 buf[4], *pos;
+	size_t len;
+	int rlen;
+
+	WPA_PUT_BE32(buf, WLANTEST_CTRL_SYNC);
+	rlen = cmd_send_and_recv(s, buf, sizeof(buf), resp, sizeof(resp));
+	if (rlen < 0)
+		return -1;
+
+	pos = attr_get(resp + 4, rlen - 4, WLANTEST_ATTR_COUNTER, &len);
+	if (pos == NULL || len != 4)
+		return -1;
+	printf("%u\n", WPA_GET_BE32(pos));
+	return 0;
+}
+
+
 struct tdls_counters {
 	const char *name;
 	enum wlantest_tdls_counter num;
@@ -1226,6 +1246,69 @@ static int cmd_add_wepkey(int s, int argc, char *argv[])
 }
 
 
+static int cmd_add_key(int s, enum wlantest_ctrl_cmd cmd,
+		       enum wlantest_ctrl_attr attr, const char *hex)
+{
+	u8 resp[WLANTEST_CTRL_MAX_RESP_LEN];
+	u8 buf[100], *pos, *end;
+	size_t len;
+	int rlen;
+
+	len = os_strlen(hex);
+	if (len & 1 || len / 2 > 80) {
+		printf("Invalid key '%s'\n", hex);
+		return -1;
+	}
+	len /= 2;
+
+	pos = buf;
+	end = buf + sizeof(buf);
+	WPA_PUT_BE32(pos, cmd);
+	pos += 4;
+	pos = attr_hdr_add(pos, end, attr, len);
+	if (hexstr2bin(hex, pos, len) < 0) {
+		printf("Invalid key '%s'\n", hex);
+		return -1;
+	}
+	pos += len;
+
+	rlen = cmd_send_and_recv(s, buf, pos - buf, resp, sizeof(resp));
+	if (rlen < 0)
+		return -1;
+	return 0;
+}
+
+
+static int cmd_add_pmk(int s, int argc, char *argv[])
+{
+	if (argc < 1) {
+		printf("add_pmk needs one argument: PMK as a hex string\n");
+		return -1;
+	}
+
+	return cmd_add_key(s, WLANTEST_CTRL_ADD_PMK, WLANTEST_ATTR_PMK,
+			   argv[0]);
+}
+
+
+static int cmd_add_ptk(int s, int argc, char *argv[])
+{
+	if (argc < 1) {
+		printf("add_ptk needs one argument: PTK as a hex string\n");
+		return -1;
+	}
+
+	return cmd_add_key(s, WLANTEST_CTRL_ADD_PTK, WLANTEST_ATTR_PTK,
+			   argv[0]);
+}
+
+
+static int cmd_clear_keys(int s, int argc, char *argv[])
+{
+	return cmd_simple(s, WLANTEST_CTRL_CLEAR_KEYS);
+}
+
+
 struct sta_infos {
 	const char *name;
 	enum wlantest_sta_info num;
@@ -1574,6 +1657,146 @@ static char ** wlantest_cli_complete_help(int s, const char *str, int pos)
 }
 
 
+static u8 * get_counters(int s, enum wlantest_ctrl_cmd cmd, int argc,
+			 char *argv[], u8 *resp, size_t resp_size,
+			 size_t *num)
+{
+	static const enum wlantest_ctrl_attr addr_attrs[] = {
+		WLANTEST_ATTR_BSSID, WLANTEST_ATTR_STA_ADDR,
+		WLANTEST_ATTR_STA2_ADDR
+	};
+	u8 buf[100], *end, *pos;
+	int rlen, i;
+	size_t len;
+
+	pos = buf;
+	end = buf + sizeof(buf);
+	WPA_PUT_BE32(pos, cmd);
+	pos += 4;
+
+	for (i = 0; i < argc && i < (int) ARRAY_SIZE(addr_attrs); i++) {
+		pos = attr_hdr_add(pos, end, addr_attrs[i], ETH_ALEN);
+		if (hwaddr_aton(argv[i], pos) < 0) {
+			printf("Invalid address '%s'\n", argv[i]);
+			return NULL;
+		}
+		pos += ETH_ALEN;
+	}
+
+	rlen = cmd_send_and_recv(s, buf, pos - buf, resp, resp_size);
+	if (rlen < 0)
+		return NULL;
+
+	pos = attr_get(resp + 4, rlen - 4, WLANTEST_ATTR_COUNTERS, &len);
+	if (pos == NULL || len % 4)
+		return NULL;
+	*num = len / 4;
+	return pos;
+}
+
+
+static int cmd_get_sta_counters(int s, int argc, char *argv[])
+{
+	u8 resp[WLANTEST_CTRL_MAX_RESP_LEN];
+	u8 *pos;
+	size_t num;
+	int i;
+
+	if (argc != 2) {
+		printf("get_sta_counters needs two arguments: BSSID and STA "
+		       "address\n");
+		return -1;
+	}
+
+	pos = get_counters(s, WLANTEST_CTRL_GET_STA_COUNTERS, argc, argv,
+			   resp, sizeof(resp), &num);
+	if (pos == NULL)
+		return -1;
+	for (i = 0; sta_counters[i].name; i++) {
+		if (sta_counters[i].num < num)
+			printf("%s=%u\n", sta_counters[i].name,
+			       WPA_GET_BE32(pos + 4 * sta_counters[i].num));
+	}
+	return 0;
+}
+
+
+static int cmd_get_bss_counters(int s, int argc, char *argv[])
+{
+	u8 resp[WLANTEST_CTRL_MAX_RESP_LEN];
+	u8 *pos;
+	size_t num;
+	int i;
+
+	if (argc != 1) {
+		printf("get_bss_counters needs one argument: BSSID\n");
+		return -1;
+	}
+
+	pos = get_counters(s, WLANTEST_CTRL_GET_BSS_COUNTERS, argc, argv,
+			   resp, sizeof(resp), &num);
+	if (pos == NULL)
+		return -1;
+	for (i = 0; bss_counters[i].name; i++) {
+		if (bss_counters[i].num < num)
+			printf("%s=%u\n", bss_counters[i].name,
+			       WPA_GET_BE32(pos + 4 * bss_counters[i].num));
+	}
+	return 0;
+}
+
+
+static int cmd_get_tdls_counters(int s, int argc, char *argv[])
+{
+	u8 resp[WLANTEST_CTRL_MAX_RESP_LEN];
+	u8 *pos;
+	size_t num;
+	int i;
+
+	if (argc != 3) {
+		printf("get_tdls_counters needs three arguments: BSSID, STA1 "
+		       "address, and STA2 address\n");
+		return -1;
+	}
+
+	pos = get_counters(s, WLANTEST_CTRL_GET_TDLS_COUNTERS, argc, argv,
+			   resp, sizeof(resp), &num);
+	if (pos == NULL)
+		return -1;
+	for (i = 0; tdls_counters[i].name; i++) {
+		if (tdls_counters[i].num < num)
+			printf("%s=%u\n", tdls_counters[i].name,
+			       WPA_GET_BE32(pos + 4 * tdls_counters[i].num));
+	}
+	return 0;
+}
+
+
+static int cmd_get_tid_counters(int s, int argc, char *argv[])
+{
+	u8 resp[WLANTEST_CTRL_MAX_RESP_LEN];
+	u8 *pos;
+	size_t num, i;
+
+	if (argc != 2) {
+		printf("get_tid_counters needs two arguments: BSSID and STA "
+		       "address\n");
+		return -1;
+	}
+
+	pos = get_counters(s, WLANTEST_CTRL_GET_TID_COUNTERS, argc, argv,
+			   resp, sizeof(resp), &num);
+	if (pos == NULL)
+		return -1;
+	/* TX TID counters followed by RX TID counters */
+	for (i = 0; i < num; i++)
+		printf("%s_tid_%u=%u\n", i < num / 2 ? "tx" : "rx",
+		       (unsigned int) (i % (num / 2)),
+		       WPA_GET_BE32(pos + 4 * i));
+	return 0;
+}
+
+
 struct wlantest_cli_cmd {
 	const char *cmd;
 	int (*handler)(int s, int argc, char *argv[]);
@@ -1609,6 +1832,12 @@ static const struct wlantest_cli_cmd wlantest_cli_commands[] = {
 	  "<passphrase> = add a known passphrase", NULL },
 	{ "add_wepkey", cmd_add_wepkey,
 	  "<WEP key> = add a known WEP key", NULL },
+	{ "add_pmk", cmd_add_pmk,
+	  "<PMK> = add a known PMK (or MSK)", NULL },
+	{ "add_ptk", cmd_add_ptk,
+	  "<PTK> = add a known PTK (or TK)", NULL },
+	{ "clear_keys", cmd_clear_keys,
+	  "= drop all added PMKs and PTKs", NULL },
 	{ "info_sta", cmd_info_sta,
 	  "<field> <BSSID> <STA> = get STA information",
 	  complete_info_sta },
@@ -1625,12 +1854,23 @@ static const struct wlantest_cli_cmd wlantest_cli_commands[] = {
 	  "<counter> <BSSID> = get BSS counter value",
 	  complete_get_bss_counter },
 	{ "relog", cmd_relog, "= re-open log-file (allow rolling logs)", NULL },
+	{ "sync", cmd_sync,
+	  "= process queued frames, flush capture files, and get frame count",
+	  NULL },
 	{ "get_tx_tid", cmd_get_tx_tid,
 	  "<BSSID> <STA> <TID> = get STA TX TID counter value",
 	  complete_get_tid },
 	{ "get_rx_tid", cmd_get_rx_tid,
 	  "<BSSID> <STA> <TID> = get STA RX TID counter value",
 	  complete_get_tid },
+	{ "get_sta_counters", cmd_get_sta_counters,
+	  "<BSSID> <STA> = get all STA counter values", NULL },
+	{ "get_bss_counters", cmd_get_bss_counters,
+	  "<BSSID> = get all BSS counter values", NULL },
+	{ "get_tdls_counters", cmd_get_tdls_counters,
+	  "<BSSID> <STA1> <STA2> = get all TDLS counter values", NULL },
+	{ "get_tid_counters", cmd_get_tid_counters,
+	  "<BSSID> <STA> = get all STA TX/RX TID counter values", NULL },
 	{ "help", wlantest_cli_cmd_help,
 	  "= show this usage help", wlantest_cli_complete_help },
 	{ NULL, NULL, NULL, NULL }
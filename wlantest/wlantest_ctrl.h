@@ -38,6 +38,14 @@ enum wlantest_ctrl_cmd {
 	WLANTEST_CTRL_RELOG,
 	WLANTEST_CTRL_GET_TX_TID,
 	WLANTEST_CTRL_GET_RX_TID,
+	WLANTEST_CTRL_SYNC,
+	WLANTEST_CTRL_GET_STA_COUNTERS,
+	WLANTEST_CTRL_GET_BSS_COUNTERS,
+	WLANTEST_CTRL_GET_TDLS_COUNTERS,
+	WLANTEST_CTRL_GET_TID_COUNTERS,
+	WLANTEST_CTRL_ADD_PMK,
+	WLANTEST_CTRL_ADD_PTK,
+	WLANTEST_CTRL_CLEAR_KEYS,
 };
 
 enum wlantest_ctrl_attr {
@@ -59,6 +67,9 @@ enum wlantest_ctrl_attr {
 	WLANTEST_ATTR_STA2_ADDR,
 	WLANTEST_ATTR_WEPKEY,
 	WLANTEST_ATTR_TID,
+	WLANTEST_ATTR_COUNTERS, /* array of be32 counter values */
+	WLANTEST_ATTR_PMK,
+	WLANTEST_ATTR_PTK,
 };
 
 enum wlantest_bss_counter {
@@ -7,49 +7,353 @@
 # This software may be distributed under the terms of the BSD license.
 # See README for more details.
 
-import sys, struct, re
+import struct, re, os, mmap, argparse
 from binascii import unhexlify
 
-def write_pcap_header(pcap_file):
-    pcap_file.write(
-        struct.pack('<IHHIIII',
-                    0xa1b2c3d4, 2, 4, 0, 0, 65535,
-                    105 # raw 802.11 format
-                    ))
+LINKTYPE_ETHERNET = 1
+LINKTYPE_IEEE802_11 = 105
 
-def pcap_addpacket(pcap_file, ts, data):
-    # ts in seconds, float
-    pcap_file.write(struct.pack('<IIII',
-        int(ts), int(1000000 * ts) % 1000000,
-        len(data), len(data)))
-    pcap_file.write(data)
+# Frame hexdumps that are converted into packets:
+# title -> (link type, direction); direction 1 = RX, 2 = TX as used in the
+# pcapng epb_flags option
+FRAME_SOURCES = {
+    b'nl80211: MLME event frame': (LINKTYPE_IEEE802_11, 1),
+    b'CMD_FRAME': (LINKTYPE_IEEE802_11, 2),
+    b'RX EAPOL': (LINKTYPE_ETHERNET, 1),
+    b'TX EAPOL': (LINKTYPE_ETHERNET, 2),
+    b'TX EAPOL (preauth)': (LINKTYPE_ETHERNET, 2),
+    b'RX pre-auth': (LINKTYPE_ETHERNET, 1),
+}
 
-if __name__ == "__main__":
-    try:
-        input = sys.argv[1]
-        pcap = sys.argv[2]
-    except IndexError:
-        print("Usage: %s <log file> <pcap file>" % sys.argv[0])
-        sys.exit(2)
+HEXDUMP_MARKER = b' - hexdump(len='
+
+frame_re = re.compile(rb'(?:([0-9]+\.[0-9]{6}):\s*)?(' +
+                      b'|'.join(re.escape(t) for t in FRAME_SOURCES) +
+                      rb') - hexdump\(len=([0-9]+)\):([0-9a-fA-F ]*)$')
+
+mac_re = re.compile(rb'[0-9a-fA-F]{2}(?::[0-9a-fA-F]{2}){5}$')
+
+# Context lines used for determining the interface
+ifname_res = [re.compile(rb'received for ([^\s]+)'),
+              re.compile(rb"Initializing interface '([^']+)'")]
+
+ETH_P_EAPOL = 0x888e
+ETH_P_PREAUTH = 0x88c7
+
+# Write output in batches of this many bytes
+WRITE_BATCH = 1024 * 1024
+
+# Logs smaller than this are not split for parallel processing
+PARALLEL_MIN_SIZE = 32 * 1024 * 1024
+
+# Maximum size of a log range parsed by a single parallel job; this limits
+# the number of frames kept in memory per pending job
+CHUNK_SIZE = 8 * 1024 * 1024
+
+EAPOL_NEEDLES = [b'RX EAPOL from ', b'RX pre-auth from ', b'TX EAPOL: dst=']
+
+def _mac(addr):
+    if not addr:
+        return b'\x00' * 6
+    return unhexlify(addr.replace(b':', b''))
+
+def _eth_hdr(eapol, proto):
+    return _mac(eapol[1]) + _mac(eapol[0]) + struct.pack('>H', proto)
 
-    input_file = open(input, 'r')
-    pcap_file = open(pcap, 'wb')
-    frame_re = re.compile(r'(([0-9]+.[0-9]{6}):\s*)?nl80211: MLME event frame - hexdump\(len=[0-9]*\):((\s*[0-9a-fA-F]{2})*)')
+def find_ifnames(buf):
+    """Return the set of interface names mentioned in the log"""
+    names = set()
+    for r in ifname_res:
+        names.update(r.findall(buf))
+    return names
 
-    write_pcap_header(pcap_file)
+def _last(buf, needles, start, end):
+    """Return (position after needle, needle) of the last needle occurrence"""
+    best = (-1, None)
+    for needle in needles:
+        pos = buf.rfind(needle, start, end)
+        if pos >= 0 and pos + len(needle) > best[0]:
+            best = (pos + len(needle), needle)
+    return best
 
-    for line in input_file:
-        m = frame_re.match(line)
+def _last_eapol(buf, start, end):
+    """Return the (src, dst) addresses from the last EAPOL context line
+
+    Lines without an address after the needle (e.g., "RX EAPOL from driver"
+    from wpa_priv) are skipped. Returns None if there is no such line."""
+    best = (-1, None)
+    for needle in EAPOL_NEEDLES:
+        stop = end
+        while True:
+            pos = buf.rfind(needle, start, stop)
+            if pos < 0 or pos <= best[0]:
+                break
+            addr = buf[pos + len(needle):pos + len(needle) + 17]
+            if mac_re.match(addr):
+                best = (pos, (None, addr) if needle.startswith(b'TX') else
+                        (addr, None))
+                break
+            stop = pos
+    return best[1]
+
+def _word(buf, pos, end):
+    stop = pos
+    while stop < end and buf[stop:stop + 1] not in (b' ', b'\n', b"'"):
+        stop += 1
+    return buf[pos:stop]
+
+class _PendingEth:
+    """Ethernet frame payload whose addresses are in a previous log range"""
+    def __init__(self, proto, data):
+        self.proto = proto
+        self.data = data
+
+def _iter_frames(buf, start, end, ifnames, state):
+    """Generate frames from buf[start:end]
+
+    state is a dict with the context carried over from the previous range:
+    'ifname' and 'eapol' (the pending (src, dst) EAPOL addresses). Either
+    can be None if the context is not known, i.e., when the range is parsed
+    independently of the previous one. Frames that need that context get
+    ifname None or a _PendingEth as data. state is updated with the context
+    at the end of the range.
+
+    Only lines with a hexdump marker are matched with a regular expression;
+    the context (interface, EAPOL addresses) is found with reverse substring
+    searches of the lines between two frames.
+    """
+    ifname = state.get('ifname')
+    eapol = state.get('eapol')
+    ifname_needles = [b'received for ', b"Initializing interface '"]
+    prefixes = {}
+    for name in ifnames:
+        # "<timestamp>: <ifname>: " or "<ifname>: " at the beginning of a line
+        prefixes[b': ' + name + b': '] = name
+        prefixes[b'\n' + name + b': '] = name
+    ifname_needles += list(prefixes.keys())
+
+    def update_context(start, end, ifname, eapol):
+        found, needle = _last(buf, ifname_needles, start, end)
+        if needle in prefixes:
+            ifname = prefixes[needle]
+        elif needle:
+            ifname = _word(buf, found, end)
+        addrs = _last_eapol(buf, start, end)
+        return ifname, addrs or eapol
+
+    prev = start
+    pos = start
+    while True:
+        pos = buf.find(HEXDUMP_MARKER, pos, end)
+        if pos < 0:
+            break
+        line_start = buf.rfind(b'\n', start, pos)
+        line_start = start if line_start < 0 else line_start + 1
+        line_end = buf.find(b'\n', pos, end)
+        if line_end < 0:
+            line_end = end
+        pos = line_end
+
+        m = frame_re.match(buf, line_start, line_end)
         if m is None:
             continue
-        if m.group(2):
-            ts = float(m.group(2))
+
+        # Update the context from the lines since the previous frame
+        if prev < line_start:
+            ifname, eapol = update_context(prev, line_start, ifname, eapol)
+        prev = line_end
+
+        title = m.group(2)
+        hexdata = m.group(4).replace(b' ', b'')
+        if len(hexdata) != 2 * int(m.group(3)):
+            # [REMOVED] or otherwise truncated hexdump
+            continue
+        data = unhexlify(hexdata)
+        linktype, direction = FRAME_SOURCES[title]
+        if linktype == LINKTYPE_ETHERNET:
+            proto = ETH_P_PREAUTH if b'pre' in title else ETH_P_EAPOL
+            if eapol is None:
+                data = _PendingEth(proto, data)
+            else:
+                data = _eth_hdr(eapol, proto) + data
+            eapol = (None, None)
+        ts = float(m.group(1)) if m.group(1) else 0
+        yield (ts, ifname, linktype, direction, data)
+    if prev < end:
+        # Context for the frames in the next range
+        ifname, eapol = update_context(prev, end, ifname, eapol)
+    state['ifname'] = ifname
+    state['eapol'] = eapol
+
+def parse_frames(buf, start, end, ifnames):
+    """Parse frame hexdumps from buf[start:end]
+
+    start and end need to be at line boundaries. Returns a list of
+    (timestamp, ifname, linktype, direction, data) tuples in log order and
+    the context at the end of the range as a dict. Frames preceding the
+    first line in the range that identifies the interface or the EAPOL
+    addresses are returned with ifname None or a _PendingEth as data; the
+    caller resolves these with the context from the previous range.
+    """
+    state = {}
+    frames = list(_iter_frames(buf, start, end, ifnames, state))
+    return frames, state
+
+def _parse_chunk(args):
+    fname, start, end, ifnames = args
+    with open(fname, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return parse_frames(buf, start, end, ifnames)
+
+def _chunks(buf, jobs):
+    size = len(buf)
+    chunk = min(max(size // jobs, 1), CHUNK_SIZE)
+    bounds = [0]
+    while bounds[-1] < size:
+        pos = bounds[-1] + chunk
+        if pos >= size:
+            bounds.append(size)
+            break
+        nl = buf.find(b'\n', pos)
+        bounds.append(size if nl < 0 else nl + 1)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def read_frames(fname, jobs=None):
+    """Generate the frames from a debug log file in log order
+
+    Large logs are split at line boundaries and parsed in parallel; the
+    results are consumed in order, so only the frames of the ranges that
+    have been parsed but not yet consumed are kept in memory. The interface
+    and EAPOL address context is carried over from one range to the next.
+    """
+    with open(fname, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            ifnames = find_ifnames(buf)
+            if jobs is None:
+                jobs = os.cpu_count() or 1
+            if jobs <= 1 or len(buf) < PARALLEL_MIN_SIZE:
+                state = {'eapol': (None, None)}
+                yield from _iter_frames(buf, 0, len(buf), ifnames, state)
+                return
+            chunks = _chunks(buf, jobs)
+
+    import multiprocessing
+    ifname = None
+    eapol = (None, None)
+    with multiprocessing.Pool(min(jobs, len(chunks))) as pool:
+        for chunk_frames, state in pool.imap(
+                _parse_chunk, [(fname, s, e, ifnames) for s, e in chunks]):
+            for ts, name, linktype, direction, data in chunk_frames:
+                if name is None:
+                    name = ifname
+                else:
+                    ifname = name
+                if isinstance(data, _PendingEth):
+                    data = _eth_hdr(eapol, data.proto) + data.data
+                    eapol = (None, None)
+                yield (ts, name, linktype, direction, data)
+            if state['ifname'] is not None:
+                ifname = state['ifname']
+            if state['eapol'] is not None:
+                eapol = state['eapol']
+
+class PcapWriter:
+    def __init__(self, f):
+        self.f = f
+        self.buf = []
+        self.buf_len = 0
+        self.f.write(struct.pack('<IHHIIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535,
+                                 LINKTYPE_IEEE802_11))
+
+    def add(self, ts, ifname, linktype, direction, data):
+        if linktype != LINKTYPE_IEEE802_11:
+            # pcap supports only a single link type
+            return
+        self._append(struct.pack('<IIII', int(ts), int(1000000 * ts) % 1000000,
+                                 len(data), len(data)) + data)
+
+    def _append(self, block):
+        self.buf.append(block)
+        self.buf_len += len(block)
+        if self.buf_len >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            self.f.write(b''.join(self.buf))
+            self.buf = []
+            self.buf_len = 0
+
+class PcapngWriter(PcapWriter):
+    def __init__(self, f):
+        self.f = f
+        self.buf = []
+        self.buf_len = 0
+        self.ifaces = {}
+        # epb_flags with the inbound/outbound direction, opt_endofopt
+        self.epb_opts = {d: self._option(2, struct.pack('<I', d)) +
+                         self._option(0, b'') for d in (1, 2)}
+        # Section Header Block
+        self._append(struct.pack('<IIIHHqI', 0x0a0d0d0a, 28, 0x1a2b3c4d,
+                                 1, 0, -1, 28))
+
+    @staticmethod
+    def _option(code, value):
+        pad = (4 - len(value) % 4) % 4
+        return struct.pack('<HH', code, len(value)) + value + b'\x00' * pad
+
+    def _iface(self, ifname, linktype):
+        key = (ifname, linktype)
+        if key in self.ifaces:
+            return self.ifaces[key]
+        idx = len(self.ifaces)
+        self.ifaces[key] = idx
+        opts = b''
+        if ifname:
+            opts += self._option(2, ifname) # if_name
+        if opts:
+            opts += self._option(0, b'') # opt_endofopt
+        body = struct.pack('<HHI', linktype, 0, 65535) + opts
+        blen = 12 + len(body)
+        self._append(struct.pack('<II', 1, blen) + body +
+                     struct.pack('<I', blen))
+        return idx
+
+    def add(self, ts, ifname, linktype, direction, data):
+        idx = self._iface(ifname, linktype)
+        usec = int(round(ts * 1000000))
+        pad = (4 - len(data) % 4) % 4
+        opts = self.epb_opts[direction]
+        blen = 32 + len(data) + pad + len(opts)
+        self._append(struct.pack('<IIIIIII', 6, blen, idx, usec >> 32,
+                                 usec & 0xffffffff, len(data), len(data)) +
+                     data + b'\x00' * pad + opts + struct.pack('<I', blen))
+
+def convert(input, output, fmt=None, jobs=None):
+    if fmt is None:
+        fmt = 'pcapng' if output.endswith('.pcapng') else 'pcap'
+    count = 0
+    with open(output, 'wb') as f:
+        if fmt == 'pcapng':
+            writer = PcapngWriter(f)
         else:
-            ts = 0
-        hexdata = m.group(3)
-        hexdata = hexdata.split()
-        data = unhexlify("".join(hexdata))
-        pcap_addpacket(pcap_file, ts, data)
-
-    input_file.close()
-    pcap_file.close()
+            writer = PcapWriter(f)
+        for frame in read_frames(input, jobs):
+            writer.add(*frame)
+            count += 1
+        writer.flush()
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert frame hexdumps from a wpa_supplicant/hostapd debug log into a capture file')
+    parser.add_argument('input', metavar='<log file>')
+    parser.add_argument('output', metavar='<pcap file>')
+    parser.add_argument('--format', choices=['pcap', 'pcapng'],
+                        help='output format (default: pcapng if the output file name ends in .pcapng, pcap otherwise; pcap contains only 802.11 frames)')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='number of parallel processes for large logs (default: number of CPUs)')
+    args = parser.parse_args()
+
+    convert(args.input, args.output, args.format, args.jobs)